@@ -22,17 +22,17 @@ A sane default configuration is attainable through nothing more than instantiati
 appropriate classes. `DebianPackage` objects provide information about the architecture, version,
 name, and status of a package.
 
-`DebianPackage` will try to look up a package either from `dpkg -L` or from `apt-cache` when
-provided with a string indicating the package name. If it cannot be located, `PackageNotFoundError`
-will be returned, as `apt` and `dpkg` otherwise return `100` for all errors, and a meaningful error
-message if the package is not known is desirable.
+`DebianPackage` will try to look up a package either from the dpkg status database or from
+the apt lists when provided with a string indicating the package name. If it cannot be located,
+`PackageNotFoundError` will be returned, as `apt` and `dpkg` otherwise return `100` for all errors,
+and a meaningful error message if the package is not known is desirable.
 
 To install packages with convenience methods:
 
 ```python
 try:
-    # Run `apt-get update`
-    apt.update()
+    # Run `apt-get update`, unless it already ran within the last hour
+    apt.update(max_age=3600)
     apt.add_package("zsh")
     apt.add_package(["vim", "htop", "wget"])
 except PackageNotFoundError:
@@ -53,6 +53,9 @@ try:
     # To find from installed packages only
     # apt.DebianPackage.from_installed_package("vim")
 
+    # To find many packages at once
+    # packages = apt.DebianPackage.from_system_bulk(["vim", "htop", "wget"])
+
     vim.ensure(PackageState.Latest)
     logger.info("updated vim to version: %s", vim.fullversion)
 except PackageNotFoundError:
@@ -100,16 +103,23 @@ if "deb-us.archive.ubuntu.com-xenial" not in repositories:
 ```
 """
 
+import copy
+import fcntl
 import fileinput
+import functools
 import glob
+import json
 import logging
+import mmap
 import os
 import re
 import subprocess
+import tempfile
+import time
 from collections.abc import Mapping
 from enum import Enum
 from subprocess import PIPE, CalledProcessError, check_call, check_output
-from typing import Iterable, List, Optional, Tuple, Union
+from typing import Dict, Iterable, List, Optional, Tuple, Union
 from urllib.parse import urlparse
 
 logger = logging.getLogger(__name__)
@@ -122,11 +132,20 @@ LIBAPI = 0
 
 # Increment this PATCH version before using `charmcraft publish-lib` or reset
 # to 0 if you are raising the major API version
-LIBPATCH = 11
+LIBPATCH = 22
 
 
 VALID_SOURCE_TYPES = ("deb", "deb-src")
 OPTIONS_MATCHER = re.compile(r"\[.*?\]")
+_REVISION_MATCHER = re.compile(r"(\D*)(\d*)")
+DPKG_STATUS = "/var/lib/dpkg/status"
+APT_LISTS = "/var/lib/apt/lists"
+# kept out of the lists directory, which apt prunes of unknown files on update
+APT_LISTS_INDEX = "/var/cache/charm-apt/packages-index.json"
+APT_UPDATE_STAMP = "/var/lib/apt/periodic/update-success-stamp"
+APT_UPDATE_LOCK = "/var/lib/apt/.charm-update.lock"
+REPOSITORY_CACHE = "/var/lib/apt/.charm-sources-cache.json"
+TRUSTED_KEYRING_DIR = "/etc/apt/trusted.gpg.d"
 
 
 class Error(Exception):
@@ -392,60 +411,11 @@ class DebianPackage:
             arch: an optional architecture, defaulting to `dpkg --print-architecture`.
                 If an architecture is not specified, this will be used for selection.
         """
-        system_arch = check_output(
-            ["dpkg", "--print-architecture"], universal_newlines=True
-        ).strip()
-        arch = arch if arch else system_arch
+        arch = arch if arch else _get_system_arch()
 
-        # Regexps are a really terrible way to do this. Thanks dpkg
-        output = ""
-        try:
-            output = check_output(["dpkg", "-l", package], stderr=PIPE, universal_newlines=True)
-        except CalledProcessError:
-            raise PackageNotFoundError("Package is not installed: {}".format(package)) from None
-
-        # Pop off the output from `dpkg -l' because there's no flag to
-        # omit it`
-        lines = str(output).splitlines()[5:]
-
-        dpkg_matcher = re.compile(
-            r"""
-        ^(?P<package_status>\w+?)\s+
-        (?P<package_name>.*?)(?P<throwaway_arch>:\w+?)?\s+
-        (?P<version>.*?)\s+
-        (?P<arch>\w+?)\s+
-        (?P<description>.*)
-        """,
-            re.VERBOSE,
-        )
-
-        for line in lines:
-            try:
-                matches = dpkg_matcher.search(line).groupdict()
-                package_status = matches["package_status"]
-
-                if not package_status.endswith("i"):
-                    logger.debug(
-                        "package '%s' in dpkg output but not installed, status: '%s'",
-                        package,
-                        package_status,
-                    )
-                    break
-
-                epoch, split_version = DebianPackage._get_epoch_from_version(matches["version"])
-                pkg = DebianPackage(
-                    matches["package_name"],
-                    split_version,
-                    epoch,
-                    matches["arch"],
-                    PackageState.Present,
-                )
-                if (pkg.arch == "all" or pkg.arch == arch) and (
-                    version == "" or str(pkg.version) == version
-                ):
-                    return pkg
-            except AttributeError:
-                logger.warning("dpkg matcher could not parse line: %s", line)
+        pkg = _dpkg_status.get(package, version, arch)
+        if pkg:
+            return pkg
 
         # If we didn't find it, fail through
         raise PackageNotFoundError("Package {}.{} is not installed!".format(package, arch))
@@ -454,7 +424,9 @@ class DebianPackage:
     def from_apt_cache(
         cls, package: str, version: Optional[str] = "", arch: Optional[str] = ""
     ) -> "DebianPackage":
-        """Check whether the package is already installed and return an instance.
+        """Check whether the package is known to apt and return an instance.
+
+        The most recent matching version is returned, without regard to apt pinning.
 
         Args:
             package: a string representing the package
@@ -462,52 +434,362 @@ class DebianPackage:
             arch: an optional architecture, defaulting to `dpkg --print-architecture`.
                 If an architecture is not specified, this will be used for selection.
         """
-        system_arch = check_output(
-            ["dpkg", "--print-architecture"], universal_newlines=True
-        ).strip()
-        arch = arch if arch else system_arch
+        arch = arch if arch else _get_system_arch()
+
+        pkg = _apt_lists.get(package, version, arch)
+        if pkg:
+            return pkg
+
+        # If we didn't find it, fail through
+        raise PackageNotFoundError("Package {}.{} is not in the apt cache!".format(package, arch))
+
+    @classmethod
+    def from_system_bulk(
+        cls, packages: Iterable[str], version: Optional[str] = "", arch: Optional[str] = ""
+    ) -> Dict[str, "DebianPackage"]:
+        """Locates many packages, either on the system or known to apt, at once.
+
+        Installed packages are looked up in the dpkg status database, and the remaining ones in
+        the apt lists, without any subprocess unless the lists are compressed.
+
+        Args:
+            packages: the names of the packages
+            version: an optional string if a specific version is requested
+            arch: an optional architecture, defaulting to `dpkg --print-architecture`. If an
+                architecture is not specified, this will be used for selection.
+
+        Returns:
+            A dict of the packages found, by name. Packages neither installed nor known to apt
+            are left out.
+        """
+        packages = list(packages)
+        found = cls._from_installed_packages(packages, version, arch)
+        missing = [package for package in packages if package not in found]
+        if missing:
+            found.update(cls._from_apt_cache_packages(missing, version, arch))
+        return found
 
-        # Regexps are a really terrible way to do this. Thanks dpkg
-        keys = ("Package", "Architecture", "Version")
+    @classmethod
+    def _from_installed_packages(
+        cls, packages: List[str], version: Optional[str] = "", arch: Optional[str] = ""
+    ) -> Dict[str, "DebianPackage"]:
+        """Looks up installed packages in the dpkg status database.
 
+        Args:
+            packages: the names of the packages
+            version: an optional string if a specific version is requested
+            arch: an optional architecture, defaulting to `dpkg --print-architecture`.
+
+        Returns:
+            A dict of the installed packages, by name
+        """
+        arch = arch if arch else _get_system_arch()
+
+        found = {}
+        for package in packages:
+            pkg = _dpkg_status.get(package, version, arch)
+            if pkg:
+                found[package] = pkg
+        return found
+
+    @classmethod
+    def _from_apt_cache_packages(
+        cls, packages: List[str], version: Optional[str] = "", arch: Optional[str] = ""
+    ) -> Dict[str, "DebianPackage"]:
+        """Looks up packages known to apt in the apt lists.
+
+        Args:
+            packages: the names of the packages
+            version: an optional string if a specific version is requested
+            arch: an optional architecture, defaulting to `dpkg --print-architecture`.
+
+        Returns:
+            A dict of the packages known to apt, by name
+        """
+        arch = arch if arch else _get_system_arch()
+        return _apt_lists.get_many(packages, version, arch)
+
+
+@functools.lru_cache(maxsize=None)
+def _get_system_arch() -> str:
+    """Returns the architecture of the system, only asking `dpkg` once per process."""
+    return check_output(["dpkg", "--print-architecture"], universal_newlines=True).strip()
+
+
+class _DpkgStatus:
+    """An index of the packages installed according to the dpkg status database.
+
+    The database is parsed directly rather than through `dpkg -l`, keyed by package name and
+    architecture, and only parsed again once it was modified. Installed package lookups are
+    then dictionary lookups for the rest of the process.
+    """
+
+    def __init__(self, path: str = DPKG_STATUS):
+        self._path = path
+        self._stamp = None
+        self._index = {}
+
+    def _refresh(self) -> None:
+        """Parse the status database again if it changed since it was last parsed."""
+        try:
+            stat = os.stat(self._path)
+        except OSError:
+            self._stamp, self._index = None, {}
+            return
+
+        # dpkg replaces the database on every change, so the inode changes along with it
+        stamp = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if stamp == self._stamp:
+            return
+
+        with open(self._path, "r", encoding="utf-8", errors="replace") as f:
+            content = f.read()
+
+        index = {}
+        for stanza in content.split("\n\n"):
+            fields = {}
+            for line in stanza.splitlines():
+                # continuation lines of multi-line fields start with a space
+                if line[:1] in ("P", "S", "A", "V"):
+                    key, _, value = line.partition(":")
+                    fields[key] = value.strip()
+
+            if not fields.get("Status", "").endswith(" installed") or "Package" not in fields:
+                continue
+
+            index[(fields["Package"], fields.get("Architecture", ""))] = fields.get("Version", "")
+
+        self._stamp, self._index = stamp, index
+
+    def get(self, package: str, version: str, arch: str) -> Optional["DebianPackage"]:
+        """Return an installed package, or None if it is not installed.
+
+        Args:
+            package: the name of the package, optionally qualified with `:arch`
+            version: an optional string if a specific version is requested
+            arch: the architecture of the package, which may also be `all`
+        """
+        self._refresh()
+
+        name, _, qualifier = package.partition(":")
+        for pkg_arch in (qualifier,) if qualifier else (arch, "all"):
+            full_version = self._index.get((name, pkg_arch))
+            if full_version is None:
+                continue
+
+            epoch, split_version = DebianPackage._get_epoch_from_version(full_version)
+            pkg = DebianPackage(name, split_version, epoch, pkg_arch, PackageState.Present)
+            if version == "" or str(pkg.version) == version:
+                return pkg
+
+        logger.debug("package '%s' is not installed for architecture '%s'", package, arch)
+        return None
+
+
+_dpkg_status = _DpkgStatus()
+
+
+class _AptListsIndex:
+    """An index of the packages available from the apt lists.
+
+    The `*_Packages` lists are memory-mapped and indexed once by package name to the offsets of
+    their stanzas, so that lookups only parse the stanzas of the packages requested rather than
+    forking `apt-cache show`. The index is persisted outside of the lists directory, and rebuilt
+    once any of the lists changes.
+
+    Lists kept compressed, as with `Acquire::GzipIndexes`, cannot be indexed, so lookups fall
+    back to a single `apt-cache show` of all the packages requested at once whenever any list
+    is compressed or no list is present.
+
+    Either way, the most recent version matching the request is returned: apt pinning and the
+    candidate policy are not taken into account.
+    """
+
+    _package_matcher = re.compile(rb"^Package: *(\S+)", re.MULTILINE)
+
+    def __init__(self, lists_dir: str = APT_LISTS, index_path: str = APT_LISTS_INDEX):
+        self._lists_dir = lists_dir
+        self._index_path = index_path
+        self._files = []
+        self._compressed = False
+        self._index = {}
+        self._maps = {}
+
+    def _stamps(self) -> List[List]:
+        """Return the path, mtime and size of every uncompressed list.
+
+        Also records whether any list is compressed.
+        """
+        stamps = []
+        self._compressed = False
+        for path in sorted(glob.glob(os.path.join(self._lists_dir, "*_Packages*"))):
+            if not path.endswith("_Packages"):
+                self._compressed = True
+                continue
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            stamps.append([path, stat.st_mtime_ns, stat.st_size])
+        return stamps
+
+    def _map(self, path: str) -> mmap.mmap:
+        """Return a read-only memory map of a list, kept open for the rest of the process."""
+        if path not in self._maps:
+            with open(path, "rb") as f:
+                self._maps[path] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._maps[path]
+
+    def _refresh(self) -> None:
+        """Load the persisted index, or rebuild it, if the lists changed since it was loaded."""
+        files = self._stamps()
+        if files == self._files:
+            return
+
+        for mapped in self._maps.values():
+            mapped.close()
+        self._maps = {}
+
+        if self._compressed:
+            # looked up through apt-cache instead
+            self._files, self._index = files, {}
+            return
+
+        try:
+            with open(self._index_path, "r") as f:
+                persisted = json.load(f)
+            if persisted["files"] == files:
+                self._files, self._index = files, persisted["packages"]
+                return
+        except (OSError, ValueError, KeyError, TypeError):
+            logger.debug("rebuilding the apt lists index")
+
+        index = {}
+        for n, (path, _, size) in enumerate(files):
+            if not size:
+                continue
+            for match in self._package_matcher.finditer(self._map(path)):
+                index.setdefault(match.group(1).decode(), []).append([n, match.start()])
+
+        self._files, self._index = files, index
+        try:
+            index_dir = os.path.dirname(self._index_path)
+            os.makedirs(index_dir, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=index_dir, prefix=".packages-index")
+            with os.fdopen(fd, "w") as f:
+                json.dump({"files": files, "packages": index}, f)
+            os.replace(tmp_path, self._index_path)
+        except OSError as e:
+            logger.debug("could not persist the apt lists index: %s", e)
+
+    @staticmethod
+    def _fields(raw: str) -> dict:
+        """Parse the fields of a stanza needed to describe a package."""
+        fields = {}
+        for line in raw.splitlines():
+            if line.startswith(("Package:", "Architecture:", "Version:")):
+                key, _, value = line.partition(":")
+                fields[key] = value.strip()
+        return fields
+
+    def _stanza(self, path: str, offset: int) -> dict:
+        """Parse the fields of the stanza of a list starting at an offset."""
+        mapped = self._map(path)
+        end = mapped.find(b"\n\n", offset)
+        raw = mapped[offset : end if end != -1 else len(mapped)]
+        return self._fields(raw.decode("utf-8", errors="replace"))
+
+    def _indexed_stanzas(self, package: str) -> Iterable[dict]:
+        """Yield the fields of the indexed stanzas of a package."""
+        for n, offset in self._index.get(package, []):
+            try:
+                yield self._stanza(self._files[n][0], offset)
+            except (OSError, ValueError):
+                continue
+
+    @classmethod
+    def _apt_cache_stanzas(cls, packages: List[str]) -> Dict[str, List[dict]]:
+        """Return the fields of the stanzas of packages, as shown by a single `apt-cache show`."""
         try:
             output = check_output(
-                ["apt-cache", "show", package], stderr=PIPE, universal_newlines=True
+                ["apt-cache", "show", *packages], stderr=PIPE, universal_newlines=True
             )
         except CalledProcessError as e:
-            raise PackageError(
-                "Could not list packages in apt-cache: {}".format(e.output)
-            ) from None
+            # apt-cache only fails once none of the packages is known
+            output = e.output or ""
 
-        pkg_groups = output.strip().split("\n\n")
-        keys = ("Package", "Architecture", "Version")
+        stanzas = {}
+        for raw in output.strip().split("\n\n"):
+            fields = cls._fields(raw)
+            stanzas.setdefault(fields.get("Package", ""), []).append(fields)
+        return stanzas
 
-        for pkg_raw in pkg_groups:
-            lines = str(pkg_raw).splitlines()
-            vals = {}
-            for line in lines:
-                if line.startswith(keys):
-                    items = line.split(":", 1)
-                    vals[items[0]] = items[1].strip()
-                else:
-                    continue
-
-            epoch, split_version = DebianPackage._get_epoch_from_version(vals["Version"])
+    @staticmethod
+    def _latest(
+        package: str, stanzas: Iterable[dict], version: str, arch: str
+    ) -> Optional["DebianPackage"]:
+        """Return the most recent version of a package among its stanzas matching a request."""
+        candidates = []
+        for fields in stanzas:
+            # the list could have been replaced since it was indexed
+            if fields.get("Package") != package or "Version" not in fields:
+                continue
+
+            epoch, split_version = DebianPackage._get_epoch_from_version(fields["Version"])
             pkg = DebianPackage(
-                vals["Package"],
+                package,
                 split_version,
                 epoch,
-                vals["Architecture"],
+                fields.get("Architecture", ""),
                 PackageState.Available,
             )
-
             if (pkg.arch == "all" or pkg.arch == arch) and (
                 version == "" or str(pkg.version) == version
             ):
-                return pkg
+                candidates.append(pkg)
 
-        # If we didn't find it, fail through
-        raise PackageNotFoundError("Package {}.{} is not in the apt cache!".format(package, arch))
+        if not candidates:
+            logger.debug("package '%s' is not in the apt lists for '%s'", package, arch)
+            return None
+        return max(candidates, key=lambda pkg: pkg.version)
+
+    def get_many(self, packages: List[str], version: str, arch: str) -> Dict[str, "DebianPackage"]:
+        """Return the most recent versions of packages known to apt, by name.
+
+        Args:
+            packages: the names of the packages
+            version: an optional string if a specific version is requested
+            arch: the architecture of the packages, which may also be `all`
+
+        Returns:
+            A dict of the packages known to apt, by name. Unknown packages are left out.
+        """
+        self._refresh()
+
+        if self._compressed or not self._files:
+            stanzas = self._apt_cache_stanzas(packages) if packages else {}
+        else:
+            stanzas = {package: self._indexed_stanzas(package) for package in packages}
+
+        found = {}
+        for package in packages:
+            pkg = self._latest(package, stanzas.get(package, []), version, arch)
+            if pkg:
+                found[package] = pkg
+        return found
+
+    def get(self, package: str, version: str, arch: str) -> Optional["DebianPackage"]:
+        """Return the most recent version of a package known to apt, or None if it is unknown.
+
+        Args:
+            package: the name of the package
+            version: an optional string if a specific version is requested
+            arch: the architecture of the package, which may also be `all`
+        """
+        return self.get_many([package], version, arch).get(package)
+
+
+_apt_lists = _AptListsIndex()
 
 
 class Version:
@@ -518,15 +800,23 @@ class Version:
 
     This class implements the algorithm found here:
     https://www.debian.org/doc/debian-policy/ch-controlfields.html#version
+
+    Each version is parsed once into a sort key, and comparisons only compare the keys.
     """
 
     def __init__(self, version: str, epoch: str):
         self._version = version
         self._epoch = epoch or ""
+        # versions are compared far more often than they are built
+        self._sort_key = self._build_sort_key()
 
     def __repr__(self):
         """Represent the package."""
-        return "<{}.{}: {}>".format(self.__module__, self.__class__.__name__, self.__dict__)
+        return "<{}.{}: {}>".format(
+            self.__module__,
+            self.__class__.__name__,
+            {"_version": self._version, "_epoch": self._epoch},
+        )
 
     def __str__(self):
         """Return human-readable representation of the package."""
@@ -542,7 +832,8 @@ class Version:
         """Returns the version number for a package."""
         return self._version
 
-    def _get_parts(self, version: str) -> Tuple[str, str]:
+    @staticmethod
+    def _get_parts(version: str) -> Tuple[str, str]:
         """Separate the version into component upstream and Debian pieces."""
         try:
             version.rindex("-")
@@ -553,172 +844,73 @@ class Version:
         upstream, debian = version.rsplit("-", 1)
         return upstream, debian
 
-    def _listify(self, revision: str) -> List[str]:
-        """Split a revision string into a listself.
+    @staticmethod
+    def _order(char: str) -> int:
+        """Sort weight of a character in the non-digit parts of a version string.
 
-        This list is comprised of  alternating between strings and numbers,
-        padded on either end to always be "str, int, str, int..." and
-        always be of even length.  This allows us to trivially implement the
-        comparison algorithm described.
+        All the letters sort earlier than all the non-letters, and a tilde sorts before
+        anything, even the end of a part.
         """
-        result = []
-        while revision:
-            rev_1, remains = self._get_alphas(revision)
-            rev_2, remains = self._get_digits(remains)
-            result.extend([rev_1, rev_2])
-            revision = remains
-        return result
-
-    def _get_alphas(self, revision: str) -> Tuple[str, str]:
-        """Return a tuple of the first non-digit characters of a revision."""
-        # get the index of the first digit
-        for i, char in enumerate(revision):
-            if char.isdigit():
-                if i == 0:
-                    return "", revision
-                return revision[0:i], revision[i:]
-        # string is entirely alphas
-        return revision, ""
-
-    def _get_digits(self, revision: str) -> Tuple[int, str]:
-        """Return a tuple of the first integer characters of a revision."""
-        # If the string is empty, return (0,'')
-        if not revision:
-            return 0, ""
-        # get the index of the first non-digit
-        for i, char in enumerate(revision):
-            if not char.isdigit():
-                if i == 0:
-                    return 0, revision
-                return int(revision[0:i]), revision[i:]
-        # string is entirely digits
-        return int(revision), ""
-
-    def _dstringcmp(self, a, b):  # noqa: C901
-        """Debian package version string section lexical sort algorithm.
-
-        The lexical comparison is a comparison of ASCII values modified so
-        that all the letters sort earlier than all the non-letters and so that
-        a tilde sorts before anything, even the end of a part.
-        """
-        if a == b:
-            return 0
-        try:
-            for i, char in enumerate(a):
-                if char == b[i]:
-                    continue
-                # "a tilde sorts before anything, even the end of a part"
-                # (emptyness)
-                if char == "~":
-                    return -1
-                if b[i] == "~":
-                    return 1
-                # "all the letters sort earlier than all the non-letters"
-                if char.isalpha() and not b[i].isalpha():
-                    return -1
-                if not char.isalpha() and b[i].isalpha():
-                    return 1
-                # otherwise lexical sort
-                if ord(char) > ord(b[i]):
-                    return 1
-                if ord(char) < ord(b[i]):
-                    return -1
-        except IndexError:
-            # a is longer than b but otherwise equal, greater unless there are tildes
-            if char == "~":
-                return -1
-            return 1
-        # if we get here, a is shorter than b but otherwise equal, so check for tildes...
-        if b[len(a)] == "~":
-            return 1
-        return -1
-
-    def _compare_revision_strings(self, first: str, second: str):  # noqa: C901
-        """Compare two debian revision strings."""
-        if first == second:
-            return 0
-
-        # listify pads results so that we will always be comparing ints to ints
-        # and strings to strings (at least until we fall off the end of a list)
-        first_list = self._listify(first)
-        second_list = self._listify(second)
-        if first_list == second_list:
-            return 0
-        try:
-            for i, item in enumerate(first_list):
-                # explicitly raise IndexError if we've fallen off the edge of list2
-                if i >= len(second_list):
-                    raise IndexError
-                # if the items are equal, next
-                if item == second_list[i]:
-                    continue
-                # numeric comparison
-                if isinstance(item, int):
-                    if item > second_list[i]:
-                        return 1
-                    if item < second_list[i]:
-                        return -1
-                else:
-                    # string comparison
-                    return self._dstringcmp(item, second_list[i])
-        except IndexError:
-            # rev1 is longer than rev2 but otherwise equal, hence greater
-            # ...except for goddamn tildes
-            if first_list[len(second_list)][0][0] == "~":
-                return 1
-            return 1
-        # rev1 is shorter than rev2 but otherwise equal, hence lesser
-        # ...except for goddamn tildes
-        if second_list[len(first_list)][0][0] == "~":
-            return -1
-        return -1
-
-    def _compare_version(self, other) -> int:
-        if (self.number, self.epoch) == (other.number, other.epoch):
-            return 0
-
-        if self.epoch < other.epoch:
+        if char == "~":
             return -1
-        if self.epoch > other.epoch:
-            return 1
-
-        # If none of these are true, follow the algorithm
-        upstream_version, debian_version = self._get_parts(self.number)
-        other_upstream_version, other_debian_version = self._get_parts(other.number)
-
-        upstream_cmp = self._compare_revision_strings(upstream_version, other_upstream_version)
-        if upstream_cmp != 0:
-            return upstream_cmp
+        if char.isalpha():
+            return ord(char)
+        return ord(char) + 256
 
-        debian_cmp = self._compare_revision_strings(debian_version, other_debian_version)
-        if debian_cmp != 0:
-            return debian_cmp
-
-        return 0
+    @classmethod
+    def _revision_key(cls, revision: str) -> Tuple:
+        """Build the sort key of an upstream or Debian revision string.
+
+        The string is split into alternating non-digit and digit parts. Non-digit parts become
+        tuples of character weights closed by a 0, so that the end of a part sorts after a tilde
+        and before anything else, and digit parts become integers. The key is closed by an empty
+        pair of parts, standing for the end of the string, which sorts after a tilde and before
+        any other character.
+        """
+        key = []
+        for alphas, digits in _REVISION_MATCHER.findall(revision):
+            if alphas or digits:
+                key.append(tuple(cls._order(char) for char in alphas) + (0,))
+                key.append(int(digits) if digits else 0)
+
+        # an empty string compares equal to "0", such as the implicit Debian revision
+        if not key:
+            key = [(0,), 0]
+        key.extend(((0,), 0))
+        return tuple(key)
+
+    def _build_sort_key(self) -> Tuple:
+        """Build the sort key of the version, following the dpkg ordering rules."""
+        upstream_version, debian_version = self._get_parts(self._version)
+        return (
+            int(self._epoch) if self._epoch.isdigit() else 0,
+            self._revision_key(upstream_version),
+            self._revision_key(debian_version),
+        )
 
     def __lt__(self, other) -> bool:
         """Less than magic method impl."""
-        return self._compare_version(other) < 0
+        return self._sort_key < other._sort_key
 
     def __eq__(self, other) -> bool:
         """Equality magic method impl."""
-        return self._compare_version(other) == 0
+        return self._sort_key == other._sort_key
 
     def __gt__(self, other) -> bool:
         """Greater than magic method impl."""
-        return self._compare_version(other) > 0
+        return self._sort_key > other._sort_key
 
     def __le__(self, other) -> bool:
         """Less than or equal to magic method impl."""
-        return self.__eq__(other) or self.__lt__(other)
+        return self._sort_key <= other._sort_key
 
     def __ge__(self, other) -> bool:
         """Greater than or equal to magic method impl."""
-        return self.__gt__(other) or self.__eq__(other)
+        return self._sort_key >= other._sort_key
 
     def __ne__(self, other) -> bool:
         """Not equal to magic method impl."""
-        return not self.__eq__(other)
+        return self._sort_key != other._sort_key
 
 
 def add_package(
@@ -757,24 +949,24 @@ def add_package(
             "Explicit version should not be set if more than one package is being added!"
         )
 
+    found = DebianPackage.from_system_bulk(package_names, version, arch)
     for p in package_names:
-        pkg, success = _add(p, version, arch)
-        if success:
-            packages["success"].append(pkg)
-        else:
-            logger.warning("failed to locate and install/update '%s'", pkg)
+        if p not in found:
+            logger.warning("failed to locate and install/update '%s'", p)
             packages["retry"].append(p)
+    located = [found[p] for p in package_names if p in found]
 
     if packages["retry"] and not cache_refreshed:
         logger.info("updating the apt-cache and retrying installation of failed packages.")
         update()
+        found = DebianPackage.from_system_bulk(packages["retry"], version, arch)
+        located.extend(found[p] for p in packages["retry"] if p in found)
+    packages["failed"] = [p for p in packages["retry"] if p not in found]
 
-        for p in packages["retry"]:
-            pkg, success = _add(p, version, arch)
-            if success:
-                packages["success"].append(pkg)
-            else:
-                packages["failed"].append(p)
+    # every located package is installed in a single apt transaction
+    failed = [pkg.name for pkg in _ensure_all(located, PackageState.Present)]
+    packages["success"] = [pkg for pkg in located if pkg.name not in failed]
+    packages["failed"].extend(failed)
 
     if packages["failed"]:
         raise PackageError("Failed to install packages: {}".format(", ".join(packages["failed"])))
@@ -782,29 +974,6 @@ def add_package(
     return packages["success"] if len(packages["success"]) > 1 else packages["success"][0]
 
 
-def _add(
-    name: str,
-    version: Optional[str] = "",
-    arch: Optional[str] = "",
-) -> Tuple[Union[DebianPackage, str], bool]:
-    """Add a package to the system.
-
-    Args:
-        name: the name(s) of the package(s)
-        version: an (Optional) version as a string. Defaults to the latest known
-        arch: an optional architecture for the package
-
-    Returns: a tuple of `DebianPackage` if found, or a :str: if it is not, and
-        a boolean indicating success
-    """
-    try:
-        pkg = DebianPackage.from_system(name, version, arch)
-        pkg.ensure(state=PackageState.Present)
-        return pkg, True
-    except PackageNotFoundError:
-        return name, False
-
-
 def remove_package(
     package_names: Union[str, List[str]]
 ) -> Union[DebianPackage, List[DebianPackage]]:
@@ -814,30 +983,116 @@ def remove_package(
         package_names: the name of a package
 
     Raises:
-        PackageNotFoundError if the package is not found.
+        PackageError if packages fail to be removed
     """
-    packages = []
-
     package_names = [package_names] if type(package_names) is str else package_names
     if not package_names:
         raise TypeError("Expected at least one package name to add, received zero!")
 
+    installed = DebianPackage._from_installed_packages(package_names)
     for p in package_names:
-        try:
-            pkg = DebianPackage.from_installed_package(p)
-            pkg.ensure(state=PackageState.Absent)
-            packages.append(pkg)
-        except PackageNotFoundError:
+        if p not in installed:
             logger.info("package '%s' was requested for removal, but it was not installed.", p)
 
+    # every installed package is removed in a single apt transaction
+    located = [installed[p] for p in package_names if p in installed]
+    failed = [pkg.name for pkg in _ensure_all(located, PackageState.Absent)]
+    if failed:
+        raise PackageError("Failed to remove packages: {}".format(", ".join(failed)))
+    packages = located
+
     # the list of packages will be empty when no package is removed
     logger.debug("packages: '%s'", packages)
     return packages[0] if len(packages) == 1 else packages
 
 
-def update() -> None:
-    """Update the apt cache via `apt-get update`."""
-    check_call(["apt-get", "update"], stderr=PIPE, stdout=PIPE)
+def _ensure_all(packages: List[DebianPackage], state: PackageState) -> List[DebianPackage]:
+    """Ensure that packages are in a given state, within a single apt transaction.
+
+    Should the transaction fail, the packages are reconciled one by one instead, so that the
+    failure is attributed to the packages which caused it.
+
+    Args:
+        packages: the `DebianPackage` objects to reconcile
+        state: a `PackageState` to reconcile the packages to
+
+    Returns:
+        The packages which could not be reconciled
+    """
+    pending = [pkg for pkg in packages if pkg.state is not state]
+    if not pending:
+        return []
+
+    package_names = ["{}={}".format(pkg.name, pkg.version) for pkg in pending]
+    try:
+        if state in (PackageState.Present, PackageState.Latest):
+            DebianPackage._apt(
+                "install", package_names, optargs=["--option=Dpkg::Options::=--force-confold"]
+            )
+        else:
+            DebianPackage._apt("remove", package_names)
+    except PackageError as e:
+        if len(pending) == 1:
+            logger.warning("could not reconcile '%s': %s", pending[0].name, e.message)
+            return pending
+
+        logger.warning("transaction failed, reconciling packages one by one: %s", e.message)
+        failed = []
+        for pkg in pending:
+            try:
+                pkg.ensure(state)
+            except PackageError as error:
+                logger.warning("could not reconcile '%s': %s", pkg.name, error.message)
+                failed.append(pkg)
+        return failed
+
+    for pkg in pending:
+        pkg._state = state
+    return []
+
+
+def _last_update() -> float:
+    """Return the time apt-get update last succeeded at, or 0 if that is unknown.
+
+    Only the update stamp is trusted: the lists take their mtimes from the Last-Modified
+    header of the mirror, and other files in the lists directory change on their own.
+    """
+    try:
+        return os.stat(APT_UPDATE_STAMP).st_mtime
+    except OSError:
+        return 0.0
+
+
+def update(max_age: Optional[float] = None) -> None:
+    """Update the apt cache via `apt-get update`.
+
+    Concurrent callers are coalesced through a file lock: callers which were waiting for an
+    update in progress skip their own once it succeeded.
+
+    Args:
+        max_age: an (Optional) age in seconds. The update is skipped if `apt-get update`
+            last succeeded more recently than that.
+    """
+    requested = time.time()
+    if max_age is not None and requested - _last_update() < max_age:
+        logger.debug("apt cache is less than %ss old, skipping the update", max_age)
+        return
+
+    with open(APT_UPDATE_LOCK, "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        if _last_update() >= requested:
+            logger.debug("apt cache was updated while waiting for the lock, skipping the update")
+            return
+
+        check_call(["apt-get", "update"], stderr=PIPE, stdout=PIPE)
+
+        # mirrors `APT::Update::Post-Invoke-Success`, which is not configured on every image
+        try:
+            os.makedirs(os.path.dirname(APT_UPDATE_STAMP), exist_ok=True)
+            with open(APT_UPDATE_STAMP, "a"):
+                os.utime(APT_UPDATE_STAMP)
+        except OSError as e:
+            logger.debug("could not touch the apt update stamp: %s", e)
 
 
 def import_key(key: str) -> str:
@@ -875,8 +1130,12 @@ def import_key(key: str) -> str:
             logger.debug("Writing provided PGP key in the binary format")
             key_bytes = key.encode("utf-8")
             key_name = DebianRepository._get_keyid_by_gpg_key(key_bytes)
+            gpg_key_filename = os.path.join(TRUSTED_KEYRING_DIR, "{}.gpg".format(key_name))
+            if os.path.isfile(gpg_key_filename):
+                logger.debug("PGP key %s is already imported", key_name)
+                return gpg_key_filename
+
             key_gpg = DebianRepository._dearmor_gpg_key(key_bytes)
-            gpg_key_filename = "/etc/apt/trusted.gpg.d/{}.gpg".format(key_name)
             DebianRepository._write_apt_gpg_keyfile(
                 key_name=gpg_key_filename, key_material=key_gpg
             )
@@ -884,6 +1143,11 @@ def import_key(key: str) -> str:
         else:
             raise GPGKeyError("ASCII armor markers missing from GPG key")
     else:
+        gpg_key_filename = os.path.join(TRUSTED_KEYRING_DIR, "{}.gpg".format(key))
+        if os.path.isfile(gpg_key_filename):
+            logger.debug("PGP key %s is already imported", key)
+            return gpg_key_filename
+
         logger.warning(
             "PGP key found (looks like Radix64 format). "
             "SECURELY importing PGP key from keyserver; "
@@ -897,7 +1161,6 @@ def import_key(key: str) -> str:
         key_asc = DebianRepository._get_key_by_keyid(key)
         # write the key in GPG format so that apt-key list shows it
         key_gpg = DebianRepository._dearmor_gpg_key(key_asc.encode("utf-8"))
-        gpg_key_filename = "/etc/apt/trusted.gpg.d/{}.gpg".format(key)
         DebianRepository._write_apt_gpg_keyfile(key_name=gpg_key_filename, key_material=key_gpg)
         return gpg_key_filename
 
@@ -1186,7 +1449,8 @@ class RepositoryMapping(Mapping):
 
     Instantiation of `RepositoryMapping` will iterate through the
     filesystem, parse out repository files in `/etc/apt/...`, and create
-    `DebianRepository` objects in this list.
+    `DebianRepository` objects in this list. Parsed files are cached on
+    disk, and only parsed again once they change.
 
     Typical usage:
 
@@ -1197,18 +1461,26 @@ class RepositoryMapping(Mapping):
         ))
     """
 
+    # parsed repository files by path, shared by every mapping of the process
+    _cache = None
+
     def __init__(self):
         self._repository_map = {}
         # Repositories that we're adding -- used to implement mode param
         self.default_file = "/etc/apt/sources.list"
+        self._cache_changed = False
 
-        # read sources.list if it exists
-        if os.path.isfile(self.default_file):
-            self.load(self.default_file)
+        try:
+            # read sources.list if it exists
+            if os.path.isfile(self.default_file):
+                self.load(self.default_file)
 
-        # read sources.list.d
-        for file in glob.iglob("/etc/apt/sources.list.d/*.list"):
-            self.load(file)
+            # read sources.list.d
+            for file in glob.iglob("/etc/apt/sources.list.d/*.list"):
+                self.load(file)
+        finally:
+            if self._cache_changed:
+                self._save_cache()
 
     def __contains__(self, key: str) -> bool:
         """Magic method for checking presence of repo in mapping."""
@@ -1230,13 +1502,67 @@ class RepositoryMapping(Mapping):
         """Add a `DebianRepository` to the cache."""
         self._repository_map[repository_uri] = repository
 
+    @classmethod
+    def _load_cache(cls) -> dict:
+        """Return the parsed repository files, read from disk once per process."""
+        if cls._cache is None:
+            try:
+                with open(REPOSITORY_CACHE, "r") as f:
+                    cls._cache = json.load(f)
+            except (OSError, ValueError):
+                cls._cache = {}
+        return cls._cache
+
+    def _save_cache(self) -> None:
+        """Persist the parsed repository files, so that later hooks only parse changed files."""
+        try:
+            fd, tmp_path = tempfile.mkstemp(
+                dir=os.path.dirname(REPOSITORY_CACHE), prefix=".charm-sources-"
+            )
+            with os.fdopen(fd, "w") as f:
+                json.dump(self._load_cache(), f)
+            os.replace(tmp_path, REPOSITORY_CACHE)
+        except OSError as e:
+            logger.debug("could not persist the parsed repositories: %s", e)
+
+    def _load_cached(self, filename: str, stamp: List[int]) -> bool:
+        """Load a repository source file from the cache, if it did not change since it was parsed.
+
+        Args:
+          filename: the path to the repository file
+          stamp: the mtime and size of the repository file
+
+        Returns:
+          Whether the file was loaded from the cache
+        """
+        entry = self._load_cache().get(filename)
+        if not entry or entry.get("stamp") != stamp:
+            return False
+
+        for repo_identifier, fields in entry["repositories"]:
+            # repositories are mutable, so every mapping gets its own copies
+            self._repository_map[repo_identifier] = DebianRepository(**copy.deepcopy(fields))
+        logger.debug("loaded %d cached apt package repositories", len(entry["repositories"]))
+        return True
+
     def load(self, filename: str):
         """Load a repository source file into the cache.
 
+        Files which did not change since they were last parsed are loaded from the cache.
+
         Args:
           filename: the path to the repository file
         """
+        try:
+            stat = os.stat(filename)
+            stamp = [stat.st_mtime_ns, stat.st_size]
+        except OSError:
+            stamp = None
+        if stamp and self._load_cached(filename, stamp):
+            return
+
         parsed = []
+        repositories = []
         skipped = []
         with open(filename, "r") as f:
             for n, line in enumerate(f):
@@ -1248,6 +1574,7 @@ class RepositoryMapping(Mapping):
                     repo_identifier = "{}-{}-{}".format(repo.repotype, repo.uri, repo.release)
                     self._repository_map[repo_identifier] = repo
                     parsed.append(n)
+                    repositories.append([repo_identifier, self._fields(repo)])
                     logger.debug("parsed repo: '%s'", repo_identifier)
 
         if skipped:
@@ -1259,6 +1586,26 @@ class RepositoryMapping(Mapping):
         else:
             raise InvalidSourceError("all repository lines in '{}' were invalid!".format(filename))
 
+        if stamp:
+            self._load_cache()[filename] = {"stamp": stamp, "repositories": repositories}
+            self._cache_changed = True
+
+    @staticmethod
+    def _fields(repo: DebianRepository) -> dict:
+        """Return a copy of the constructor arguments of a `DebianRepository`."""
+        return copy.deepcopy(
+            {
+                "enabled": repo.enabled,
+                "repotype": repo.repotype,
+                "uri": repo.uri,
+                "release": repo.release,
+                "groups": repo.groups,
+                "filename": repo.filename,
+                "gpg_key_filename": repo.gpg_key,
+                "options": repo.options,
+            }
+        )
+
     @staticmethod
     def _parse(line: str, filename: str) -> DebianRepository:
         """Parse a line in a sources.list file.
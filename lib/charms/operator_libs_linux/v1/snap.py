@@ -54,9 +54,21 @@ try:
 except snap.SnapError as e:
     logger.error("An exception occurred when installing snaps. Reason: %s" % e.message)
 ```
+
+Snaps can also be installed, refreshed, or removed without waiting for snapd, through
+:meth:`add_async` and :meth:`remove_async`. These start snapd changes, which can be polled
+from later hooks with :meth:`change_ready`:
+
+```python
+change_ids = snap.add_async(["nextcloud", "charmcraft"])
+...
+if all(snap.change_ready(change_id) for change_id in change_ids):
+    logger.info("snaps are installed")
+```
 """
 
 import http.client
+import io
 import json
 import logging
 import os
@@ -64,6 +76,8 @@ import re
 import socket
 import subprocess
 import sys
+import threading
+import time
 import urllib.error
 import urllib.parse
 import urllib.request
@@ -71,7 +85,7 @@ from collections.abc import Mapping
 from datetime import datetime, timedelta, timezone
 from enum import Enum
 from subprocess import CalledProcessError, CompletedProcess
-from typing import Any, Dict, Iterable, List, Optional, Union
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
 
 logger = logging.getLogger(__name__)
 
@@ -83,8 +97,15 @@ LIBAPI = 1
 
 # Increment this PATCH version before using `charmcraft publish-lib` or reset
 # to 0 if you are raising the major API version
-LIBPATCH = 12
+LIBPATCH = 17
+
 
+# seconds between polls of a snapd change
+CHANGE_POLL_INTERVAL = 0.5
+# seconds a snap operation waits for its snapd change to complete
+CHANGE_TIMEOUT = 1200
+# error kind snapd answers a refresh of an up to date snap with, as the `snap` command did
+NO_UPDATE_AVAILABLE = "snap-no-update-available"
 
 # Regex to locate 7-bit C1 ANSI sequences
 ansi_filter = re.compile(r"\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])")
@@ -178,6 +199,7 @@ class SnapAPIError(Error):
     def __init__(self, body: Dict, code: int, status: str, message: str):
         super().__init__(message)  # Makes str(e) return message
         self.body = body
+        self.kind = body.get("kind", "") if isinstance(body, dict) else ""
         self.code = code
         self.status = status
         self._message = message
@@ -423,6 +445,35 @@ class Snap(object):
         args = ["restart", "--reload"] if reload else ["restart"]
         self._snap_daemons(args, services)
 
+    def _snap_action(self, action: str, options: Optional[Dict] = None) -> str:
+        """Perform a snap operation through the snapd API, waiting for its change to complete.
+
+        Args:
+          action: the action to perform, such as `install`, `refresh` or `remove`
+          options: an (optional) dict of the options of the action, such as its channel
+
+        Returns:
+          The ID of the completed change, or an empty string if the snap was already up to date
+
+        Raises:
+          SnapError if snapd rejected the operation, or its change failed or did not
+            complete within `CHANGE_TIMEOUT`
+        """
+        try:
+            change_id = self._snap_client.snap_action(action, [self._name], options)
+        except SnapAPIError as e:
+            if e.kind == NO_UPDATE_AVAILABLE:
+                logger.debug("snap %s is already up to date", self._name)
+                return ""
+            raise SnapError(
+                "Snap: {!r}; {} failed: {}".format(
+                    self._name, action, e.body.get("message", e.message)
+                )
+            )
+
+        self._snap_client.wait_change(change_id, timeout=CHANGE_TIMEOUT)
+        return change_id
+
     def _install(
         self,
         channel: Optional[str] = "",
@@ -438,17 +489,15 @@ class Snap(object):
         """
         cohort = cohort or self._cohort
 
-        args = []
-        if self.confinement == "classic":
-            args.append("--classic")
-        if channel:
-            args.append('--channel="{}"'.format(channel))
-        if revision:
-            args.append('--revision="{}"'.format(revision))
-        if cohort:
-            args.append('--cohort="{}"'.format(cohort))
-
-        self._snap("install", args)
+        self._snap_action(
+            "install",
+            _action_options(
+                channel=channel,
+                classic=self.confinement == "classic",
+                cohort=cohort,
+                revision=revision,
+            ),
+        )
 
     def _refresh(
         self,
@@ -465,27 +514,23 @@ class Snap(object):
           revision: optionally, specify the revision of the snap to refresh
           leave_cohort: leave the current cohort.
         """
-        args = []
-        if channel:
-            args.append('--channel="{}"'.format(channel))
-
-        if revision:
-            args.append('--revision="{}"'.format(revision))
-
         if not cohort:
             cohort = self._cohort
 
         if leave_cohort:
             self._cohort = ""
-            args.append("--leave-cohort")
-        elif cohort:
-            args.append('--cohort="{}"'.format(cohort))
+            cohort = ""
 
-        self._snap("refresh", args)
+        self._snap_action(
+            "refresh",
+            _action_options(
+                channel=channel, cohort=cohort, revision=revision, leave_cohort=leave_cohort
+            ),
+        )
 
     def _remove(self) -> str:
         """Remove a snap from the system."""
-        return self._snap("remove")
+        return self._snap_action("remove")
 
     @property
     def name(self) -> str:
@@ -645,12 +690,63 @@ class _UnixSocketHandler(urllib.request.AbstractHTTPHandler):
         return self.do_open(_UnixSocketConnection, req, socket_path=self.socket_path)
 
 
+class _UnixSocketPool:
+    """A pool of keep-alive HTTP/1.1 connections to a named Unix socket.
+
+    Connections are handed back to the pool once their response was fully read, so that
+    consecutive requests reuse them rather than connecting to the socket every time.
+    """
+
+    def __init__(self, socket_path: str, size: int = 4):
+        self.socket_path = socket_path
+        self.size = size
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def get(self, timeout: float) -> Tuple[_UnixSocketConnection, bool]:
+        """Return an idle connection, or a new one, and whether it was reused."""
+        with self._lock:
+            conn = self._idle.pop() if self._idle else None
+
+        if conn is None:
+            return _UnixSocketConnection("localhost", timeout, socket_path=self.socket_path), False
+
+        conn.timeout = timeout
+        if conn.sock is not None:
+            conn.sock.settimeout(timeout)
+        return conn, True
+
+    def put(self, conn: _UnixSocketConnection) -> None:
+        """Hand a connection back to the pool, closing it if the pool is full."""
+        with self._lock:
+            if len(self._idle) < self.size:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+
+# connection pools by socket path, shared by every client of the process
+_pools: Dict[str, _UnixSocketPool] = {}
+_pools_lock = threading.Lock()
+
+
+def _get_pool(socket_path: str) -> _UnixSocketPool:
+    """Return the connection pool of a socket path."""
+    with _pools_lock:
+        if socket_path not in _pools:
+            _pools[socket_path] = _UnixSocketPool(socket_path)
+        return _pools[socket_path]
+
+
 class SnapClient:
     """Snapd API client to talk to HTTP over UNIX sockets.
 
     In order to avoid shelling out and/or involving sudo in calling the snapd API,
     use a wrapper based on the Pebble Client, trimmed down to only the utility methods
     needed for talking to snapd.
+
+    Unless an opener is given, requests go through keep-alive connections pooled by socket
+    path, which are reused by every client of the process.
     """
 
     def __init__(
@@ -664,14 +760,14 @@ class SnapClient:
 
         Args:
             socket_path: a path to the socket on the filesystem. Defaults to /run/snap/snapd.socket
-            opener: specifies an opener for unix socket, if unspecified a default is used
+            opener: specifies an opener for unix socket, if unspecified pooled keep-alive
+                connections are used
             base_url: base url for making requests to the snap client. Defaults to
                 http://localhost/v2/
             timeout: timeout in seconds to use when making requests to the API. Default is 5.0s.
         """
-        if opener is None:
-            opener = self._get_default_opener(socket_path)
         self.opener = opener
+        self.pool = _get_pool(socket_path) if opener is None else None
         self.base_url = base_url
         self.timeout = timeout
 
@@ -716,13 +812,16 @@ class SnapClient:
         headers: Dict = None,
         data: bytes = None,
     ) -> http.client.HTTPResponse:
-        """Make a request to the Snapd server; return the raw HTTPResponse object."""
+        """Make a request to the Snapd server; return the raw response object."""
         url = self.base_url + path
         if query:
             url = url + "?" + urllib.parse.urlencode(query)
 
         if headers is None:
             headers = {}
+        if self.pool is not None:
+            return self._request_pooled(method, url, headers, data)
+
         request = urllib.request.Request(url, method=method, data=data, headers=headers)
 
         try:
@@ -742,6 +841,50 @@ class SnapClient:
             raise SnapAPIError({}, 500, "Not found", e.reason)
         return response
 
+    def _request_pooled(
+        self, method: str, url: str, headers: Dict, data: Optional[bytes]
+    ) -> io.BytesIO:
+        """Make a request over a pooled keep-alive connection; return the response body.
+
+        The body is read in full, so that the connection can be handed back to the pool
+        straight away. A reused connection which snapd closed in the meantime is retried once
+        over a new connection.
+        """
+        parsed = urllib.parse.urlsplit(url)
+        target = parsed.path + ("?" + parsed.query if parsed.query else "")
+
+        while True:
+            conn, reused = self.pool.get(self.timeout)
+            try:
+                conn.request(method, target, body=data, headers=headers)
+                response = conn.getresponse()
+                body = response.read()
+            except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError) as e:
+                conn.close()
+                if reused:
+                    continue
+                raise SnapAPIError({}, 500, "Not found", str(e))
+            except (OSError, http.client.HTTPException) as e:
+                conn.close()
+                raise SnapAPIError({}, 500, "Not found", str(e))
+            break
+
+        if response.will_close:
+            conn.close()
+        else:
+            self.pool.put(conn)
+
+        if response.status >= 400:
+            message = ""
+            try:
+                result = json.loads(body.decode())["result"]
+            except (ValueError, KeyError) as e:
+                # Will only happen if snapd sends invalid JSON.
+                result = {}
+                message = "{} - {}".format(type(e).__name__, e)
+            raise SnapAPIError(result, response.status, response.reason, message)
+        return io.BytesIO(body)
+
     def get_installed_snaps(self) -> Dict:
         """Get information about currently installed snaps."""
         return self._request("GET", "snaps")
@@ -754,6 +897,80 @@ class SnapClient:
         """Query the snap server for apps belonging to a named, currently installed snap."""
         return self._request("GET", "apps", {"names": name, "select": "service"})
 
+    def snap_action(self, action: str, names: List[str], options: Optional[Dict] = None) -> str:
+        """Start a change performing an action on one or more snaps, without waiting for it.
+
+        A single snap is acted on through its own endpoint, which accepts options such as its
+        channel. Several snaps are acted on within a single change through the multi-snap
+        endpoint, which accepts no options.
+
+        Args:
+            action: the action to perform, such as `install`, `refresh` or `remove`
+            names: the names of the snaps to act on
+            options: an (optional) dict of the options of the action, for a single snap
+
+        Returns:
+            The ID of the change, to poll with `get_change`
+        """
+        if len(names) == 1:
+            body = {"action": action, **(options or {})}
+            path = "snaps/{}".format(names[0])
+        elif options:
+            raise TypeError("Options can only be given when acting on a single snap!")
+        else:
+            body = {"action": action, "snaps": names}
+            path = "snaps"
+
+        response = self._request_raw(
+            "POST",
+            path,
+            headers={"Accept": "application/json", "Content-Type": "application/json"},
+            data=json.dumps(body).encode("utf-8"),
+        )
+        return json.loads(response.read().decode())["change"]
+
+    def get_change(self, change_id: str) -> Dict:
+        """Query the snap server for the progress of a change."""
+        return self._request("GET", "changes/{}".format(change_id))
+
+    def wait_change(
+        self,
+        change_id: str,
+        timeout: Optional[float] = None,
+        interval: Optional[float] = None,
+    ) -> Dict:
+        """Poll a change until it is ready.
+
+        Args:
+            change_id: the ID of the change
+            timeout: an (optional) number of seconds to wait for. Waits until it is ready
+                by default, as the `snap` command does
+            interval: an (optional) number of seconds between polls. Defaults to
+                `CHANGE_POLL_INTERVAL`
+
+        Returns:
+            The completed change
+
+        Raises:
+            SnapError if the change failed, or did not complete within the timeout
+        """
+        interval = interval or CHANGE_POLL_INTERVAL
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while True:
+            change = self.get_change(change_id)
+            if change.get("ready"):
+                if change.get("status") != "Done":
+                    raise SnapError(
+                        "Change {} ({}) failed: {}".format(
+                            change_id, change.get("summary", ""), change.get("err", "")
+                        )
+                    )
+                return change
+
+            if deadline is not None and time.monotonic() > deadline:
+                raise SnapError("Change {} did not complete in {}s".format(change_id, timeout))
+            time.sleep(interval)
+
 
 class SnapCache(Mapping):
     """An abstraction to represent installed/available packages.
@@ -979,6 +1196,151 @@ def _wrap_snap_operations(
     return snaps["success"] if len(snaps["success"]) > 1 else snaps["success"][0]
 
 
+def _action_options(
+    channel: Optional[str] = "",
+    classic: Optional[bool] = False,
+    cohort: Optional[str] = "",
+    revision: Optional[int] = None,
+    leave_cohort: Optional[bool] = False,
+) -> Dict:
+    """Build the snapd API options of an install or refresh action."""
+    options = {}
+    if channel:
+        options["channel"] = channel
+    if classic:
+        options["classic"] = True
+    if revision:
+        options["revision"] = str(revision)
+    if leave_cohort:
+        options["leave-cohort"] = True
+    elif cohort:
+        options["cohort-key"] = cohort
+    return options
+
+
+@_cache_init
+def add_async(
+    snap_names: Union[str, List[str]],
+    channel: Optional[str] = "",
+    classic: Optional[bool] = False,
+    cohort: Optional[str] = "",
+    revision: Optional[int] = None,
+) -> List[str]:
+    """Start installing or refreshing snaps, without waiting for snapd to complete.
+
+    Snaps which are not installed yet are installed, and the others are refreshed. Without
+    options, all the snaps of each action are handled by a single change. With options, each
+    snap gets a change of its own, as the multi-snap endpoint of snapd accepts none.
+
+    Args:
+        snap_names: the name or names of the snaps to install or refresh
+        channel: an (Optional) channel as a string. Defaults to the snap's default channel
+        classic: an (Optional) boolean specifying whether it should be added with classic
+            confinement. Default `False`
+        cohort: an (Optional) string specifying the snap cohort to use
+        revision: an (Optional) integer specifying the snap revision to use
+
+    Returns:
+        The IDs of the changes started, to poll with `change_ready` or wait for with
+        `wait_change`. Up to date snaps need no change, and get none
+
+    Raises:
+        SnapError if snapd rejected the changes
+    """
+    snap_names = [snap_names] if type(snap_names) is str else snap_names
+    if not snap_names:
+        raise TypeError("Expected at least one snap to add, received zero!")
+
+    actions = {"install": [], "refresh": []}
+    for name in snap_names:
+        snap = _Cache.cache._snap_map.get(name)
+        actions["refresh" if snap is not None and snap.present else "install"].append(name)
+
+    change_ids = []
+    for action, names in actions.items():
+        options = _action_options(
+            channel=channel,
+            classic=classic and action == "install",
+            cohort=cohort,
+            revision=revision,
+        )
+        change_ids.extend(_start_changes(action, names, options))
+    return change_ids
+
+
+@_cache_init
+def remove_async(snap_names: Union[str, List[str]]) -> List[str]:
+    """Start removing snaps in a single change, without waiting for snapd to complete.
+
+    Args:
+        snap_names: the name or names of the snaps to remove
+
+    Returns:
+        The IDs of the changes started, to poll with `change_ready` or wait for with
+        `wait_change`
+
+    Raises:
+        SnapError if snapd rejected the change
+    """
+    snap_names = [snap_names] if type(snap_names) is str else snap_names
+    if not snap_names:
+        raise TypeError("Expected at least one snap to remove, received zero!")
+
+    return _start_changes("remove", snap_names, {})
+
+
+def _start_changes(action: str, snap_names: List[str], options: Dict) -> List[str]:
+    """Start the changes performing an action on snaps, a single one unless options are set."""
+    if not snap_names:
+        return []
+
+    client = SnapClient()
+    batches = [[name] for name in snap_names] if options else [snap_names]
+    change_ids = []
+    for batch in batches:
+        try:
+            change_ids.append(client.snap_action(action, batch, options))
+        except SnapAPIError as e:
+            if e.kind == NO_UPDATE_AVAILABLE:
+                logger.debug("snap(s) %s already up to date", ", ".join(batch))
+                continue
+            raise SnapError(
+                "Could not {} snap(s) {}: {}".format(
+                    action, ", ".join(batch), e.body.get("message", e.message)
+                )
+            )
+    return change_ids
+
+
+def change_ready(change_id: str) -> bool:
+    """Report whether a change started by `add_async` or `remove_async` is ready.
+
+    Raises:
+        SnapError if the change failed
+    """
+    change = SnapClient().get_change(change_id)
+    if change.get("ready") and change.get("status") != "Done":
+        raise SnapError(
+            "Change {} ({}) failed: {}".format(
+                change_id, change.get("summary", ""), change.get("err", "")
+            )
+        )
+    return bool(change.get("ready"))
+
+
+def wait_change(change_id: str, timeout: Optional[float] = None) -> None:
+    """Wait for a change started by `add_async` or `remove_async` to complete.
+
+    Args:
+        change_id: the ID of the change
+        timeout: an (optional) number of seconds to wait for. Waits until it is ready by default
+
+    Raises:
+        SnapError if the change failed, or did not complete within the timeout
+    """
+    SnapClient().wait_change(change_id, timeout=timeout)
+
+
 def install_local(
     filename: str, classic: Optional[bool] = False, dangerous: Optional[bool] = False
 ) -> Snap:
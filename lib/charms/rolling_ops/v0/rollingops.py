@@ -63,19 +63,58 @@ the CLI:
 juju run-action some-charm/0 some-charm/1 <... some-charm/n> restart
 ```
 
+Units are granted the lock in batches of up to `max_concurrent` units (one by default), and
+the next batch is only granted once every unit of the current batch has released its lock.
+`max_concurrent` is either a count of units or a percentage of them, such as "10%". The leader
+can override it for a single rolling operation by setting `<relation>-max-concurrent` in the
+application data of the relation, which is cleared again once the operation has finished.
+
+The leader can also space out batches by setting `<relation>-interval` in the application data
+to a number of seconds. Each time a lock is released, the leader records a not-before time in
+`<relation>-not-before`, and only grants the next batch once it has passed. Rather than
+sleeping in a hook, the leader then waits with a detached timer process, which dispatches a
+process locks event through `juju-exec` once the interval is over. A
+callback that defers its event keeps holding the lock, and is re-run with the deferred event
+until it completes. This can be used to gate the rest of the rolling operation on the health
+of the unit:
+
+```python
+    def _restart(self, event):
+        systemd.service_restart('foo')
+        if not systemd.service_running('foo'):
+            event.defer()  # keep the lock, and retry on the next hook
+```
+
 Note that all units that plan to restart must receive the action and emit the aquire
 event. Any units that do not run their acquire handler will be left out of the rolling
 restart. (An operator might take advantage of this fact to recover from a failed rolling
 operation without restarting workloads that were able to successfully restart -- simply
 omit the successful units from a subsequent run-action call.)
 
+Alternatively, the leader can request the lock on behalf of every unit, such as from a
+leader-only action, with `request_all`:
+
+```python
+    def _on_trigger_restart(self, event):
+        self.restart_manager.request_all()
+```
+
+The leader publishes the request in `<relation>-request` of the application data, and each
+unit acquires the lock once it sees the request. The leader only grants the lock once every
+unit has acknowledged the request, so that batches are formed from all of the units.
+
 """
 import logging
+import math
+import shlex
+import shutil
+import subprocess
+import time
 from enum import Enum
-from typing import AnyStr, Callable, Optional
+from typing import AnyStr, Callable, Optional, Union
 
 from ops.charm import ActionEvent, CharmBase, RelationChangedEvent
-from ops.framework import EventBase, Object
+from ops.framework import EventBase, Object, StoredState
 from ops.model import ActiveStatus, MaintenanceStatus, WaitingStatus
 
 logger = logging.getLogger(__name__)
@@ -88,7 +127,7 @@ LIBAPI = 0
 
 # Increment this PATCH version before using `charmcraft publish-lib` or reset
 # to 0 if you are raising the major API version
-LIBPATCH = 5
+LIBPATCH = 12
 
 
 class LockNoRelationError(Exception):
@@ -278,10 +317,35 @@ class ProcessLocks(EventBase):
     pass
 
 
+class _RollingOpsState(Object):
+    """State of a rolling ops manager kept across hooks, under the name of its relation."""
+
+    _stored = StoredState()
+
+    def __init__(self, manager: Object, name: str):
+        super().__init__(manager, name)
+        self._stored.set_default(run_with_lock_deferred=False)
+
+    @property
+    def run_with_lock_deferred(self) -> bool:
+        """Whether the last run with lock event was deferred, to be re-run."""
+        return self._stored.run_with_lock_deferred
+
+    @run_with_lock_deferred.setter
+    def run_with_lock_deferred(self, deferred: bool) -> None:
+        self._stored.run_with_lock_deferred = deferred
+
+
 class RollingOpsManager(Object):
     """Emitters and handlers for rolling ops."""
 
-    def __init__(self, charm: CharmBase, relation: AnyStr, callback: Callable):
+    def __init__(
+        self,
+        charm: CharmBase,
+        relation: AnyStr,
+        callback: Callable,
+        max_concurrent: Union[int, str] = 1,
+    ):
         """Register our custom events.
 
         params:
@@ -291,6 +355,8 @@ class RollingOpsManager(Object):
                 distinct from other instances that may be hanlding other events.
             callback: a closure to run when we have a lock. (It must take a CharmBase object and
                 EventBase object as args.)
+            max_concurrent: the maximum number of units granted the lock in the same batch,
+                either as a count of units or as a percentage of them, e.g. "10%".
         """
         # "Inherit" from the charm's class. This gives us access to the framework as
         # self.framework, as well as the self.model shortcut.
@@ -298,7 +364,9 @@ class RollingOpsManager(Object):
 
         self.name = relation
         self._callback = callback
+        self.max_concurrent = max_concurrent
         self.charm = charm  # Maintain a reference to charm, so we can emit events.
+        self._state = _RollingOpsState(self, relation)
 
         charm.on.define_event("{}_run_with_lock".format(self.name), RunWithLock)
         charm.on.define_event("{}_acquire_lock".format(self.name), AcquireLock)
@@ -309,6 +377,7 @@ class RollingOpsManager(Object):
         self.framework.observe(charm.on[self.name].acquire_lock, self._on_acquire_lock)
         self.framework.observe(charm.on[self.name].run_with_lock, self._on_run_with_lock)
         self.framework.observe(charm.on[self.name].process_locks, self._on_process_locks)
+        self.framework.observe(charm.on.update_status, self._on_update_status)
 
     def _callback(self: CharmBase, event: EventBase) -> None:
         """Placeholder for the function that actually runs our event.
@@ -317,26 +386,180 @@ class RollingOpsManager(Object):
         """
         raise NotImplementedError
 
+    @property
+    def _max_concurrent_key(self) -> str:
+        return "{}-max-concurrent".format(self.name)
+
+    @property
+    def _interval_key(self) -> str:
+        return "{}-interval".format(self.name)
+
+    @property
+    def _not_before_key(self) -> str:
+        return "{}-not-before".format(self.name)
+
+    @property
+    def _wakeup_key(self) -> str:
+        return "{}-wakeup".format(self.name)
+
+    @property
+    def _request_key(self) -> str:
+        return "{}-request".format(self.name)
+
+    @property
+    def _request_callback_key(self) -> str:
+        return "{}-request-callback".format(self.name)
+
+    def request_all(self, callback_override: Optional[str] = None) -> None:
+        """Request the lock on behalf of every unit of the relation.
+
+        Runs only on the leader. Each unit, the leader included, acquires the lock once it
+        sees the request, with the given callback.
+
+        params:
+            callback_override: the name of the charm method to run with the lock, instead of
+                the callback of the manager.
+        """
+        if not self.model.unit.is_leader():
+            raise RuntimeError("Only the leader can request the lock for every unit")
+
+        relation = self.model.get_relation(self.name)
+        if not relation:
+            raise LockNoRelationError()
+
+        relation.data[self.model.app].update(
+            {
+                self._request_key: str(time.time()),
+                self._request_callback_key: callback_override or "",
+            }
+        )
+        # the leader is not notified of its own changes to the application data
+        self._follow_request()
+
+    def _follow_request(self) -> None:
+        """Acquire the lock for a request of the leader that this unit has not followed yet."""
+        relation = self.model.get_relation(self.name)
+        request = relation.data[self.model.app].get(self._request_key, "")
+        if not request or relation.data[self.model.unit].get("request", "") == request:
+            return
+
+        relation.data[self.model.unit].update({"request": request})
+        self.charm.on[self.name].acquire_lock.emit(
+            callback_override=relation.data[self.model.app].get(self._request_callback_key)
+        )
+
+    def _request_pending(self, units) -> bool:
+        """Whether some of the units have not followed the current request of the leader yet."""
+        relation = self.model.get_relation(self.name)
+        if not (request := relation.data[self.model.app].get(self._request_key, "")):
+            return False
+
+        return any(relation.data[unit].get("request", "") != request for unit in units)
+
+    def _schedule_process_locks(self, at: float) -> None:
+        """Dispatch a process locks event on this unit once the given time has passed.
+
+        Juju has no timers, so a detached process waits until then and dispatches the event
+        through juju-exec (juju-run on Juju 2.9), leaving the unit free to run other hooks.
+        The wakeup time is recorded until the locks are processed, and a wakeup left in the
+        past by a timer that died, or by a change of leader, is picked up on update-status.
+
+        params:
+            at: the unix timestamp after which to process the locks again.
+        """
+        app_data = self.model.get_relation(self.name).data[self.model.app]
+        wakeup = float(app_data.get(self._wakeup_key) or 0)
+        if wakeup >= at and wakeup > time.time():
+            # A timer is already running. Timers due in the past are presumed dead.
+            return
+
+        juju_exec = shutil.which("juju-exec") or shutil.which("juju-run")
+        if not juju_exec:
+            logger.warning("No juju-exec found, rolling {} resumes on next hook".format(self.name))
+            return
+
+        delay = max(math.ceil(at - time.time()), 0)
+        dispatch = "JUJU_DISPATCH_PATH=hooks/{}_process_locks ./dispatch".format(self.name)
+        subprocess.Popen(
+            [
+                "/bin/sh",
+                "-c",
+                "sleep {} && {} {} {}".format(
+                    delay,
+                    shlex.quote(juju_exec),
+                    shlex.quote(self.model.unit.name),
+                    shlex.quote(dispatch),
+                ),
+            ],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True,
+        )
+        app_data.update({self._wakeup_key: str(at)})
+
+    def _run_with_lock_deferred(self) -> bool:
+        """Whether a run with lock event of this manager is deferred, waiting to be re-run."""
+        return self._state.run_with_lock_deferred
+
+    def _batch_size(self, units: int) -> int:
+        """Resolve the number of units to grant the lock to in the next batch.
+
+        params:
+            units: the total number of units taking part in the relation.
+        """
+        relation = self.model.get_relation(self.name)
+        value = str(
+            relation.data[self.model.app].get(self._max_concurrent_key) or self.max_concurrent
+        ).strip()
+
+        try:
+            if value.endswith("%"):
+                size = int(units * float(value[:-1]) / 100)
+            else:
+                size = int(value)
+        except ValueError:
+            logger.warning("Invalid max-concurrent value {}, using 1".format(value))
+            size = 1
+
+        return max(size, 1)
+
     def _on_relation_changed(self: CharmBase, event: RelationChangedEvent):
         """Process relation changed.
 
-        First, determine whether this unit has been granted a lock. If so, emit a RunWithLock
-        event.
+        First, acquire the lock if the leader requested it for every unit. Then determine
+        whether this unit has been granted a lock. If so, emit a RunWithLock event, unless one
+        is already deferred and will be re-run.
 
         Then, if we are the leader, fire off a process locks event.
 
         """
+        self._follow_request()
         lock = Lock(self)
 
         if lock.is_pending():
             self.model.unit.status = WaitingStatus("Awaiting {} operation".format(self.name))
 
-        if lock.is_held():
+        if lock.is_held() and not self._run_with_lock_deferred():
             self.charm.on[self.name].run_with_lock.emit()
 
         if self.model.unit.is_leader():
             self.charm.on[self.name].process_locks.emit()
 
+    def _on_update_status(self: CharmBase, event: EventBase):
+        """Process locks on the leader if a scheduled wakeup is overdue.
+
+        A wakeup is overdue when the timer dispatching it died, or when leadership moved to
+        another unit before it fired, which would otherwise stall the rolling operation.
+        """
+        if not self.model.unit.is_leader() or not (relation := self.model.get_relation(self.name)):
+            return
+
+        wakeup = float(relation.data[self.model.app].get(self._wakeup_key) or 0)
+        if wakeup and time.time() >= wakeup:
+            logger.info("Rolling {} wakeup is overdue, processing locks".format(self.name))
+            self.charm.on[self.name].process_locks.emit()
+
     def _on_process_locks(self: CharmBase, event: ProcessLocks):
         """Process locks.
 
@@ -347,14 +570,19 @@ class RollingOpsManager(Object):
             return
 
         pending = []
+        locks = Locks(self)
+        app_data = self.model.get_relation(self.name).data[self.model.app]
 
-        for lock in Locks(self):
+        for lock in locks:
             if lock.is_held():
-                # One of our units has the lock -- return without further processing.
+                # Units of the current batch still hold the lock -- return without further
+                # processing.
                 return
 
             if lock.release_requested():
                 lock.clear()  # Updates relation data
+                if interval := int(app_data.get(self._interval_key) or 0):
+                    app_data.update({self._not_before_key: str(time.time() + interval)})
 
             if lock.is_pending():
                 if lock.unit == self.model.unit:
@@ -363,26 +591,72 @@ class RollingOpsManager(Object):
                 else:
                     pending.append(lock)
 
+        if self._request_pending(locks.units):
+            # Wait for every unit to follow the request of the leader, so that the batches
+            # are formed from all of them.
+            return
+
         # If we reach this point, and we have pending units, we want to grant a lock to
-        # one of them.
+        # the next batch of them, once the interval since the last batch has passed.
         if pending:
+            not_before = float(app_data.get(self._not_before_key) or 0)
+            if time.time() < not_before:
+                self._schedule_process_locks(at=not_before)
+                return
+
+            if app_data.get(self._wakeup_key):
+                app_data.update({self._wakeup_key: ""})
+
             self.model.app.status = MaintenanceStatus("Beginning rolling {}".format(self.name))
-            lock = pending[-1]
-            lock.grant()
-            if lock.unit == self.model.unit:
-                # It's time for the leader to run with lock.
-                self.charm.on[self.name].run_with_lock.emit()
+            batch = pending[-self._batch_size(len(locks.units)) :]
+            if len(batch) > 1 and batch[0] is pending[0] and batch[0].unit == self.model.unit:
+                # The leader only runs on its own, once no other unit is pending.
+                batch = batch[1:]
+
+            for lock in batch:
+                lock.grant()
+                if lock.unit == self.model.unit and not self._run_with_lock_deferred():
+                    # It's time for the leader to run with lock.
+                    self.charm.on[self.name].run_with_lock.emit()
             return
 
+        # The rolling operation has finished, drop any overrides and schedule for it.
+        for key in [
+            self._max_concurrent_key,
+            self._interval_key,
+            self._not_before_key,
+            self._wakeup_key,
+            self._request_key,
+            self._request_callback_key,
+        ]:
+            if app_data.get(key):
+                app_data.update({key: ""})
+
         if self.model.app.status.message == f"Beginning rolling {self.name}":
             self.model.app.status = ActiveStatus()
 
     def _on_acquire_lock(self: CharmBase, event: ActionEvent):
-        """Request a lock."""
+        """Request a lock.
+
+        A request is queued, by deferring it, while the lock is still held for a previous one,
+        or while a previous request for another callback is pending, so that the callback of
+        the operation in flight is not replaced.
+        """
         try:
-            Lock(self).acquire()  # Updates relation data
-            # emit relation changed event in the edge case where aquire does not
+            lock = Lock(self)
             relation = self.model.get_relation(self.name)
+            callback_override = relation.data[self.charm.unit].get("callback_override", "")
+            if (
+                lock.is_held()
+                or lock.release_requested()
+                or (lock.is_pending() and callback_override != event.callback_override)
+            ):
+                logger.debug("{} lock in use, queueing request".format(self.name))
+                event.defer()
+                return
+
+            lock.acquire()  # Updates relation data
+            # emit relation changed event in the edge case where aquire does not
 
             # persist callback override for eventual run
             relation.data[self.charm.unit].update({"callback_override": event.callback_override})
@@ -404,6 +678,12 @@ class RollingOpsManager(Object):
         callback = getattr(self.charm, callback_name)
         callback(event)
 
+        self._state.run_with_lock_deferred = event.deferred
+        if event.deferred:
+            # The callback has not finished yet -- keep holding the lock until the deferred
+            # event is re-run.
+            return
+
         lock.release()  # Updates relation data
         if lock.unit == self.model.unit:
             self.charm.on[self.name].process_locks.emit()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Minimal HTTP server sharing the local artifact cache with the peer units.
+
+Serves cached artifacts on `/sha256/<digest>`, and answers 404 for any other path. Peers
+only request the artifacts this unit advertises as cached, and verify them against their
+digest, so the server needs no other state.
+
+Runs under a systemd service generated by the charm, only when artifact sharing is enabled,
+and listens on the peer binding address only. Only the standard library is used here, as the
+server runs as a standalone script.
+"""
+
+import argparse
+import os
+import re
+import shutil
+import socket
+from functools import partial
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from core.artifacts import cache_path
+from core.capture import CHUNK_SIZE
+
+ARTIFACT_PATH = re.compile(r"^/sha256/(?P<digest>[0-9a-f]{64})$")
+
+
+class ArtifactServer(ThreadingHTTPServer):
+    """Threaded HTTP server listening on either an IPv4 or an IPv6 address."""
+
+    def __init__(self, server_address: tuple[str, int], *args, **kwargs):
+        if ":" in server_address[0]:
+            self.address_family = socket.AF_INET6
+        super().__init__(server_address, *args, **kwargs)
+
+
+class ArtifactHandler(BaseHTTPRequestHandler):
+    """Serves the artifacts of the local cache on `/sha256/<digest>`."""
+
+    def __init__(self, *args, cache_dir: str, **kwargs):
+        self.cache_dir = cache_dir
+        super().__init__(*args, **kwargs)
+
+    def do_GET(self) -> None:  # noqa: N802
+        """Handles an artifact request."""
+        if not (match := ARTIFACT_PATH.match(self.path.split("?")[0])):
+            self.send_error(404)
+            return
+
+        try:
+            f = open(cache_path(self.cache_dir, match.group("digest")), "rb")
+        except OSError:
+            self.send_error(404)
+            return
+
+        with f:
+            self.send_response(200)
+            self.send_header("Content-Type", "application/octet-stream")
+            self.send_header("Content-Length", str(os.fstat(f.fileno()).st_size))
+            self.end_headers()
+            shutil.copyfileobj(f, self.wfile, CHUNK_SIZE)
+
+    def log_message(self, *_) -> None:
+        """Silences per-request logging."""
+        return
+
+
+def main() -> None:
+    """Entrypoint for the artifact server service."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", required=True, help="address to listen on")
+    parser.add_argument("--port", type=int, required=True, help="port to listen on")
+    parser.add_argument("--cache", required=True, help="path of the artifact cache")
+    args = parser.parse_args()
+
+    server = ArtifactServer((args.host, args.port), partial(ArtifactHandler, cache_dir=args.cache))
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
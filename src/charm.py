@@ -5,27 +5,41 @@
 """Charmed Machine Operator that runs anything™."""
 
 import logging
+import os
+import sys
 import time
+from typing import TYPE_CHECKING
+
 from charms.data_platform_libs.v0.data_models import TypedCharmBase
-from charms.rolling_ops.v0.rollingops import RollingOpsManager, RunWithLock
-from ops.framework import EventBase
+from charms.rolling_ops.v0.rollingops import RollingOpsManager
+from ops.framework import EventBase, StoredState
 from ops.main import main
-from ops.model import ActiveStatus, StatusBase
 from core.cluster import ClusterState
 from core.structured_config import CharmConfig
 from health import RunsLikeACharmHealth
 from literals import (
+    ARTIFACTS_PORT,
     CHARM_KEY,
+    COS_AGENT_HOOKS,
+    METRICS_PORT,
+    PATHS,
     PEER,
-    INTERVAL,
+    RESTART_HEALTH_TIMEOUT,
+    SERVICE_START_ATTEMPTS,
     Status,
     Substrate,
-    DebugLevel,
 )
 from managers.config import RunsLikeACharmConfigManager
+from managers.metrics import RunsLikeACharmMetricsManager, timed
+from managers.status import RunsLikeACharmStatusManager
 from events.restart import RollingRestartActionEvents
 from workload import RunsLikeACharmWorkload
 
+if TYPE_CHECKING:
+    from ipaddress import IPv4Address, IPv6Address
+
+    from charms.grafana_agent.v0.cos_agent import COSAgentProvider
+
 logger = logging.getLogger(__name__)
 
 
@@ -33,14 +47,28 @@ class RunsLikeACharm(TypedCharmBase[CharmConfig]):
     """Charmed Operator that runs anything™."""
 
     config_type = CharmConfig
+    _stored = StoredState()
+    _parsed_config: CharmConfig | None = None
 
     def __init__(self, *args):
         super().__init__(*args)
         self.name = CHARM_KEY
+        # config only changes between dispatches, outside of tests
+        self.framework.observe(getattr(self.on, "config_changed"), self._invalidate_config)
+        self._stored.set_default(
+            rolling_apply_requested="",
+            service_digest="",
+            setup_script_digest="",
+            setup_script_exit_code=None,
+            setup_script_applied_at=None,
+            restart_waiting_since=None,
+            artifact_server="",
+        )
         self.substrate: Substrate = "vm"
         self.workload = RunsLikeACharmWorkload()
         self.state = ClusterState(self, substrate=self.substrate)
         self.health = RunsLikeACharmHealth(self)
+        self.metrics = RunsLikeACharmMetricsManager(self)
 
         # HANDLERS
 
@@ -54,9 +82,31 @@ class RunsLikeACharm(TypedCharmBase[CharmConfig]):
 
         # LIB HANDLERS
 
-        self.restart_manager = RollingOpsManager(self, relation="restart", callback=self._restart)
+        self.restart_manager = RollingOpsManager(
+            self,
+            relation="restart",
+            callback=self._restart,
+            max_concurrent=self.config.rolling_batch_size,
+        )
+
+        # the provider only observes these hooks, so the others skip importing it and cosl
+        self.cos_agent: "COSAgentProvider | None" = None
+        if self._dispatching(COS_AGENT_HOOKS):
+            from charms.grafana_agent.v0.cos_agent import COSAgentProvider
+
+            self.cos_agent = COSAgentProvider(
+                self,
+                metrics_endpoints=[{"path": "/metrics", "port": METRICS_PORT}],
+                dashboard_dirs=["./src/grafana_dashboards"],
+            )
+
+        # registered after the rolling ops handlers, which may set the unit status themselves
+        self.status_manager = RunsLikeACharmStatusManager(
+            self, relations=[self.restart_manager.name]
+        )
 
         self.framework.observe(getattr(self.on, "install"), self._on_install)
+        self.framework.observe(getattr(self.on, "upgrade_charm"), self._on_upgrade_charm)
         self.framework.observe(getattr(self.on, "start"), self._on_start)
         self.framework.observe(getattr(self.on, "config_changed"), self._on_config_changed)
         self.framework.observe(getattr(self.on, "update_status"), self._on_update_status)
@@ -64,6 +114,7 @@ class RunsLikeACharm(TypedCharmBase[CharmConfig]):
 
         self.framework.observe(self.on[PEER].relation_changed, self._on_config_changed)
 
+    @timed
     def _on_install(self, _) -> None:
         """Handler for `install` event."""
         try:
@@ -71,27 +122,88 @@ class RunsLikeACharm(TypedCharmBase[CharmConfig]):
         except:
             self._set_status(Status.INIT_FAIL)
 
+        self._install_exporter()
+        self._install_artifact_server(force=True)
+
+    @timed
+    def _on_upgrade_charm(self, _) -> None:
+        """Handler for `upgrade-charm` event."""
+        # units upgraded from revisions without stored setup state never see `start` again
+        if self._stored.setup_script_applied_at is None:
+            self._seed_setup_state()
+
+        # pick up the exporter and artifact server shipped with the new charm revision
+        self._install_exporter()
+        self._install_artifact_server(force=True)
+
+    def _seed_setup_state(self) -> None:
+        """Records the setup script left on the unit by a previous revision as applied.
+
+        Later setup changes are then rolled out as usual, instead of waiting for a `start`
+        event that an upgraded unit does not get.
+        """
+        script = "\n".join(self.workload.read(self.config_manager.setup_script_path))
+        self._stored.setup_script_digest = self.config_manager.script_digest(script)
+        self._stored.service_digest = self.config_manager.service_digest
+        self._stored.setup_script_applied_at = time.time()
+        logger.info("Recorded the setup script of the previous charm revision as applied")
+
+    def _install_exporter(self) -> None:
+        """Installs the service exposing the charm metrics for scraping."""
+        try:
+            self.workload.install_exporter(
+                f"{sys.executable} {self.charm_dir}/src/exporter.py "
+                f"--port {METRICS_PORT} --textfile {PATHS['METRICS_TEXTFILE']}"
+            )
+        except Exception as e:
+            logger.warning(f"installing metrics exporter failed - {e}")
+
+    def _install_artifact_server(self, force: bool = False) -> None:
+        """Installs the service sharing the artifact cache with the peer units, if enabled.
+
+        The server only listens on the peer binding address, and is removed once sharing is
+        disabled. It is only (re)started when its command line changes, unless forced.
+
+        Args:
+            force: whether to (re)install the server even if its command line is unchanged
+        """
+        exec_start = ""
+        if self.config.share_artifacts and (address := self._peer_address):
+            exec_start = (
+                f"{sys.executable} {self.charm_dir}/src/artifact_server.py "
+                f"--host {address} --port {ARTIFACTS_PORT} --cache {PATHS['ARTIFACT_CACHE']}"
+            )
+
+        if exec_start == self._stored.artifact_server and not force:
+            return
+
+        try:
+            if exec_start:
+                self.workload.install_artifact_server(exec_start)
+            else:
+                self.workload.remove_artifact_server()
+        except Exception as e:
+            logger.warning(f"updating artifact server failed - {e}")
+            return
+
+        self._stored.artifact_server = exec_start
+
+    @timed
     def _on_start(self, event: EventBase) -> None:
         """Handler for `start` event."""
-        self._set_status(self.state.ready_to_start)
-        if not isinstance(self.unit.status, ActiveStatus):
+        if not self.healthy:
             event.defer()
             return
 
         # run cloud-init for the user defined module
-        try:
-            self.workload.start()
-            logger.info("Setup script executed")
-        except:
-            self._set_status(Status.INIT_FAIL)
+        if not self._apply_setup_script():
+            event.defer()
+            return
 
         # check for connection
         self._on_update_status(event)
 
-        # only log once on successful 'on-start' run
-        if isinstance(self.unit.status, ActiveStatus):
-            logger.info(f'Node {self.unit.name.split("/")[1]} operational')
-
+    @timed
     def _on_config_changed(self, event: EventBase) -> None:
         """Generic handler for most `config_changed` events across relations."""
         # only overwrite cloud-init script if we're healthy
@@ -99,73 +211,318 @@ class RunsLikeACharm(TypedCharmBase[CharmConfig]):
             event.defer()
             return
 
-        # load up setup script
-        setup_script_file = self.workload.read(self.config_manager.setup_script_path)
-        setup_script_file_changed = set(setup_script_file) ^ set(self.config_manager.setup_script)
+        self._install_artifact_server()
+        self._advertise_artifacts()
 
-        if setup_script_file_changed:
-            logger.info(
-                (
-                    f'Node {self.unit.name.split("/")[1]} updating setup script file'
-                )
-            )
-            try:
-                self.workload.write(self.config_manager.setup_script, self.config_manager.setup_script_path)
-                self.workload.start()
-            except:
-                self._set_status(Status.INIT_FAIL)
+        # the first run happens on start
+        if not self.setup_changed or self._stored.setup_script_applied_at is None:
+            return
 
-    def _on_update_status(self, event: EventBase) -> None:
+        requested = ":".join(
+            [self.config_manager.setup_script_digest, self.config_manager.service_digest]
+        )
+        if self._stored.rolling_apply_requested == requested:
+            return
+
+        # roll setup changes across the units, rather than running them everywhere at once
+        logger.info(f'Node {self.unit.name.split("/")[1]} queueing setup script update')
+        self.on[self.restart_manager.name].acquire_lock.emit(callback_override="_rolling_apply")
+        self._stored.rolling_apply_requested = requested
+        self._set_status(Status.SETUP_PENDING)
+
+    @timed
+    def _on_update_status(self, _) -> None:
         """Handler for `update-status` events."""
         if not self.healthy:
             return
 
-        # If setup script script has changed, the node will restart.
-        self._on_config_changed(event)
+        self._set_status(self._update_setup_script_state())
+        self._advertise_artifacts()
 
-        self._set_status(Status.ACTIVE)
+    def _invalidate_config(self, _) -> None:
+        """Drops the config parsed so far in this dispatch."""
+        self._parsed_config = None
+        self.config_manager.config = self.config
 
+    @timed
     def _on_remove(self, _) -> None:
-        """Handler for stop."""
-        return
+        """Handler for `remove` event, removing the services the charm installed."""
+        for remove in [
+            self.workload.remove_service,
+            self.workload.remove_exporter,
+            self.workload.remove_artifact_server,
+        ]:
+            try:
+                remove()
+            except Exception as e:
+                logger.warning(f"removing service failed - {e}")
 
+    @timed
     def _restart(self, event: EventBase) -> None:
         """Handler for `rolling_ops` restart events."""
         # only attempt restart if service is already active
-        if not self.healthy:
-            event.defer()
+        if not self._healthy_for_restart(event):
             return
 
-        interval = int(self.model.get_relation(self.restart_manager.name).data[self.app].get(INTERVAL))
-        time.sleep(interval)
+        # the interval between restarts is enforced by the restart lock coordinator
         try:
-            # reboot the instance
+            # restart the service, or reboot the instance if there is none
             self.workload.restart()
         except:
             self._set_status(Status.RESTART_FAIL)
 
+    @timed
+    def _reboot(self, event: EventBase) -> None:
+        """Handler for `rolling_ops` reboot events."""
+        # only attempt reboot if service is already active
+        if not self._healthy_for_restart(event):
+            return
+
+        try:
+            self.workload.reboot()
+        except:
+            self._set_status(Status.RESTART_FAIL)
+
+    @timed
+    def _rolling_apply(self, event: EventBase) -> None:
+        """Handler for `rolling_ops` setup script apply events.
+
+        Holds the lock until the updated setup script has run successfully, so that the next
+        batch of units only starts once this one is healthy again.
+        """
+        if not self.healthy:
+            event.defer()
+            return
+
+        if self.setup_script_changed:
+            logger.info(f'Node {self.unit.name.split("/")[1]} updating setup script file')
+            self._apply_setup_script()
+            self._set_status(self._update_setup_script_state())
+            event.defer()
+            return
+
+        service_attempts = 1
+        if self.service_changed:
+            self._apply_service()
+            # give the (re)started service a moment to come up
+            service_attempts = SERVICE_START_ATTEMPTS
+
+        status = self._update_setup_script_state(service_attempts=service_attempts)
+        self._set_status(status)
+        if status != Status.ACTIVE:
+            # still running, or failed and halting the roll until the script is fixed
+            event.defer()
+            return
+
+        self._stored.rolling_apply_requested = ""
+
+    def _healthy_for_restart(self, event: EventBase) -> bool:
+        """Checks the unit health before a rolling restart, deferring the restart if unhealthy.
+
+        A unit that stays unhealthy for RESTART_HEALTH_TIMEOUT skips its restart, so that it
+        releases the lock instead of holding up the rest of its batch.
+
+        Returns:
+            True if the unit is healthy and can restart. Otherwise False
+        """
+        if self.healthy:
+            self._stored.restart_waiting_since = None
+            return True
+
+        now = time.time()
+        waiting_since = self._stored.restart_waiting_since or now
+        if now - waiting_since < RESTART_HEALTH_TIMEOUT:
+            self._stored.restart_waiting_since = waiting_since
+            self._set_status(Status.RESTART_WAITING)
+            event.defer()
+            return False
+
+        logger.error(f"unit unhealthy for {now - waiting_since:.0f}s, skipping rolling restart")
+        self._stored.restart_waiting_since = None
+        self._set_status(Status.RESTART_SKIPPED)
+        return False
+
+    def _apply_setup_script(self) -> bool:
+        """Writes the configured setup script and launches it in the background.
+
+        Returns:
+            True if the setup script was launched. False if a previous run is still in progress
+        """
+        if self.workload.job_state().running:
+            logger.info("Setup script still running, delaying new run")
+            return False
+
+        digest = self.config_manager.setup_script_digest
+        exit_code = None
+        try:
+            self.workload.write(
+                self.config_manager.setup_script, self.config_manager.setup_script_path
+            )
+            self.workload.start(
+                stages=self.config_manager.setup_stages,
+                artifacts=self.config_manager.artifacts,
+                peers=self.state.artifact_peers,
+            )
+            logger.info("Setup script launched")
+        except Exception as e:
+            logger.error(f"launching setup script failed - {e}")
+            exit_code = -1
+
+        self._stored.setup_script_digest = digest
+        self._stored.setup_script_exit_code = exit_code
+        self._stored.setup_script_applied_at = time.time()
+
+        if exit_code:
+            self._set_status(Status.INIT_FAIL)
+
+        return True
+
+    def _advertise_artifacts(self) -> None:
+        """Publishes the artifact server of the unit, and the artifacts it has cached, to peers.
+
+        Peers only fetch the artifacts a unit advertises, so nothing is published unless the
+        unit shares its artifacts.
+        """
+        source = ""
+        digests = []
+        if self.config.share_artifacts and (address := self._peer_address):
+            host = f"[{address}]" if address.version == 6 else str(address)
+            source = f"http://{host}:{ARTIFACTS_PORT}"
+            digests = self.workload.cached_artifacts(self.config_manager.artifacts)
+
+        if self.state.node.artifact_source != source:
+            self.state.node.update({"artifact-source": source})
+        if self.state.node.artifact_digests != set(digests):
+            self.state.node.update({"artifact-digests": " ".join(sorted(digests))})
+
+    def _apply_service(self) -> None:
+        """Installs and (re)starts, or removes, the service for the configured command."""
+        try:
+            if self.config_manager.service_command:
+                self.workload.install_service(self.config_manager.service_command)
+                logger.info("Service started")
+            else:
+                self.workload.remove_service()
+        except Exception as e:
+            logger.error(f"updating service failed - {e}")
+
+        self._stored.service_digest = self.config_manager.service_digest
+
+    def _update_setup_script_state(self, service_attempts: int = 1) -> Status:
+        """Polls the background setup script run, recording its outcome once finished.
+
+        A run that stopped without recording an exit code, such as one killed or interrupted
+        by a reboot, is treated as failed and launched again.
+
+        Args:
+            service_attempts: the number of checks that the service is running, a second apart.
+                Default 1
+
+        Returns:
+            SETUP_RUNNING if the setup script is still in progress, or was relaunched
+            INIT_FAIL if the last applied setup script failed
+            SETUP_PENDING if setup changes are waiting for their rolling apply
+            SERVICE_FAIL if the configured service is not running
+            ACTIVE in every other situation
+        """
+        job = self.workload.job_state()
+        if job.running:
+            return Status.SETUP_RUNNING
+
+        if job.lost and self._stored.setup_script_exit_code is None:
+            logger.warning(f"Setup script stopped without an exit code - {job.started_at=}")
+            self._apply_setup_script()
+            if self._stored.setup_script_exit_code is None:
+                return Status.SETUP_RUNNING
+
+        if job.exit_code is not None and self._stored.setup_script_exit_code is None:
+            logger.info(
+                f"Setup script finished - exit_code={job.exit_code}, duration={job.duration}"
+            )
+            self._stored.setup_script_exit_code = job.exit_code
+            self.metrics.record_setup_script(job.duration or 0.0, job.exit_code)
+            if job.exit_code:
+                logger.error(f"running setup script failed - output={self.workload.job_output()}")
+            else:
+                logger.info(f'Node {self.unit.name.split("/")[1]} operational')
+                # (re)start the service on top of the freshly applied setup
+                self._apply_service()
+
+        if self._stored.setup_script_exit_code:
+            return Status.INIT_FAIL
+
+        if self.setup_changed and self._stored.setup_script_applied_at is not None:
+            return Status.SETUP_PENDING
+
+        if not self.workload.active(attempts=service_attempts):
+            return Status.SERVICE_FAIL
+
+        return Status.ACTIVE
+
+    @property
+    def setup_script_changed(self) -> bool:
+        """Checks whether the configured setup script differs from the last applied one."""
+        return self._stored.setup_script_digest != self.config_manager.setup_script_digest
+
+    @property
+    def service_changed(self) -> bool:
+        """Checks whether the configured service command differs from the last applied one."""
+        return self._stored.service_digest != self.config_manager.service_digest
+
+    @property
+    def setup_changed(self) -> bool:
+        """Checks whether any setup changes are waiting to be applied."""
+        return self.setup_script_changed or self.service_changed
+
+    @property
+    def config(self) -> CharmConfig:
+        """The structured charm config, parsed once per dispatch."""
+        if self._parsed_config is None:
+            self._parsed_config = super().config
+
+        return self._parsed_config
+
+    @property
+    def _peer_address(self) -> "IPv4Address | IPv6Address | None":
+        """The address of the unit on the peer relation binding, if known."""
+        if binding := self.model.get_binding(PEER):
+            return binding.network.bind_address
+
+        return None
+
     @property
     def healthy(self) -> bool:
         """Checks and updates various charm lifecycle states.
 
-        Is slow to fail due to retries, to be used sparingly.
+        Only writes the unit status when the charm is not ready.
 
         Returns:
             True if service is alive and active. Otherwise False
         """
-        self._set_status(self.state.ready_to_start)
-        if not isinstance(self.unit.status, ActiveStatus):
+        if (status := self.state.ready_to_start) != Status.ACTIVE:
+            self._set_status(status)
+            return False
+
+        if not self.health.machine_configured():
+            self._set_status(Status.MACHINE_FAIL)
             return False
 
         return True
 
-    def _set_status(self, key: Status) -> None:
-        """Sets charm status."""
-        status: StatusBase = key.value.status
-        log_level: DebugLevel = key.value.log_level
+    def _dispatching(self, hooks: list[str]) -> bool:
+        """Checks whether the current dispatch runs one of the given hooks.
+
+        Returns:
+            True if dispatching one of the hooks, or if the hook is unknown. Otherwise False
+        """
+        if not (dispatch_path := os.environ.get("JUJU_DISPATCH_PATH")):
+            return True
 
-        getattr(logger, log_level.lower())(status.message)
-        self.unit.status = status
+        return os.path.basename(dispatch_path) in hooks
+
+    def _set_status(self, key: Status) -> None:
+        """Sets charm status, skipping writes that would not change it."""
+        self.status_manager.set(key)
 
 if __name__ == "__main__":
     main(RunsLikeACharm)
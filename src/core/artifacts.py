@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Content-addressed cache of artifacts fetched for the setup script.
+
+Artifacts are stored under their sha256 digest once downloaded and verified, so an artifact
+is only transferred once per machine however often the setup script re-runs. Each run then
+copies the cached artifact to its destination.
+
+Units sharing their cache serve it to their peers, and advertise the digests they hold.
+Artifacts are fetched from the peers advertising them first, without waiting on any peer
+that has not cached them yet, and are always verified against their digest whichever peer
+served them.
+
+Only the standard library is used here, as the job supervisor imports it standalone.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from dataclasses import asdict, dataclass
+
+from core.capture import CHUNK_SIZE, RotatingLog
+
+FETCH_TIMEOUT = 60
+PARTIAL_PREFIX = ".partial-"
+DEFAULT_MODE = 0o644
+
+
+@dataclass
+class Artifact:
+    """A file fetched from a URL to a destination on the machine, identified by its digest."""
+
+    url: str
+    sha256: str
+    destination: str
+    mode: int = DEFAULT_MODE
+
+
+def load_manifest(path: str) -> list[Artifact]:
+    """Loads the artifacts listed in a JSON manifest."""
+    with open(path) as f:
+        return [Artifact(**entry) for entry in json.load(f)]
+
+
+def dump_manifest(artifacts: list[Artifact]) -> str:
+    """Serialises artifacts to a JSON manifest."""
+    return json.dumps([asdict(artifact) for artifact in artifacts])
+
+
+def cache_path(cache_dir: str, digest: str) -> str:
+    """The full filepath of an artifact in the cache."""
+    return os.path.join(cache_dir, digest[:2], digest)
+
+
+def _download(url: str, digest: str, directory: str) -> str:
+    """Streams a URL to a temporary file, verifying its content against a sha256 digest.
+
+    Returns:
+        The full filepath of the verified temporary file
+
+    Raises:
+        ValueError if the downloaded content does not match the digest
+        OSError if the download failed
+    """
+    # only imported by the supervisor, as it is costly to import on every dispatch
+    import urllib.request
+
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=PARTIAL_PREFIX)
+    try:
+        content_digest = hashlib.sha256()
+        with os.fdopen(fd, "wb") as f, urllib.request.urlopen(
+            url, timeout=FETCH_TIMEOUT
+        ) as response:
+            while chunk := response.read(CHUNK_SIZE):
+                content_digest.update(chunk)
+                f.write(chunk)
+
+        if content_digest.hexdigest() != digest:
+            raise ValueError(
+                f"checksum mismatch for {url} - "
+                f"expected={digest}, actual={content_digest.hexdigest()}"
+            )
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+    return tmp_path
+
+
+def _download_from_peers(
+    artifact: Artifact, directory: str, peers: list[str]
+) -> tuple[str, str] | None:
+    """Downloads an artifact from the first peer able to serve it.
+
+    Each peer is tried once, as it advertised the artifact as cached, and peers failing to
+    serve it are skipped.
+
+    Returns:
+        The full filepath of the verified temporary file and the URL it was downloaded from,
+        or None if no peer served the artifact
+    """
+    for peer in peers:
+        url = peer_url(peer, artifact.sha256)
+        try:
+            return _download(url, artifact.sha256, directory), url
+        except (OSError, ValueError):
+            continue
+
+    return None
+
+
+def peer_url(peer: str, digest: str) -> str:
+    """The URL of an artifact on the artifact server of a peer."""
+    return f"{peer.rstrip('/')}/sha256/{digest}"
+
+
+def fetch(artifact: Artifact, cache_dir: str, peers: list[str] = []) -> str:
+    """Downloads an artifact into the cache, unless it is already present.
+
+    Peers are tried first, in order, and the artifact URL only once none of them could
+    serve it. Downloads are streamed to a temporary file, and only moved into the cache once
+    their digest is verified.
+
+    Args:
+        artifact: the artifact to fetch
+        cache_dir: the root directory of the cache
+        peers: the base URLs of the peer artifact servers caching the artifact
+
+    Returns:
+        The URL the artifact was downloaded from, or an empty string if it was already cached
+
+    Raises:
+        ValueError if the downloaded content does not match the artifact digest
+        OSError if the download failed
+    """
+    path = cache_path(cache_dir, artifact.sha256)
+    if os.path.exists(path):
+        return ""
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if download := _download_from_peers(artifact, os.path.dirname(path), peers):
+        tmp_path, url = download
+    else:
+        url = artifact.url
+        tmp_path = _download(url, artifact.sha256, os.path.dirname(path))
+
+    os.replace(tmp_path, path)
+    return url
+
+
+def install(artifact: Artifact, cache_dir: str) -> None:
+    """Atomically copies a cached artifact to its destination, with the artifact mode."""
+    destination_dir = os.path.dirname(artifact.destination)
+    os.makedirs(destination_dir, exist_ok=True)
+
+    fd, tmp_path = tempfile.mkstemp(dir=destination_dir, prefix=".artifact-")
+    os.close(fd)
+    try:
+        shutil.copyfile(cache_path(cache_dir, artifact.sha256), tmp_path)
+        os.chmod(tmp_path, artifact.mode)
+        os.replace(tmp_path, artifact.destination)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def fetch_all(
+    artifacts: list[Artifact],
+    cache_dir: str,
+    log: RotatingLog,
+    peers: dict[str, list[str]] = {},
+) -> int:
+    """Fetches any uncached artifacts, and copies all of them to their destinations.
+
+    Args:
+        artifacts: the artifacts to provide
+        cache_dir: the root directory of the cache
+        log: the log that progress and errors are written to
+        peers: the base URLs of the peer artifact servers to try first, by the digests
+            they advertise as cached
+
+    Returns:
+        0 if all artifacts are in place. Otherwise 1
+    """
+    for artifact in artifacts:
+        try:
+            if url := fetch(artifact, cache_dir, peers=peers.get(artifact.sha256, [])):
+                log.write(f"=== fetched artifact {url} ===\n".encode())
+            else:
+                log.write(f"=== using cached artifact {artifact.sha256} ===\n".encode())
+
+            install(artifact, cache_dir)
+        except (OSError, ValueError) as e:
+            log.write(f"fetching artifact {artifact.url} failed - {e}\n".encode())
+            return 1
+
+    return 0
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Bounded capture of command output.
+
+Command output is streamed in chunks to a size-rotated log file on disk, while only a
+fixed-size tail of it is kept in memory for status and error messages. Peak memory use
+therefore stays constant however verbose the command is. Callers which need the complete
+output, such as to parse it, opt out of the bound.
+
+Only the standard library is used here, as the job supervisor imports it standalone.
+"""
+
+import os
+import selectors
+import subprocess
+import time
+
+CHUNK_SIZE = 64 * 1024
+TAIL_SIZE = 64 * 1024
+# characters of command output forwarded to the charm log
+LOG_TAIL_SIZE = 4 * 1024
+LOG_MAX_BYTES = 16 * 1024 * 1024
+LOG_BACKUP_COUNT = 3
+
+
+class TailBuffer:
+    """Ring buffer keeping only the last `size` bytes written to it, or all of them if None."""
+
+    def __init__(self, size: int | None = TAIL_SIZE):
+        self.size = size
+        self._buffer = bytearray()
+
+    def write(self, data: bytes) -> None:
+        """Appends data, discarding the oldest bytes beyond the buffer size."""
+        if self.size is None:
+            self._buffer += data
+            return
+
+        self._buffer += data[-self.size :]
+        if len(self._buffer) > self.size:
+            del self._buffer[: len(self._buffer) - self.size]
+
+    def getvalue(self) -> str:
+        """The buffered tail, decoded as text."""
+        return self._buffer.decode("utf-8", errors="replace")
+
+
+class RotatingLog:
+    """Append-only log file rotated to `<path>.1` ... `<path>.N` once it grows too large."""
+
+    def __init__(
+        self,
+        path: str,
+        max_bytes: int = LOG_MAX_BYTES,
+        backup_count: int = LOG_BACKUP_COUNT,
+        rotate: bool = False,
+    ):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if rotate and os.path.exists(path):
+            self._rotate_files()
+
+        self._file = open(path, "ab")
+        self._size = self._file.tell()
+
+    def _rotate_files(self) -> None:
+        for index in range(self.backup_count - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{index}"):
+                os.replace(f"{self.path}.{index}", f"{self.path}.{index + 1}")
+
+        if self.backup_count:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+    def rotate(self) -> None:
+        """Closes the current log file and starts a new one."""
+        self._file.close()
+        self._rotate_files()
+        self._file = open(self.path, "ab")
+        self._size = 0
+
+    def write(self, data: bytes) -> None:
+        """Appends data to the log, rotating first if it would exceed the size limit."""
+        if self._size and self._size + len(data) > self.max_bytes:
+            self.rotate()
+
+        self._file.write(data)
+        self._size += len(data)
+
+    def close(self) -> None:
+        """Flushes and closes the log file."""
+        self._file.close()
+
+    def __enter__(self) -> "RotatingLog":
+        """Returns the open log."""
+        return self
+
+    def __exit__(self, *_) -> None:
+        """Closes the log."""
+        self.close()
+
+
+def log_tail(output: str, size: int = LOG_TAIL_SIZE) -> str:
+    """The last `size` characters of command output, to log without flooding the log."""
+    return output[-size:]
+
+
+def read_tail(path: str, size: int = TAIL_SIZE) -> str:
+    """Reads at most the last `size` bytes of a file.
+
+    Args:
+        path: the full filepath to read from
+        size: the maximum number of bytes to read
+
+    Returns:
+        The tail of the file, or an empty string if it does not exist
+    """
+    try:
+        with open(path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            f.seek(max(f.tell() - size, 0))
+            return f.read().decode("utf-8", errors="replace")
+    except OSError:
+        return ""
+
+
+def run(
+    command: str,
+    log: RotatingLog,
+    timeout: float | None = None,
+    merge_stderr: bool = False,
+    env: dict[str, str] | None = None,
+    working_dir: str | None = None,
+    tail_size: int | None = TAIL_SIZE,
+) -> subprocess.CompletedProcess:
+    """Runs a shell command, streaming its output to a log and keeping only bounded tails.
+
+    Args:
+        command: the shell command to run
+        log: the log that all command output is streamed to
+        timeout: seconds after which the command is killed. Default no timeout
+        merge_stderr: whether stderr is captured together with stdout. Default False
+        env: the environment to run the command with. Default inherited
+        working_dir: the directory to run the command in. Default inherited
+        tail_size: the number of trailing bytes of stdout and stderr to keep, or None to
+            keep all of them. Default TAIL_SIZE
+
+    Returns:
+        CompletedProcess with the tails of stdout and stderr as text
+
+    Raises:
+        subprocess.TimeoutExpired if the command did not finish within the timeout
+    """
+    deadline = time.monotonic() + timeout if timeout is not None else None
+    tails = {"stdout": TailBuffer(tail_size), "stderr": TailBuffer(tail_size)}
+
+    with subprocess.Popen(
+        command,
+        shell=True,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT if merge_stderr else subprocess.PIPE,
+        env=env,
+        cwd=working_dir,
+    ) as process, selectors.DefaultSelector() as selector:
+        selector.register(process.stdout, selectors.EVENT_READ, tails["stdout"])  # type: ignore
+        if process.stderr:
+            selector.register(process.stderr, selectors.EVENT_READ, tails["stderr"])
+
+        while selector.get_map():
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                process.kill()
+                raise subprocess.TimeoutExpired(
+                    command,
+                    timeout,  # type: ignore
+                    output=tails["stdout"].getvalue(),
+                    stderr=tails["stderr"].getvalue(),
+                )
+
+            for key, _ in selector.select(remaining):
+                chunk = os.read(key.fd, CHUNK_SIZE)
+                if not chunk:
+                    selector.unregister(key.fileobj)
+                    continue
+
+                log.write(chunk)
+                key.data.write(chunk)
+
+        remaining = None if deadline is None else max(deadline - time.monotonic(), 0)
+        try:
+            returncode = process.wait(timeout=remaining)
+        except subprocess.TimeoutExpired as e:
+            process.kill()
+            e.output, e.stderr = tails["stdout"].getvalue(), tails["stderr"].getvalue()
+            raise
+
+    return subprocess.CompletedProcess(
+        command,
+        returncode,
+        stdout=tails["stdout"].getvalue(),
+        stderr=tails["stderr"].getvalue(),
+    )
@@ -4,6 +4,8 @@
 
 """Objects representing the state of RunsLikeACharm."""
 
+from functools import cached_property
+
 from ops import Framework, Object, Relation
 
 from core.models import RunsLikeACharm, RunsLikeACharmCluster
@@ -15,36 +17,57 @@ from literals import (
 
 
 class ClusterState(Object):
-    """Properties and relations of the charm."""
+    """Properties and relations of the charm.
+
+    Relations and state objects are built once per dispatch, and rebuilt after the membership
+    of the peer relation changes. State objects read relation data lazily, so writes through
+    them are always reflected.
+    """
+
+    _cached = ["peer_relation", "node", "cluster", "nodes"]
 
     def __init__(self, charm: Framework | Object, substrate: Substrate):
         super().__init__(parent=charm, key="charm_state")
         self.substrate: Substrate = substrate
 
+        peer_events = charm.on[PEER]  # type: ignore
+        for event in [
+            peer_events.relation_created,
+            peer_events.relation_joined,
+            peer_events.relation_departed,
+            peer_events.relation_broken,
+        ]:
+            self.framework.observe(event, self._invalidate)
+
+    def _invalidate(self, _) -> None:
+        """Drops the state built so far in this dispatch."""
+        for name in self._cached:
+            self.__dict__.pop(name, None)
+
     # --- RELATIONS ---
 
-    @property
+    @cached_property
     def peer_relation(self) -> Relation | None:
         """The cluster peer relation."""
         return self.model.get_relation(PEER)
 
     # --- CORE COMPONENTS ---
 
-    @property
+    @cached_property
     def node(self) -> RunsLikeACharm:
         """The server state of the current running Unit."""
         return RunsLikeACharm(
             relation=self.peer_relation, component=self.model.unit, substrate=self.substrate
         )
 
-    @property
+    @cached_property
     def cluster(self) -> RunsLikeACharmCluster:
         """The cluster state of the current running App."""
         return RunsLikeACharmCluster(
             relation=self.peer_relation, component=self.model.app, substrate=self.substrate
         )
 
-    @property
+    @cached_property
     def nodes(self) -> set[RunsLikeACharm]:
         """Grabs all nodes in the current peer relation, including the running unit node.
 
@@ -71,6 +94,30 @@ class ClusterState(Object):
         hosts = [node.host for node in self.nodes]
         return hosts
 
+    @property
+    def artifact_peers(self) -> dict[str, list[str]]:
+        """The artifact servers of the peer units, by the artifact digests they have cached.
+
+        Only peers advertising an artifact as cached are listed for it. Each unit starts with
+        the peers following it in unit id order, spreading fetches across all peers caching
+        an artifact rather than sending them all to the first one.
+        """
+        if not self.peer_relation:
+            return {}
+
+        nodes = sorted(self.nodes, key=lambda node: node.unit_id)
+        position = nodes.index(self.node)
+
+        peers: dict[str, list[str]] = {}
+        for node in nodes[position + 1 :] + nodes[:position]:
+            if not (source := node.artifact_source):
+                continue
+
+            for digest in node.artifact_digests:
+                peers.setdefault(digest, []).append(source)
+
+        return peers
+
     @property
     def planned_units(self) -> int:
         """Return the planned units for the charm."""
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Fork-free snapshot of machine settings and resource usage, read straight from /proc."""
+
+import logging
+import os
+from dataclasses import dataclass, field
+
+logger = logging.getLogger(__name__)
+
+PROC = "/proc"
+PRESSURE_RESOURCES = ["cpu", "memory", "io"]
+
+
+@dataclass
+class Pressure:
+    """Pressure stall information for a single resource, as percentages of wall time."""
+
+    some_avg10: float = 0.0
+    some_avg60: float = 0.0
+    full_avg10: float = 0.0
+    full_avg60: float = 0.0
+
+
+@dataclass
+class MachineSnapshot:
+    """Kernel tunables, memory and pressure of the machine at a point in time."""
+
+    vm_swappiness: int | None = None
+    vm_max_map_count: int | None = None
+    meminfo: dict[str, int] = field(default_factory=dict)
+    pressure: dict[str, Pressure] = field(default_factory=dict)
+
+    @property
+    def mem_total(self) -> int | None:
+        """The total usable memory, in kB."""
+        return self.meminfo.get("MemTotal")
+
+    @property
+    def mem_available(self) -> int | None:
+        """The memory available for new workloads without swapping, in kB."""
+        return self.meminfo.get("MemAvailable")
+
+
+def _read(path: str) -> str | None:
+    try:
+        with open(path) as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def _read_int(path: str) -> int | None:
+    content = _read(path)
+    try:
+        return int(content) if content is not None else None
+    except ValueError:
+        return None
+
+
+def _parse_meminfo(content: str) -> dict[str, int]:
+    meminfo = {}
+    for line in content.splitlines():
+        key, _, value = line.partition(":")
+        if fields := value.split():
+            meminfo[key] = int(fields[0])
+
+    return meminfo
+
+
+def _parse_pressure(content: str) -> Pressure:
+    pressure = Pressure()
+    for line in content.splitlines():
+        kind, *values = line.split()
+        if kind not in ["some", "full"]:
+            continue
+
+        averages = dict(value.split("=") for value in values)
+        setattr(pressure, f"{kind}_avg10", float(averages.get("avg10", 0)))
+        setattr(pressure, f"{kind}_avg60", float(averages.get("avg60", 0)))
+
+    return pressure
+
+
+def probe(proc: str = PROC) -> MachineSnapshot:
+    """Reads the machine settings and resource usage in a single pass, without forking.
+
+    Args:
+        proc: the mount point of procfs. Default /proc
+
+    Returns:
+        MachineSnapshot of the machine, with any unreadable values left unset
+    """
+    snapshot = MachineSnapshot(
+        vm_swappiness=_read_int(os.path.join(proc, "sys/vm/swappiness")),
+        vm_max_map_count=_read_int(os.path.join(proc, "sys/vm/max_map_count")),
+    )
+
+    if meminfo := _read(os.path.join(proc, "meminfo")):
+        snapshot.meminfo = _parse_meminfo(meminfo)
+
+    # pressure stall information is only available on kernels with PSI enabled
+    for resource in PRESSURE_RESOURCES:
+        if pressure := _read(os.path.join(proc, "pressure", resource)):
+            snapshot.pressure[resource] = _parse_pressure(pressure)
+
+    return snapshot
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Persisted hook timing metrics, rendered in the Prometheus text exposition format.
+
+Samples are collected in memory during a dispatch and merged into a JSON state file once at
+its end. The state is then rendered to a textfile that the metrics exporter serves as is.
+"""
+
+import json
+import os
+from dataclasses import asdict, dataclass, field
+
+PREFIX = "runs_like_a_charm"
+
+# name, type, attribute, help text
+HANDLER_METRICS = [
+    ("handler_last_duration_seconds", "gauge", "last_duration", "Last handler run duration."),
+    ("handler_errors_total", "counter", "errors", "Handler runs that raised an exception."),
+    ("handler_deferrals_total", "counter", "deferrals", "Handler runs that deferred the event."),
+]
+SETUP_SCRIPT_METRICS = [
+    ("setup_script_runs_total", "counter", "runs", "Finished setup script runs."),
+    ("setup_script_failures_total", "counter", "failures", "Failed setup script runs."),
+    ("setup_script_last_duration_seconds", "gauge", "last_duration", "Last setup script run."),
+    ("setup_script_last_exit_code", "gauge", "last_exit_code", "Last setup script exit code."),
+]
+
+
+@dataclass
+class HandlerStats:
+    """Cumulative statistics of a single event handler."""
+
+    count: int = 0
+    duration_sum: float = 0.0
+    last_duration: float = 0.0
+    errors: int = 0
+    deferrals: int = 0
+
+
+@dataclass
+class SetupScriptStats:
+    """Statistics of the setup script runs."""
+
+    runs: int = 0
+    failures: int = 0
+    last_duration: float = 0.0
+    last_exit_code: int = 0
+
+
+@dataclass
+class MetricsState:
+    """All persisted metrics of the unit."""
+
+    handlers: dict[str, HandlerStats] = field(default_factory=dict)
+    setup_script: SetupScriptStats = field(default_factory=SetupScriptStats)
+
+    @classmethod
+    def load(cls, path: str) -> "MetricsState":
+        """Loads the metrics state from a file, returning an empty state if none is present."""
+        try:
+            with open(path) as f:
+                content = json.load(f)
+
+            return cls(
+                handlers={
+                    key: HandlerStats(**stats) for key, stats in content["handlers"].items()
+                },
+                setup_script=SetupScriptStats(**content["setup_script"]),
+            )
+        except (OSError, ValueError, TypeError, KeyError, AttributeError):
+            return cls()
+
+    def save(self, path: str) -> None:
+        """Atomically writes the metrics state to a file."""
+        _write_atomic(path, json.dumps(asdict(self)))
+
+
+def _write_atomic(path: str, content: str) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+def _labels(key: str) -> str:
+    event, _, handler = key.partition(":")
+    return f'{{event="{event}",handler="{handler}"}}'
+
+
+def render(state: MetricsState) -> str:
+    """Renders the metrics state in the Prometheus text exposition format."""
+    handlers = sorted(state.handlers.items())
+    setup = state.setup_script
+
+    lines = [
+        f"# HELP {PREFIX}_handler_duration_seconds Time spent in charm event handlers.",
+        f"# TYPE {PREFIX}_handler_duration_seconds summary",
+    ]
+    for key, stats in handlers:
+        lines.append(f"{PREFIX}_handler_duration_seconds_sum{_labels(key)} {stats.duration_sum}")
+        lines.append(f"{PREFIX}_handler_duration_seconds_count{_labels(key)} {stats.count}")
+
+    for name, kind, attribute, help_text in HANDLER_METRICS:
+        lines.append(f"# HELP {PREFIX}_{name} {help_text}")
+        lines.append(f"# TYPE {PREFIX}_{name} {kind}")
+        for key, stats in handlers:
+            lines.append(f"{PREFIX}_{name}{_labels(key)} {getattr(stats, attribute)}")
+
+    for name, kind, attribute, help_text in SETUP_SCRIPT_METRICS:
+        lines.append(f"# HELP {PREFIX}_{name} {help_text}")
+        lines.append(f"# TYPE {PREFIX}_{name} {kind}")
+        lines.append(f"{PREFIX}_{name} {getattr(setup, attribute)}")
+
+    return "\n".join(lines) + "\n"
+
+
+class HookMetrics:
+    """Collects metrics samples during a dispatch, and persists them once at its end."""
+
+    def __init__(self, state_path: str, textfile_path: str):
+        self.state_path = state_path
+        self.textfile_path = textfile_path
+        self._handlers: list[tuple[str, float, bool, bool]] = []
+        self._setup_script: list[tuple[float, int]] = []
+
+    def record_handler(
+        self, event: str, handler: str, duration: float, error: bool, deferred: bool
+    ) -> None:
+        """Records a single event handler run."""
+        self._handlers.append((f"{event}:{handler}", duration, error, deferred))
+
+    def record_setup_script(self, duration: float, exit_code: int) -> None:
+        """Records a finished setup script run."""
+        self._setup_script.append((duration, exit_code))
+
+    def flush(self) -> None:
+        """Merges the collected samples into the persisted state, and renders the textfile."""
+        if not self._handlers and not self._setup_script:
+            return
+
+        state = MetricsState.load(self.state_path)
+        for key, duration, error, deferred in self._handlers:
+            stats = state.handlers.setdefault(key, HandlerStats())
+            stats.count += 1
+            stats.duration_sum += duration
+            stats.last_duration = duration
+            stats.errors += int(error)
+            stats.deferrals += int(deferred)
+
+        for duration, exit_code in self._setup_script:
+            state.setup_script.runs += 1
+            state.setup_script.failures += int(exit_code != 0)
+            state.setup_script.last_duration = duration
+            state.setup_script.last_exit_code = exit_code
+
+        state.save(self.state_path)
+        _write_atomic(self.textfile_path, render(state))
+
+        self._handlers.clear()
+        self._setup_script.clear()
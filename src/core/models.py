@@ -62,6 +62,16 @@ class RunsLikeACharm(StateBase):
         """
         return int(self.component.name.split("/")[1])
 
+    @property
+    def artifact_source(self) -> str:
+        """The base URL of the artifact server of the unit, if it shares its artifacts."""
+        return self.relation_data.get("artifact-source", "")
+
+    @property
+    def artifact_digests(self) -> set[str]:
+        """The digests of the artifacts the unit has cached and shares with its peers."""
+        return set(self.relation_data.get("artifact-digests", "").split())
+
     @property
     def host(self) -> str:
         """Return the hostname of a unit."""
@@ -3,7 +3,9 @@
 # See LICENSE file for licensing details.
 
 """Structured configuration for the RunsLikeACharm charm."""
+import functools
 import logging
+import os
 import re
 from enum import Enum
 
@@ -13,8 +15,59 @@ from typing import Optional
 
 import yaml
 
+from core.artifacts import DEFAULT_MODE, Artifact
+
 logger = logging.getLogger(__name__)
 
+ARTIFACT_KEYS = {"url", "sha256", "destination"}
+ARTIFACT_OPTIONAL_KEYS = {"mode"}
+
+
+@functools.lru_cache(maxsize=None)
+def load_artifacts(value: str) -> tuple[Artifact, ...]:
+    """Parses and validates the `artifacts` YAML, once per distinct value.
+
+    Raises:
+        ValueError if the value is not a valid list of artifacts
+    """
+    try:
+        entries = yaml.safe_load(value)
+    except yaml.YAMLError as e:
+        raise ValueError(f"Value is not valid YAML - {e}")
+
+    if not isinstance(entries, list):
+        raise ValueError("Value is not a list")
+
+    artifacts = []
+    for entry in entries:
+        keys = set(entry) if isinstance(entry, dict) else set()
+        if not ARTIFACT_KEYS <= keys <= ARTIFACT_KEYS | ARTIFACT_OPTIONAL_KEYS:
+            raise ValueError("Artifacts need a url, sha256 and destination, and an optional mode")
+        if not re.fullmatch(r"[0-9a-fA-F]{64}", str(entry["sha256"])):
+            raise ValueError(f"Invalid sha256 digest {entry['sha256']}")
+        if not os.path.isabs(str(entry["destination"])):
+            raise ValueError(f"Destination {entry['destination']} is not an absolute path")
+
+        mode = entry.get("mode", DEFAULT_MODE)
+        try:
+            # YAML reads an unquoted 0755 as an octal integer, and a quoted one as a string
+            mode = mode if isinstance(mode, int) else int(str(mode), 8)
+        except ValueError:
+            mode = -1
+        if isinstance(mode, bool) or not 0 <= mode <= 0o7777:
+            raise ValueError(f"Invalid mode {entry['mode']}, expected an octal file mode")
+
+        artifacts.append(
+            Artifact(
+                url=str(entry["url"]),
+                sha256=str(entry["sha256"]).lower(),
+                destination=str(entry["destination"]),
+                mode=mode,
+            )
+        )
+
+    return tuple(artifacts)
+
 
 class LogMessageTimestampType(str, Enum):
     """Enum for the `log_message_timestamp_type` field."""
@@ -54,6 +107,10 @@ class CharmConfig(BaseConfigModel):
     """Manager for the structured configuration."""
 
     setup_script: Optional[str] = None
+    service_command: Optional[str] = None
+    artifacts: Optional[str] = None
+    share_artifacts: bool = False
+    rolling_batch_size: int = 1
 
     @validator("*", pre=True)
     @classmethod
@@ -72,3 +129,22 @@ class CharmConfig(BaseConfigModel):
 
         # no validation, for now
         return value
+
+    @validator("artifacts")
+    @classmethod
+    def artifacts_validator(cls, value: str | None) -> str | None:
+        """Check validity of `artifacts` field."""
+        if value is None:
+            return None
+
+        load_artifacts(value)
+        return value
+
+    @validator("rolling_batch_size")
+    @classmethod
+    def rolling_batch_size_validator(cls, value: int) -> int:
+        """Check validity of `rolling_batch_size` field."""
+        if value < 1:
+            raise ValueError("Value below minimum of 1")
+
+        return value
@@ -2,13 +2,15 @@
 # Copyright 2024 Canonical Ltd.
 # See LICENSE file for licensing details.
 
-"""Event handlers for password-related Juju Actions."""
+"""Event handlers for rolling restart Juju Actions."""
 import logging
 from typing import TYPE_CHECKING
 
 from ops.charm import ActionEvent
 from ops.framework import Object
 
+from managers.metrics import timed
+
 if TYPE_CHECKING:
     from charm import RunsLikeACharm
 
@@ -16,7 +18,7 @@ logger = logging.getLogger(__name__)
 
 
 class RollingRestartActionEvents(Object):
-    """Event handlers for password-related Juju Actions."""
+    """Event handlers for rolling restart Juju Actions."""
 
     def __init__(self, charm):
         super().__init__(charm, "restart")
@@ -26,10 +28,13 @@ class RollingRestartActionEvents(Object):
             getattr(self.charm.on, "rolling_restart_action"), self._rolling_restart_action
         )
 
+    @timed
     def _rolling_restart_action(self, event: ActionEvent) -> None:
         """Handler for rolling restart action.
 
-        Trigger a rolling restart of the node group
+        Trigger a rolling restart of the node group. Only runs on the leader unit, which holds
+        the rolling restart settings in the application data, and requests the restart lock
+        on behalf of every unit.
         """
         if not self.model.unit.is_leader():
             msg = "Rolling restart must be called on leader unit"
@@ -44,13 +49,39 @@ class RollingRestartActionEvents(Object):
             return
 
         roll_interval = event.params.get("interval", 0)
-        self.charm.model.get_relation(self.charm.restart_manager.name).data[self.charm.app].update(
-            {"restart-interval": f"{roll_interval}"}
+        if roll_interval < 0:
+            event.fail(f"Invalid interval {roll_interval}, expected a number of seconds")
+            return
+
+        max_concurrent = str(event.params.get("max-concurrent", "")).strip()
+        if max_concurrent and not self._valid_max_concurrent(max_concurrent):
+            event.fail(f"Invalid max-concurrent {max_concurrent}, expected a count or percentage")
+            return
+
+        manager = self.charm.restart_manager
+        self.charm.model.get_relation(manager.name).data[self.charm.app].update(
+            {
+                manager._interval_key: f"{roll_interval}",
+                manager._max_concurrent_key: max_concurrent,
+            }
         )
 
         try:
-            self.charm.on[self.charm.restart_manager.name].acquire_lock.emit()
+            # reboots are only needed for machine-level changes, otherwise restart the service
+            callback_override = "_reboot" if event.params.get("reboot", False) else None
+            manager.request_all(callback_override=callback_override)
         except Exception as e:
             logger.error(str(e))
-            event.fail(f"unable to initiate rolling restart")
+            event.fail("unable to initiate rolling restart")
             return
+
+    @staticmethod
+    def _valid_max_concurrent(value: str) -> bool:
+        """Checks a max-concurrent value is a positive count, or a percentage up to 100%."""
+        try:
+            if value.endswith("%"):
+                return 0 < float(value[:-1]) <= 100
+
+            return int(value) > 0
+        except ValueError:
+            return False
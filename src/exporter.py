@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Minimal HTTP exporter serving the charm metrics textfile for Prometheus scrapes.
+
+Runs under a systemd service generated by the charm. Only the standard library is used here,
+as the exporter runs as a standalone script.
+"""
+
+import argparse
+from functools import partial
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    """Serves the metrics textfile on `/metrics`."""
+
+    def __init__(self, *args, textfile: str, **kwargs):
+        self.textfile = textfile
+        super().__init__(*args, **kwargs)
+
+    def do_GET(self) -> None:  # noqa: N802
+        """Handles a scrape request."""
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+
+        try:
+            with open(self.textfile, "rb") as f:
+                body = f.read()
+        except OSError:
+            body = b""
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *_) -> None:
+        """Silences per-request logging."""
+        return
+
+
+def main() -> None:
+    """Entrypoint for the metrics exporter service."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--port", type=int, required=True, help="port to listen on")
+    parser.add_argument("--textfile", required=True, help="path of the metrics textfile")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("", args.port), partial(MetricsHandler, textfile=args.textfile))
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -4,14 +4,13 @@
 
 """Manager for handling RunsLikeACharm machine health."""
 
-import json
 import logging
-import subprocess
-from statistics import mean
 from typing import TYPE_CHECKING
 
 from ops.framework import Object
 
+from core.machine import MachineSnapshot, probe
+
 if TYPE_CHECKING:
     from charm import RunsLikeACharm
 
@@ -24,14 +23,24 @@ class RunsLikeACharmHealth(Object):
     def __init__(self, charm) -> None:
         super().__init__(charm, "runs_like_a_charm_health")
         self.charm: "RunsLikeACharm" = charm
-        
+        self._machine: MachineSnapshot | None = None
+        self._configured: bool | None = None
+
+    @property
+    def machine(self) -> MachineSnapshot:
+        """The machine snapshot for the current health evaluation."""
+        if self._machine is None:
+            self._machine = probe()
+
+        return self._machine
+
     def _get_max_memory_maps(self) -> int:
         """Gets the current memory map limit for the machine."""
-        return int(self.charm.workload.exec("sysctl -n vm.max_map_count"))
+        return self.machine.vm_max_map_count or 0
 
     def _get_vm_swappiness(self) -> int:
         """Gets the current vm.swappiness configured for the machine."""
-        return int(self.charm.workload.exec("sysctl -n vm.swappiness"))
+        return self.machine.vm_swappiness or 0
 
     def _check_vm_swappiness(self) -> bool:
         """Checks that vm.swappiness is configured correctly on the machine."""
@@ -39,7 +48,7 @@ class RunsLikeACharmHealth(Object):
 
         # FIXME: threshold should be a user configurable value
         if vm_swappiness > 1:
-            logger.error(
+            logger.warning(
                 f"machine vm.swappiness setting of {vm_swappiness} is higher than 1 - set /etc/syscl.conf vm.swappiness=1 and restart machine"
             )
             return False
@@ -48,23 +57,23 @@ class RunsLikeACharmHealth(Object):
 
     def _check_total_memory(self) -> bool:
         """Checks that the total available memory is sufficient for desired profile."""
-        if not (meminfo := self.charm.workload.read(path="/proc/meminfo")):
-            return False # NOTE: ??
+        if not self.machine.mem_total:
+            logger.error("machine total memory cannot be read from /proc/meminfo")
+            return False
 
         return True
 
     def machine_configured(self) -> bool:
-        """Checks machine configuration for healthy settings.
+        """Checks machine configuration for healthy settings, once per dispatch.
+
+        Only the total memory is required. The vm.swappiness check is advisory until its
+        threshold is configurable, as most machines exceed it out of the box.
 
         Returns:
             True if settings safely configured. Otherwise False
         """
-        if not all(
-            [
-                self._check_total_memory(),
-                self._check_vm_swappiness(),
-            ]
-        ):
-            return False
+        if self._configured is None:
+            self._check_vm_swappiness()
+            self._configured = self._check_total_memory()
 
-        return True
+        return self._configured
@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Detached supervisor for running the setup script outside of the Juju hook.
+
+The supervisor is launched by the workload in its own session, so that it outlives the
+hook which started it. It records its PID and process start time, timing and the exit code
+of the supervised command in a JSON state file, which later hooks poll instead of waiting on
+the command.
+
+Any artifacts listed in a JSON manifest are fetched through the local artifact cache before
+the command runs, failing the job if one of them cannot be provided.
+
+Setup scripts split into stages are run stage by stage from a JSON manifest. A completion
+marker holding the stage digest is written once a stage succeeds, and stages whose marker
+matches their current digest are skipped on later runs.
+
+Only the standard library is used here, as the supervisor runs as a standalone script.
+"""
+
+import argparse
+import json
+import logging
+import os
+import signal
+import subprocess
+import sys
+import time
+from dataclasses import asdict, dataclass
+
+from core import artifacts
+from core.capture import RotatingLog, run
+
+logger = logging.getLogger(__name__)
+
+BOOT_ID_PATH = "/proc/sys/kernel/random/boot_id"
+PROC_STAT_PATH = "/proc/{pid}/stat"
+# seconds a launched job may wait for the supervisor to record its pid before it is presumed dead
+LAUNCH_TIMEOUT = 60
+# exit code recorded when the supervisor could not be started, or failed outside the command
+SUPERVISOR_FAILED = 127
+
+
+def get_boot_id() -> str:
+    """Gets the id of the current machine boot, or an empty string if unavailable."""
+    try:
+        with open(BOOT_ID_PATH) as f:
+            return f.read().strip()
+    except OSError:
+        return ""
+
+
+def get_pid_start(pid: int) -> int | None:
+    """Gets the start time of a process in clock ticks since boot, or None if it is gone."""
+    try:
+        with open(PROC_STAT_PATH.format(pid=pid)) as f:
+            stat = f.read()
+    except OSError:
+        return None
+
+    # the command name may hold spaces and parentheses, the fields after it do not
+    fields = stat.rpartition(")")[2].split()
+    try:
+        # field 22 of the stat line, the first two being the pid and command name
+        return int(fields[19])
+    except (IndexError, ValueError):
+        return None
+
+
+@dataclass
+class Stage:
+    """A named section of a multi-stage setup script."""
+
+    name: str
+    script: str
+    digest: str
+
+
+@dataclass
+class JobState:
+    """Persisted state of a supervised job."""
+
+    pid: int | None = None
+    pid_start: int | None = None
+    boot_id: str = ""
+    started_at: float | None = None
+    finished_at: float | None = None
+    exit_code: int | None = None
+    stage: str = ""
+
+    @property
+    def running(self) -> bool:
+        """Checks whether the job is still in progress on the current boot."""
+        if self.started_at is None or self.exit_code is not None:
+            return False
+
+        # anything launched before a reboot is gone
+        if self.boot_id != get_boot_id():
+            return False
+
+        # not yet picked up by the supervisor, unless it never started
+        if self.pid is None:
+            return time.time() - self.started_at < LAUNCH_TIMEOUT
+
+        # the pid may since have been reused by an unrelated process
+        if self.pid_start is not None:
+            return get_pid_start(self.pid) == self.pid_start
+
+        try:
+            os.kill(self.pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+
+        return True
+
+    @property
+    def lost(self) -> bool:
+        """Checks whether the job was started but stopped without recording an exit code.
+
+        This happens when the supervisor is killed, the machine reboots mid-run, or the
+        supervisor never starts.
+        """
+        return self.started_at is not None and self.exit_code is None and not self.running
+
+    @property
+    def duration(self) -> float | None:
+        """The job run time in seconds, if it has finished."""
+        if self.started_at is None or self.finished_at is None:
+            return None
+
+        return self.finished_at - self.started_at
+
+    @classmethod
+    def load(cls, path: str) -> "JobState":
+        """Loads the job state from a file, returning an empty state if none is present."""
+        try:
+            with open(path) as f:
+                return cls(**json.load(f))
+        except (OSError, ValueError, TypeError):
+            return cls()
+
+    def save(self, path: str) -> None:
+        """Atomically writes the job state to a file."""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(asdict(self), f)
+        os.replace(tmp_path, path)
+
+
+def launch(
+    command: str,
+    state_path: str,
+    log_path: str,
+    stages_path: str | None = None,
+    artifacts_path: str | None = None,
+    cache_dir: str = "",
+    peers: dict[str, list[str]] = {},
+) -> JobState:
+    """Starts the job supervisor detached from the calling process.
+
+    Args:
+        command: the shell command to supervise, ignored if `stages_path` is set
+        state_path: the full filepath of the job state file
+        log_path: the full filepath the command output is written to
+        stages_path: the full filepath of a stages manifest to run instead of `command`
+        artifacts_path: the full filepath of an artifacts manifest to fetch beforehand
+        cache_dir: the root directory of the artifact cache
+        peers: the base URLs of the peer artifact servers to fetch artifacts from first, by
+            the digests they advertise as cached
+
+    Returns:
+        The initial state of the launched job
+
+    Raises:
+        OSError if the supervisor could not be started, recording the job as failed
+    """
+    state = JobState(boot_id=get_boot_id(), started_at=time.time())
+    state.save(state_path)
+
+    args = [sys.executable, os.path.abspath(__file__), "--state", state_path, "--log", log_path]
+    if artifacts_path:
+        args += ["--artifacts", artifacts_path, "--cache", cache_dir]
+        for digest, sources in peers.items():
+            for source in sources:
+                args += ["--peer", f"{digest}={source}"]
+    args += ["--stages", stages_path] if stages_path else [command]
+
+    try:
+        subprocess.Popen(
+            args,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True,
+            close_fds=True,
+        )
+    except OSError:
+        state.finished_at = time.time()
+        state.exit_code = SUPERVISOR_FAILED
+        state.save(state_path)
+        raise
+
+    return state
+
+
+def run_stages(stages_path: str, log: RotatingLog, state: JobState, state_path: str) -> int:
+    """Runs the stages of a manifest in order, skipping those already completed.
+
+    Each manifest entry holds the stage `name`, `digest`, the `path` of its script and the
+    `marker` filepath recording the digest of its last successful run.
+
+    Args:
+        stages_path: the full filepath of the stages manifest
+        log: the log that all stage output is streamed to
+        state: the state of the running job
+        state_path: the full filepath of the job state file
+
+    Returns:
+        The exit code of the first failing stage, or 0 if all stages succeeded
+    """
+    with open(stages_path) as f:
+        stages = json.load(f)
+
+    for stage in stages:
+        try:
+            with open(stage["marker"]) as f:
+                completed = f.read().strip() == stage["digest"]
+        except OSError:
+            completed = False
+
+        if completed:
+            log.write(f"=== skipping completed stage {stage['name']} ===\n".encode())
+            continue
+
+        log.write(f"=== running stage {stage['name']} ===\n".encode())
+        state.stage = stage["name"]
+        state.save(state_path)
+
+        exit_code = run(f"/bin/sh {stage['path']}", log=log, merge_stderr=True).returncode
+        if exit_code:
+            return exit_code
+
+        os.makedirs(os.path.dirname(stage["marker"]), exist_ok=True)
+        with open(stage["marker"], "w") as f:
+            f.write(stage["digest"])
+
+    return 0
+
+
+def supervise(
+    command: str | None,
+    state_path: str,
+    log_path: str,
+    stages_path: str | None = None,
+    artifacts_path: str | None = None,
+    cache_dir: str = "",
+    peers: dict[str, list[str]] = {},
+) -> int:
+    """Runs a command to completion, recording its progress in the job state file.
+
+    Args:
+        command: the shell command to run, ignored if `stages_path` is set
+        state_path: the full filepath of the job state file
+        log_path: the full filepath the command output is streamed to
+        stages_path: the full filepath of a stages manifest to run instead of `command`
+        artifacts_path: the full filepath of an artifacts manifest to fetch beforehand
+        cache_dir: the root directory of the artifact cache
+        peers: the base URLs of the peer artifact servers to fetch artifacts from first, by
+            the digests they advertise as cached
+
+    Returns:
+        The exit code of the command
+    """
+    state = JobState.load(state_path)
+    state.pid = os.getpid()
+    state.pid_start = get_pid_start(state.pid)
+    state.boot_id = get_boot_id()
+    state.started_at = state.started_at or time.time()
+    state.save(state_path)
+
+    # an exit code is always recorded, so that hooks never wait on a job that is gone
+    exit_code = SUPERVISOR_FAILED
+    try:
+        # each run starts a fresh log, keeping the previous runs as rotated backups
+        with RotatingLog(log_path, rotate=True) as log:
+            try:
+                missing = 0
+                if artifacts_path:
+                    state.stage = "artifacts"
+                    state.save(state_path)
+                    missing = artifacts.fetch_all(
+                        artifacts.load_manifest(artifacts_path),
+                        cache_dir=cache_dir,
+                        log=log,
+                        peers=peers,
+                    )
+
+                if missing:
+                    log.write(b"=== not running the setup script, artifacts are missing ===\n")
+                    exit_code = missing
+                elif stages_path:
+                    exit_code = run_stages(
+                        stages_path, log=log, state=state, state_path=state_path
+                    )
+                else:
+                    exit_code = run(command or "", log=log, merge_stderr=True).returncode
+            except Exception as e:
+                # such as unreadable or malformed manifests
+                log.write(f"=== supervisor failed - {e!r} ===\n".encode())
+                exit_code = SUPERVISOR_FAILED
+    finally:
+        state.finished_at = time.time()
+        state.exit_code = exit_code
+        state.save(state_path)
+
+    return exit_code
+
+
+def main() -> int:
+    """Entrypoint for the detached supervisor process."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--state", required=True, help="path of the job state file")
+    parser.add_argument("--log", required=True, help="path of the job output log")
+    parser.add_argument("--stages", help="path of a stages manifest to run instead of a command")
+    parser.add_argument("--artifacts", help="path of an artifacts manifest to fetch beforehand")
+    parser.add_argument("--cache", default="", help="path of the artifact cache")
+    parser.add_argument(
+        "--peer",
+        action="append",
+        default=[],
+        help="DIGEST=URL of a peer artifact server caching an artifact",
+    )
+    parser.add_argument("command", nargs="?", help="shell command to run")
+    args = parser.parse_args()
+
+    peers: dict[str, list[str]] = {}
+    for peer in args.peer:
+        digest, _, source = peer.partition("=")
+        peers.setdefault(digest, []).append(source)
+
+    # unwind on termination, so that the exit code is still recorded
+    signal.signal(signal.SIGTERM, lambda signum, _: sys.exit(128 + signum))
+
+    return supervise(
+        args.command,
+        state_path=args.state,
+        log_path=args.log,
+        stages_path=args.stages,
+        artifacts_path=args.artifacts,
+        cache_dir=args.cache,
+        peers=peers,
+    )
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -14,19 +14,51 @@ CHARM_KEY = "runs-like-a-charm"
 CONTAINER = "runslikeacharm"
 
 PEER = "cluster"
+COS_AGENT = "cos-agent"
+# hooks the COS agent provider refreshes its relation data on
+COS_AGENT_HOOKS = [
+    f"{COS_AGENT}-relation-joined",
+    f"{COS_AGENT}-relation-changed",
+    "config-changed",
+]
 
 SUBSTRATE = "vm"
 USER = "runslikeacharm"
 GROUP = "runslikeacharm"
 
 CMD_TIMEOUT = 180
+# seconds a rolling restart waits for the unit to become healthy before giving up the lock
+RESTART_HEALTH_TIMEOUT = 600
+# checks, a second apart, that a freshly (re)started service is running
+SERVICE_START_ATTEMPTS = 5
+STAGE_MARKER = r"^#\s*stage:\s*(?P<name>[\w.-]+)\s*$"
 INTERVAL = "restart-interval"
 DebugLevel = Literal["DEBUG", "INFO", "WARNING", "ERROR"]
 Substrate = Literal["vm", "k8s"]
 DatabagScope = Literal["unit", "app"]
 
+SERVICE = "runs-like-a-charm-workload"
+EXPORTER_SERVICE = "runs-like-a-charm-exporter"
+ARTIFACT_SERVICE = "runs-like-a-charm-artifacts"
+METRICS_PORT = 9110
+ARTIFACTS_PORT = 9111
+
 PATHS = {
     "INSTALL_SCRIPT": "/opt/user-install-script",
+    "SERVICE_SCRIPT": "/opt/user-service",
+    "SERVICE_UNIT": f"/etc/systemd/system/{SERVICE}.service",
+    "EXPORTER_UNIT": f"/etc/systemd/system/{EXPORTER_SERVICE}.service",
+    "ARTIFACT_SERVER_UNIT": f"/etc/systemd/system/{ARTIFACT_SERVICE}.service",
+    "METRICS_STATE": "/var/lib/runs-like-a-charm/metrics.json",
+    "METRICS_TEXTFILE": "/var/lib/runs-like-a-charm/metrics.prom",
+    "SETUP_STAGES_DIR": "/opt/user-install-script.d",
+    "SETUP_STAGES_MANIFEST": "/var/lib/runs-like-a-charm/setup-stages.json",
+    "SETUP_STAGE_MARKERS": "/var/lib/runs-like-a-charm/stages",
+    "SETUP_JOB_STATE": "/var/lib/runs-like-a-charm/setup-job.json",
+    "SETUP_JOB_LOG": "/var/log/runs-like-a-charm/setup-script.log",
+    "EXEC_LOG": "/var/log/runs-like-a-charm/exec.log",
+    "ARTIFACTS_MANIFEST": "/var/lib/runs-like-a-charm/artifacts.json",
+    "ARTIFACT_CACHE": "/var/cache/runs-like-a-charm/sha256",
 }
 
 @dataclass
@@ -46,11 +78,29 @@ class Status(Enum):
         ActiveStatus("user filesystem added to node at /opt/data"),
         "DEBUG",
     )
+    SETUP_PENDING = StatusLevel(WaitingStatus("waiting to apply setup script changes"), "DEBUG")
+    SETUP_RUNNING = StatusLevel(MaintenanceStatus("running setup script"), "DEBUG")
     INIT_FAIL = StatusLevel(
         BlockedStatus("setup configuration cannot be set - check logs"),
         "ERROR",
     )
+    SERVICE_FAIL = StatusLevel(
+        BlockedStatus("service is not running - check logs"),
+        "ERROR",
+    )
     RESTART_FAIL = StatusLevel(
         BlockedStatus("Rolling restart failed - check logs"),
         "ERROR",
     )
+    RESTART_WAITING = StatusLevel(
+        WaitingStatus("rolling restart waiting for the unit to become healthy"),
+        "WARNING",
+    )
+    RESTART_SKIPPED = StatusLevel(
+        BlockedStatus("rolling restart skipped, unit not healthy - check logs"),
+        "ERROR",
+    )
+    MACHINE_FAIL = StatusLevel(
+        BlockedStatus("machine memory cannot be read - check logs"),
+        "ERROR",
+    )
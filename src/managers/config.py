@@ -4,14 +4,19 @@
 
 """Manager for handling RunsLikeACharm configuration."""
 
+import hashlib
 import logging
+import re
 from typing import cast
 
+from core.artifacts import Artifact, dump_manifest
 from core.cluster import ClusterState
-from core.structured_config import CharmConfig, LogLevel
+from core.structured_config import CharmConfig, LogLevel, load_artifacts
 from core.workload import WorkloadBase
+from job import Stage
 from literals import (
     PATHS,
+    STAGE_MARKER,
 )
 
 logger = logging.getLogger(__name__)
@@ -46,3 +51,94 @@ class RunsLikeACharmConfigManager:
         """
         return self.config.setup_script
 
+
+    @property
+    def setup_script_digest(self) -> str:
+        """Return the sha256 digest of the configured setup script and its artifacts.
+
+        Returns:
+            hex digest identifying the setup script content
+        """
+        return self.script_digest(self.setup_script or "")
+
+    def script_digest(self, script: str) -> str:
+        """Return the sha256 digest of a setup script along with the configured artifacts.
+
+        Args:
+            script: the content of the setup script
+
+        Returns:
+            hex digest identifying the setup script content
+        """
+        content = self.artifacts_digest + script
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+    @property
+    def artifacts(self) -> list[Artifact]:
+        """Return the artifacts to fetch before the setup script runs.
+
+        Returns:
+            list of artifacts, empty if none are configured
+        """
+        if not self.config.artifacts:
+            return []
+
+        return list(load_artifacts(self.config.artifacts))
+
+    @property
+    def artifacts_digest(self) -> str:
+        """Return the sha256 digest of the configured artifacts.
+
+        Returns:
+            hex digest identifying the artifacts, empty if none are configured
+        """
+        if not (artifacts := self.artifacts):
+            return ""
+
+        return hashlib.sha256(dump_manifest(artifacts).encode("utf-8")).hexdigest()
+
+    @property
+    def setup_stages(self) -> list[Stage]:
+        """Return the stages declared in the setup script with `# stage: <name>` comments.
+
+        Any preamble before the first marker is prepended to every stage. Each stage digest
+        also covers the digests of the artifacts and of the stages before it, so a changed
+        stage re-runs along with every stage that follows it.
+
+        Returns:
+            list of setup script stages, empty if the script declares none
+        """
+        script = self.setup_script or ""
+        markers = list(re.finditer(STAGE_MARKER, script, flags=re.MULTILINE))
+        if not markers:
+            return []
+
+        preamble = script[: markers[0].start()]
+        ends = [marker.start() for marker in markers[1:]] + [len(script)]
+
+        stages = []
+        digest = self.artifacts_digest
+        for marker, end in zip(markers, ends):
+            content = preamble + script[marker.start() : end]
+            digest = hashlib.sha256((digest + content).encode("utf-8")).hexdigest()
+            stages.append(Stage(name=marker.group("name"), script=content, digest=digest))
+
+        return stages
+
+    @property
+    def service_command(self) -> str:
+        """Return the long-running service command provided by the user.
+
+        Returns:
+            the service command, empty if the charm does not supervise a service
+        """
+        return self.config.service_command or ""
+
+    @property
+    def service_digest(self) -> str:
+        """Return the sha256 digest of the configured service command.
+
+        Returns:
+            hex digest identifying the service command
+        """
+        return hashlib.sha256(self.service_command.encode("utf-8")).hexdigest()
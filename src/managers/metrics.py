@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Manager for RunsLikeACharm hook timing metrics."""
+
+import functools
+import logging
+import time
+from typing import Callable
+
+from ops.charm import CharmBase
+from ops.framework import EventBase, Object
+
+from core.metrics import HookMetrics
+from literals import PATHS
+
+logger = logging.getLogger(__name__)
+
+
+def timed(handler: Callable) -> Callable:
+    """Records the run time, outcome and deferral of an event handler in the charm metrics.
+
+    Decorates handlers of the charm, or of objects holding it as `self.charm`.
+    """
+
+    @functools.wraps(handler)
+    def wrapper(self, event: EventBase):
+        metrics: RunsLikeACharmMetricsManager = getattr(self, "charm", self).metrics
+        start = time.monotonic()
+        try:
+            result = handler(self, event)
+        except Exception:
+            metrics.record_handler(event, handler.__name__, time.monotonic() - start, error=True)
+            # failing dispatches are not committed, so persist right away
+            metrics.flush()
+            raise
+
+        metrics.record_handler(event, handler.__name__, time.monotonic() - start)
+        return result
+
+    return wrapper
+
+
+class RunsLikeACharmMetricsManager(Object):
+    """Manager for RunsLikeACharm hook timing metrics.
+
+    Samples are kept in memory and written to the metrics textfile once, when the dispatch
+    commits.
+    """
+
+    def __init__(self, charm: CharmBase):
+        super().__init__(charm, "metrics")
+        self.metrics = HookMetrics(
+            state_path=PATHS["METRICS_STATE"], textfile_path=PATHS["METRICS_TEXTFILE"]
+        )
+
+        self.framework.observe(self.framework.on.commit, self._on_commit)
+
+    def _on_commit(self, _) -> None:
+        """Persists the samples collected during the dispatch."""
+        self.flush()
+
+    def record_handler(
+        self, event: EventBase, handler: str, duration: float, error: bool = False
+    ) -> None:
+        """Records a single event handler run.
+
+        Args:
+            event: the event handled
+            handler: the name of the handler
+            duration: the handler run time in seconds
+            error: whether the handler raised an exception. Default False
+        """
+        self.metrics.record_handler(
+            event.handle.kind, handler, duration, error=error, deferred=event.deferred
+        )
+
+    def record_setup_script(self, duration: float, exit_code: int) -> None:
+        """Records a finished setup script run.
+
+        Args:
+            duration: the setup script run time in seconds
+            exit_code: the setup script exit code
+        """
+        self.metrics.record_setup_script(duration, exit_code)
+
+    def flush(self) -> None:
+        """Writes the collected samples to the metrics textfile."""
+        try:
+            self.metrics.flush()
+        except OSError as e:
+            logger.warning(f"writing metrics failed - {e}")
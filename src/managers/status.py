@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Manager for publishing the RunsLikeACharm unit status."""
+
+import logging
+
+from ops.charm import CharmBase
+from ops.framework import Object, StoredState
+from ops.model import StatusBase
+
+from literals import DebugLevel, Status
+
+logger = logging.getLogger(__name__)
+
+
+class RunsLikeACharmStatusManager(Object):
+    """Manager for publishing the RunsLikeACharm unit status.
+
+    Tracks the last published status across dispatches, and skips the `status-set` call and
+    log line when a status is set again unchanged. Statuses set outside of the manager are
+    not tracked, so the record is forgotten after events of the given relations, which may
+    set the unit status themselves.
+    """
+
+    _stored = StoredState()
+
+    def __init__(self, charm: CharmBase, relations: list[str] = []):
+        super().__init__(charm, "status")
+        self.charm = charm
+        self._stored.set_default(name="", message="", log_level="")
+
+        for relation in relations:
+            for event in ["relation_changed", "acquire_lock", "run_with_lock"]:
+                if hasattr(self.charm.on[relation], event):
+                    self.framework.observe(getattr(self.charm.on[relation], event), self._forget)
+
+    def _forget(self, _) -> None:
+        """Forgets the last published status, so that the next one is always written."""
+        self._stored.name = ""
+        self._stored.message = ""
+        self._stored.log_level = ""
+
+    def set(self, key: Status) -> None:
+        """Publishes a unit status, if it differs from the last published one.
+
+        Args:
+            key: the status to publish
+        """
+        status: StatusBase = key.value.status
+        log_level: DebugLevel = key.value.log_level
+
+        if (status.name, status.message, log_level) == (
+            self._stored.name,
+            self._stored.message,
+            self._stored.log_level,
+        ):
+            return
+
+        getattr(logger, log_level.lower())(status.message)
+        self.charm.unit.status = status
+
+        self._stored.name = status.name
+        self._stored.message = status.message
+        self._stored.log_level = log_level
@@ -4,20 +4,34 @@
 
 """CloudInit class and methods."""
 
+import json
 import logging
 import os
 import subprocess
 
-from tenacity import retry
-from tenacity.retry import retry_if_not_result
-from tenacity.stop import stop_after_attempt
-from tenacity.wait import wait_fixed
 from typing_extensions import override
-from literals import PATHS, CMD_TIMEOUT
+from literals import PATHS, ARTIFACT_SERVICE, CMD_TIMEOUT, EXPORTER_SERVICE, SERVICE
+from core.artifacts import Artifact, cache_path, dump_manifest
+from core.capture import RotatingLog, log_tail, read_tail, run
 from core.workload import WorkloadBase
+from job import JobState, Stage, launch
 
 logger = logging.getLogger(__name__)
 
+SERVICE_UNIT_TEMPLATE = """[Unit]
+Description={description}
+After=network-online.target
+Wants=network-online.target
+
+[Service]
+ExecStart={exec_start}
+Restart=on-failure
+RestartSec=5
+
+[Install]
+WantedBy=multi-user.target
+"""
+
 
 class RunsLikeACharmWorkload(WorkloadBase):
     """Wrapper for performing common operations specific to the 
@@ -25,24 +39,190 @@ class RunsLikeACharmWorkload(WorkloadBase):
     """
 
     @override
-    def start(self) -> None:
-        """Runs the setup script"""
+    def start(
+        self,
+        stages: list[Stage] | None = None,
+        artifacts: list[Artifact] | None = None,
+        peers: dict[str, list[str]] = {},
+    ) -> None:
+        """Launches the setup script in the background under the job supervisor.
+
+        Args:
+            stages: the stages of the setup script, if any. Stages completed by a
+                previous run with an unchanged digest are skipped
+            artifacts: the artifacts to fetch through the local cache before the setup
+                script runs, if any
+            peers: the base URLs of the peer artifact servers to fetch artifacts from first,
+                by the digests they advertise as cached
+        """
         the_script = PATHS["INSTALL_SCRIPT"]
-        try:
-            self.exec(f"/bin/sh {the_script}")
-        except Exception as e:
-            logger.error(f"running setup script failed - stdout={e.stdout}, stderr={e.stderr}")
-            raise e
+        stages_path = self.write_stages(stages) if stages else None
+        artifacts_path = self.write_artifacts(artifacts) if artifacts else None
+        state = launch(
+            f"/bin/sh {the_script}",
+            state_path=PATHS["SETUP_JOB_STATE"],
+            log_path=PATHS["SETUP_JOB_LOG"],
+            stages_path=stages_path,
+            artifacts_path=artifacts_path,
+            cache_dir=PATHS["ARTIFACT_CACHE"],
+            peers=peers,
+        )
+        logger.debug(f"setup script launched - started_at={state.started_at}")
+
+    def write_stages(self, stages: list[Stage]) -> str:
+        """Writes the setup script stages and their manifest for the job supervisor.
+
+        Args:
+            stages: the stages of the setup script
+
+        Returns:
+            The full filepath of the written stages manifest
+        """
+        stages_dir = PATHS["SETUP_STAGES_DIR"]
+        manifest = []
+        for index, stage in enumerate(stages):
+            filename = f"{index:02d}-{stage.name}"
+            self.write(stage.script, f"{stages_dir}/{filename}")
+            manifest.append(
+                {
+                    "name": stage.name,
+                    "digest": stage.digest,
+                    "path": f"{stages_dir}/{filename}",
+                    "marker": f"{PATHS['SETUP_STAGE_MARKERS']}/{filename}.done",
+                }
+            )
+
+        # drop scripts of stages no longer declared
+        current = {os.path.basename(entry["path"]) for entry in manifest}
+        for filename in set(os.listdir(stages_dir)) - current:
+            os.remove(f"{stages_dir}/{filename}")
+
+        self.write(json.dumps(manifest), PATHS["SETUP_STAGES_MANIFEST"])
+        return PATHS["SETUP_STAGES_MANIFEST"]
+
+    def write_artifacts(self, artifacts: list[Artifact]) -> str:
+        """Writes the manifest of the artifacts to fetch for the job supervisor.
+
+        Args:
+            artifacts: the artifacts to fetch
+
+        Returns:
+            The full filepath of the written artifacts manifest
+        """
+        self.write(dump_manifest(artifacts), PATHS["ARTIFACTS_MANIFEST"])
+        return PATHS["ARTIFACTS_MANIFEST"]
+
+    def cached_artifacts(self, artifacts: list[Artifact]) -> list[str]:
+        """Gets the digests of the given artifacts present in the local artifact cache."""
+        return [
+            artifact.sha256
+            for artifact in artifacts
+            if os.path.exists(cache_path(PATHS["ARTIFACT_CACHE"], artifact.sha256))
+        ]
+
+    def job_state(self) -> JobState:
+        """Gets the state of the most recent setup script run."""
+        return JobState.load(PATHS["SETUP_JOB_STATE"])
+
+    def job_output(self) -> str:
+        """Gets the bounded tail of the most recent setup script output."""
+        return read_tail(PATHS["SETUP_JOB_LOG"])
 
     @override
     def stop(self) -> None:
-        return
+        """Stops the user-defined service, if installed."""
+        if self.service_installed:
+            self.exec(f"systemctl stop {SERVICE}")
 
     @override
     def restart(self) -> None:
+        """Restarts the user-defined service, or reboots the node if none is installed."""
+        if not self.service_installed:
+            self.reboot()
+            return
+
+        self.exec(f"systemctl restart {SERVICE}")
+
+    def reboot(self) -> None:
         """Reboots the node"""
         self.exec("shutdown -r +1")
 
+    @property
+    def service_installed(self) -> bool:
+        """Checks whether the user-defined service unit is installed."""
+        return os.path.exists(PATHS["SERVICE_UNIT"])
+
+    def install_service(self, command: str) -> None:
+        """Installs the user-defined service unit and (re)starts it.
+
+        Args:
+            command: the long-running command supervised by the service
+        """
+        self.write(command, PATHS["SERVICE_SCRIPT"])
+        self._install_unit(
+            SERVICE,
+            path=PATHS["SERVICE_UNIT"],
+            description="RunsLikeACharm user-defined service",
+            exec_start=f"/bin/sh {PATHS['SERVICE_SCRIPT']}",
+        )
+
+    def install_exporter(self, exec_start: str) -> None:
+        """Installs the charm metrics exporter unit and (re)starts it.
+
+        Args:
+            exec_start: the command line of the exporter
+        """
+        self._install_unit(
+            EXPORTER_SERVICE,
+            path=PATHS["EXPORTER_UNIT"],
+            description="RunsLikeACharm charm metrics exporter",
+            exec_start=exec_start,
+        )
+
+    def install_artifact_server(self, exec_start: str) -> None:
+        """Installs the unit serving the artifact cache to peers, and (re)starts it.
+
+        Args:
+            exec_start: the command line of the artifact server
+        """
+        self._install_unit(
+            ARTIFACT_SERVICE,
+            path=PATHS["ARTIFACT_SERVER_UNIT"],
+            description="RunsLikeACharm peer artifact server",
+            exec_start=exec_start,
+        )
+
+    def remove_exporter(self) -> None:
+        """Stops and removes the charm metrics exporter unit, if installed."""
+        self._remove_unit(EXPORTER_SERVICE, path=PATHS["EXPORTER_UNIT"])
+
+    def remove_artifact_server(self) -> None:
+        """Stops and removes the unit serving the artifact cache to peers, if installed."""
+        self._remove_unit(ARTIFACT_SERVICE, path=PATHS["ARTIFACT_SERVER_UNIT"])
+
+    def _install_unit(self, name: str, path: str, description: str, exec_start: str) -> None:
+        """Writes a systemd service unit, then enables and (re)starts it."""
+        # unit files must not be executable, so not written through `write`
+        with open(path, "w") as f:
+            f.write(SERVICE_UNIT_TEMPLATE.format(description=description, exec_start=exec_start))
+
+        self.exec("systemctl daemon-reload")
+        self.exec(f"systemctl enable {name}")
+        self.exec(f"systemctl restart {name}")
+
+    def remove_service(self) -> None:
+        """Stops and removes the user-defined service unit, if installed."""
+        self._remove_unit(SERVICE, path=PATHS["SERVICE_UNIT"])
+
+    def _remove_unit(self, name: str, path: str) -> None:
+        """Stops, disables and deletes a systemd service unit, if installed."""
+        if not os.path.exists(path):
+            return
+
+        self.exec(f"systemctl disable --now {name}")
+        os.remove(path)
+        self.exec("systemctl daemon-reload")
+
     @override
     def read(self, path: str) -> list[str]:
         if not os.path.exists(path):
@@ -65,30 +245,60 @@ class RunsLikeACharmWorkload(WorkloadBase):
     def exec(
         self, command: str, env: dict[str, str] | None = None, working_dir: str | None = None
     ) -> str:
-        try:
-            output = subprocess.check_output(
+        # the output is returned whole, as callers may parse it, and only the log is bounded
+        with RotatingLog(PATHS["EXEC_LOG"]) as log:
+            result = run(
                 command,
-                stderr=subprocess.PIPE,
-                universal_newlines=True,
-                shell=True,
-                cwd=working_dir,
-                timeout=CMD_TIMEOUT
+                log=log,
+                timeout=CMD_TIMEOUT,
+                env=env,
+                working_dir=working_dir,
+                tail_size=None,
+            )
+
+        if result.returncode:
+            logger.debug(
+                f"cmd failed - cmd={command}, "
+                f"stdout={log_tail(result.stdout)}, stderr={log_tail(result.stderr)}"
+            )
+            raise subprocess.CalledProcessError(
+                result.returncode, command, output=result.stdout, stderr=result.stderr
             )
-            logger.debug(f"{output=}")
-            return output
-        except subprocess.CalledProcessError as e:
-            logger.debug(f"cmd failed - cmd={e.cmd}, stdout={e.stdout}, stderr={e.stderr}")
-            raise e
-
-    @retry(
-        wait=wait_fixed(1),
-        stop=stop_after_attempt(5),
-        retry_error_callback=lambda state: state.outcome.result(),  # type: ignore
-        retry=retry_if_not_result(lambda result: True if result else False),
-    )
+
+        logger.debug(f"output={log_tail(result.stdout)!r}")
+        return result.stdout
+
     @override
-    def active(self) -> bool:
-        return True
+    def active(self, attempts: int = 1) -> bool:
+        """Checks that the user-defined service, if installed, is running.
+
+        Args:
+            attempts: the number of checks, a second apart, before the service is reported
+                as not running. Default 1, so that status hooks never wait on a failed service
+        """
+        if not self.service_installed:
+            return True
+
+        def is_active() -> bool:
+            try:
+                self.exec(f"systemctl is-active --quiet {SERVICE}")
+            except subprocess.CalledProcessError:
+                return False
+
+            return True
+
+        if attempts <= 1:
+            return is_active()
+
+        # only imported by the dispatches that wait on a (re)started service
+        from tenacity import retry, retry_if_not_result, stop_after_attempt, wait_fixed
+
+        return retry(
+            wait=wait_fixed(1),
+            stop=stop_after_attempt(attempts),
+            retry_error_callback=lambda state: state.outcome.result(),  # type: ignore
+            retry=retry_if_not_result(lambda result: True if result else False),
+        )(is_active)()
 
     @override
     def run_bin_command(self, bin_keyword: str, bin_args: list[str], opts: list[str] = []) -> str:
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Fixtures for benchmarking RunsLikeACharm hook latency against growing peer relations."""
+
+import functools
+import json
+import time
+import tracemalloc
+from collections import Counter
+from dataclasses import asdict, dataclass
+from typing import Callable
+
+import pytest
+from ops.model import _ModelBackend
+from ops.testing import Harness
+
+from charm import RunsLikeACharm
+from job import JobState
+from literals import CHARM_KEY, PATHS, PEER
+from workload import RunsLikeACharmWorkload
+
+RESTART = "restart"
+DEFAULT_UNITS = "1,10,100,1000"
+
+# every public `_ModelBackend` method maps to a Juju hook tool invocation
+HOOK_TOOLS = [
+    name
+    for name in dir(_ModelBackend)
+    if not name.startswith("_") and callable(getattr(_ModelBackend, name))
+]
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        "--benchmark-units",
+        default=DEFAULT_UNITS,
+        help=f"comma separated peer relation sizes to benchmark. Default {DEFAULT_UNITS}",
+    )
+    parser.addoption("--benchmark-json", help="path to write the benchmark results to as JSON")
+
+
+class StubWorkload(RunsLikeACharmWorkload):
+    """Workload that keeps every file and command in memory, and never touches the machine."""
+
+    def __init__(self):
+        self.files: dict[str, str] = {}
+        self.commands: list[str] = []
+        self.job = JobState()
+
+    def start(self, stages=None, artifacts=None, peers=[]) -> None:
+        now = time.time()
+        self.job = JobState(started_at=now, finished_at=now, exit_code=0)
+
+    def stop(self) -> None:
+        self.commands.append("stop")
+
+    def restart(self) -> None:
+        self.commands.append("restart")
+
+    def reboot(self) -> None:
+        self.commands.append("reboot")
+
+    def job_state(self) -> JobState:
+        return self.job
+
+    def job_output(self) -> str:
+        return ""
+
+    @property
+    def service_installed(self) -> bool:
+        return False
+
+    def install_service(self, command: str) -> None:
+        self.commands.append(f"install-service {command}")
+
+    def install_exporter(self, exec_start: str) -> None:
+        self.commands.append(f"install-exporter {exec_start}")
+
+    def install_artifact_server(self, exec_start: str) -> None:
+        self.commands.append(f"install-artifact-server {exec_start}")
+
+    def remove_service(self) -> None:
+        self.commands.append("remove-service")
+
+    def read(self, path: str) -> list[str]:
+        return self.files.get(path, "").split("\n") if path in self.files else []
+
+    def write(self, content: str, path: str, mode: str = "w") -> None:
+        self.files[path] = (self.files.get(path, "") if mode == "a" else "") + content
+
+    def exec(self, command: str, env=None, working_dir=None) -> str:
+        self.commands.append(command)
+        return ""
+
+    def active(self, attempts: int = 1) -> bool:
+        return True
+
+
+class HookToolCounter:
+    """Counts the hook tool calls made through a model backend."""
+
+    def __init__(self, backend):
+        self.counts = Counter()
+        for name in HOOK_TOOLS:
+            if method := getattr(backend, name, None):
+                setattr(backend, name, self._wrap(name, method))
+
+    def _wrap(self, name: str, method: Callable) -> Callable:
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            self.counts[name] += 1
+            return method(*args, **kwargs)
+
+        return wrapper
+
+
+@dataclass
+class Result:
+    """Cost of a single dispatch of an event."""
+
+    event: str
+    units: int
+    wall_time: float
+    hook_tool_calls: int
+    peak_memory: int
+    calls: dict[str, int]
+
+
+RESULTS = pytest.StashKey[list[Result]]()
+# cumulative import time in microseconds, by package
+IMPORT_TIMES = pytest.StashKey[dict[str, int]]()
+# wall time in seconds, by operation
+MICROBENCHMARKS = pytest.StashKey[dict[str, float]]()
+
+
+def build_harness(units: int, lock_state: str = "") -> Harness:
+    """Builds a started leader harness with `units` units in the peer relations.
+
+    Relations are populated before the charm is instantiated, so setting them up does not
+    dispatch any events.
+    """
+    harness = Harness(RunsLikeACharm)
+    harness.set_leader(True)
+    harness.add_network("10.0.0.10")
+
+    peer_id = harness.add_relation(PEER, CHARM_KEY)
+    restart_id = harness.add_relation(RESTART, CHARM_KEY)
+    for index in range(1, units):
+        unit = f"{CHARM_KEY}/{index}"
+        harness.add_relation_unit(peer_id, unit)
+        harness.update_relation_data(peer_id, unit, {"hostname": f"host-{index}"})
+        harness.add_relation_unit(restart_id, unit)
+        if lock_state:
+            harness.update_relation_data(restart_id, unit, {"state": lock_state})
+
+    harness.begin()
+    return harness
+
+
+def new_dispatch(harness: Harness) -> None:
+    """Drops everything the charm cached so far, as a fresh dispatch would."""
+    harness.charm.state._invalidate(None)
+    harness.charm._invalidate_config(None)
+
+
+@pytest.fixture(autouse=True)
+def stub_machine(monkeypatch, tmp_path):
+    """Keeps the charm off the machine, swapping the workload and writing metrics locally."""
+    monkeypatch.setattr("charm.RunsLikeACharmWorkload", StubWorkload)
+    for key in ["METRICS_STATE", "METRICS_TEXTFILE"]:
+        monkeypatch.setitem(PATHS, key, str(tmp_path / PATHS[key].lstrip("/")))
+
+
+@pytest.fixture(scope="session")
+def benchmark_units(request) -> list[int]:
+    return [int(units) for units in request.config.getoption("--benchmark-units").split(",")]
+
+
+@pytest.fixture(scope="session")
+def results(request) -> list[Result]:
+    request.config.stash.setdefault(RESULTS, [])
+    return request.config.stash[RESULTS]
+
+
+@pytest.fixture
+def measure(results) -> Callable[..., Result]:
+    """Measures a dispatch of an event against a peer relation of the given size.
+
+    Wall time and hook tool calls, and peak memory, are measured in separate runs on fresh
+    harnesses, so that allocation tracing does not skew the timings.
+    """
+
+    def _measure(
+        event: str,
+        units: int,
+        dispatch: Callable[[Harness], None],
+        prepare: Callable[[Harness], None] = lambda _: None,
+        lock_state: str = "",
+    ) -> Result:
+        harness = build_harness(units, lock_state=lock_state)
+        prepare(harness)
+        new_dispatch(harness)
+        counter = HookToolCounter(harness._backend)
+
+        start = time.perf_counter()
+        dispatch(harness)
+        wall_time = time.perf_counter() - start
+        calls = dict(counter.counts)
+        harness.cleanup()
+
+        harness = build_harness(units, lock_state=lock_state)
+        prepare(harness)
+        new_dispatch(harness)
+
+        tracemalloc.start()
+        try:
+            dispatch(harness)
+            _, peak_memory = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        harness.cleanup()
+
+        result = Result(
+            event=event,
+            units=units,
+            wall_time=wall_time,
+            hook_tool_calls=sum(calls.values()),
+            peak_memory=peak_memory,
+            calls=calls,
+        )
+        results.append(result)
+        return result
+
+    return _measure
+
+
+@pytest.fixture(scope="session")
+def import_times(request) -> dict[str, int]:
+    request.config.stash.setdefault(IMPORT_TIMES, {})
+    return request.config.stash[IMPORT_TIMES]
+
+
+@pytest.fixture(scope="session")
+def microbenchmarks(request) -> dict[str, float]:
+    request.config.stash.setdefault(MICROBENCHMARKS, {})
+    return request.config.stash[MICROBENCHMARKS]
+
+
+def pytest_terminal_summary(terminalreporter, config):
+    if microbenchmarks := config.stash.get(MICROBENCHMARKS, {}):
+        terminalreporter.section("microbenchmarks")
+        terminalreporter.line(f"{'operation':<56} {'wall time (ms)':>15}")
+        for operation, seconds in microbenchmarks.items():
+            terminalreporter.line(f"{operation:<56} {seconds * 1000:>15.2f}")
+
+    if import_times := config.stash.get(IMPORT_TIMES, {}):
+        terminalreporter.section("import time")
+        terminalreporter.line(f"{'package':<40} {'cumulative (ms)':>16}")
+        for package, micros in sorted(import_times.items(), key=lambda item: -item[1]):
+            terminalreporter.line(f"{package:<40} {micros / 1000:>16.2f}")
+
+    results = config.stash.get(RESULTS, [])
+    if not results:
+        return
+
+    terminalreporter.section("hook latency")
+    terminalreporter.line(
+        f"{'event':<28} {'units':>6} {'wall time (ms)':>15} {'hook tools':>11} {'peak (KiB)':>11}"
+    )
+    for result in results:
+        terminalreporter.line(
+            f"{result.event:<28} {result.units:>6} {result.wall_time * 1000:>15.2f} "
+            f"{result.hook_tool_calls:>11} {result.peak_memory / 1024:>11.1f}"
+        )
+
+    if path := config.getoption("--benchmark-json"):
+        with open(path, "w") as f:
+            json.dump([asdict(result) for result in results], f, indent=2)
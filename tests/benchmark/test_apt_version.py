@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Cost of sorting apt package versions, as done when picking candidates from large repositories.
+
+Sort keys built once per `Version` are timed against the previous implementation, which parsed
+both version strings on every comparison. It is kept below as the baseline.
+"""
+
+import functools
+import random
+import time
+from typing import List, Tuple
+
+from charms.operator_libs_linux.v0.apt import Version
+
+VERSIONS = 5000
+
+
+class LegacyVersion(Version):
+    """`Version` comparing versions as it did before sort keys were introduced."""
+
+    def _listify(self, revision: str) -> List[str]:
+        """Split a revision string into a listself.
+
+        This list is comprised of  alternating between strings and numbers,
+        padded on either end to always be "str, int, str, int..." and
+        always be of even length.  This allows us to trivially implement the
+        comparison algorithm described.
+        """
+        result = []
+        while revision:
+            rev_1, remains = self._get_alphas(revision)
+            rev_2, remains = self._get_digits(remains)
+            result.extend([rev_1, rev_2])
+            revision = remains
+        return result
+
+    def _get_alphas(self, revision: str) -> Tuple[str, str]:
+        """Return a tuple of the first non-digit characters of a revision."""
+        # get the index of the first digit
+        for i, char in enumerate(revision):
+            if char.isdigit():
+                if i == 0:
+                    return "", revision
+                return revision[0:i], revision[i:]
+        # string is entirely alphas
+        return revision, ""
+
+    def _get_digits(self, revision: str) -> Tuple[int, str]:
+        """Return a tuple of the first integer characters of a revision."""
+        # If the string is empty, return (0,'')
+        if not revision:
+            return 0, ""
+        # get the index of the first non-digit
+        for i, char in enumerate(revision):
+            if not char.isdigit():
+                if i == 0:
+                    return 0, revision
+                return int(revision[0:i]), revision[i:]
+        # string is entirely digits
+        return int(revision), ""
+
+    def _dstringcmp(self, a, b):  # noqa: C901
+        """Debian package version string section lexical sort algorithm.
+
+        The lexical comparison is a comparison of ASCII values modified so
+        that all the letters sort earlier than all the non-letters and so that
+        a tilde sorts before anything, even the end of a part.
+        """
+        if a == b:
+            return 0
+        try:
+            for i, char in enumerate(a):
+                if char == b[i]:
+                    continue
+                # "a tilde sorts before anything, even the end of a part"
+                # (emptyness)
+                if char == "~":
+                    return -1
+                if b[i] == "~":
+                    return 1
+                # "all the letters sort earlier than all the non-letters"
+                if char.isalpha() and not b[i].isalpha():
+                    return -1
+                if not char.isalpha() and b[i].isalpha():
+                    return 1
+                # otherwise lexical sort
+                if ord(char) > ord(b[i]):
+                    return 1
+                if ord(char) < ord(b[i]):
+                    return -1
+        except IndexError:
+            # a is longer than b but otherwise equal, greater unless there are tildes
+            if char == "~":
+                return -1
+            return 1
+        # if we get here, a is shorter than b but otherwise equal, so check for tildes...
+        if b[len(a)] == "~":
+            return 1
+        return -1
+
+    def _compare_revision_strings(self, first: str, second: str):  # noqa: C901
+        """Compare two debian revision strings."""
+        if first == second:
+            return 0
+
+        # listify pads results so that we will always be comparing ints to ints
+        # and strings to strings (at least until we fall off the end of a list)
+        first_list = self._listify(first)
+        second_list = self._listify(second)
+        if first_list == second_list:
+            return 0
+        try:
+            for i, item in enumerate(first_list):
+                # explicitly raise IndexError if we've fallen off the edge of list2
+                if i >= len(second_list):
+                    raise IndexError
+                # if the items are equal, next
+                if item == second_list[i]:
+                    continue
+                # numeric comparison
+                if isinstance(item, int):
+                    if item > second_list[i]:
+                        return 1
+                    if item < second_list[i]:
+                        return -1
+                else:
+                    # string comparison
+                    return self._dstringcmp(item, second_list[i])
+        except IndexError:
+            # rev1 is longer than rev2 but otherwise equal, hence greater
+            # ...except for goddamn tildes
+            if first_list[len(second_list)][0][0] == "~":
+                return 1
+            return 1
+        # rev1 is shorter than rev2 but otherwise equal, hence lesser
+        # ...except for goddamn tildes
+        if second_list[len(first_list)][0][0] == "~":
+            return -1
+        return -1
+
+    def _compare_version(self, other) -> int:
+        if (self.number, self.epoch) == (other.number, other.epoch):
+            return 0
+
+        if self.epoch < other.epoch:
+            return -1
+        if self.epoch > other.epoch:
+            return 1
+
+        # If none of these are true, follow the algorithm
+        upstream_version, debian_version = self._get_parts(self.number)
+        other_upstream_version, other_debian_version = self._get_parts(other.number)
+
+        upstream_cmp = self._compare_revision_strings(upstream_version, other_upstream_version)
+        if upstream_cmp != 0:
+            return upstream_cmp
+
+        debian_cmp = self._compare_revision_strings(debian_version, other_debian_version)
+        if debian_cmp != 0:
+            return debian_cmp
+
+        return 0
+
+
+def generate_versions(count: int) -> List[Tuple[str, str]]:
+    """Generates the (number, epoch) of realistic package versions, deterministically."""
+    rng = random.Random(0)
+    versions = []
+    for _ in range(count):
+        upstream = ".".join(str(rng.randint(0, 20)) for _ in range(rng.randint(1, 4)))
+        upstream += rng.choice(["", "", "~rc1", "~beta2", "+dfsg", "a"])
+        debian = rng.choice(["1", "2", "0ubuntu1", "1ubuntu0.22.04.1", "3build1"])
+        versions.append((f"{upstream}-{debian}", rng.choice(["", "", "", "1"])))
+    return versions
+
+
+def time_sort(versions: List[Version], key=None) -> float:
+    start = time.perf_counter()
+    sorted(versions, key=key)
+    return time.perf_counter() - start
+
+
+def test_version_sort_speedup(microbenchmarks):
+    versions = generate_versions(VERSIONS)
+
+    start = time.perf_counter()
+    keyed = [Version(number, epoch) for number, epoch in versions]
+    construction = time.perf_counter() - start
+    sort = time_sort(keyed)
+
+    legacy = [LegacyVersion(number, epoch) for number, epoch in versions]
+    legacy_sort = time_sort(legacy, key=functools.cmp_to_key(LegacyVersion._compare_version))
+
+    microbenchmarks[f"sort {VERSIONS} versions, legacy"] = legacy_sort
+    microbenchmarks[f"sort {VERSIONS} versions, sort keys"] = sort
+    microbenchmarks[f"sort {VERSIONS} versions, sort keys incl. construction"] = (
+        construction + sort
+    )
+
+    assert construction + sort < legacy_sort
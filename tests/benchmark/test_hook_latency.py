@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Hook latency of RunsLikeACharm events against peer relations of growing size.
+
+Each event is dispatched once per relation size. Hook tool calls are deterministic, so they
+are asserted to grow at most linearly with the number of units, catching accidentally
+quadratic handlers. Wall times and peak memory are reported only, as they depend on the host.
+"""
+
+import pytest
+from ops.testing import Harness
+
+from literals import PEER
+
+# allowed growth of hook tool calls on top of the growth in units
+LINEAR_SLACK = 2
+
+
+def install(harness: Harness) -> None:
+    harness.charm.on.install.emit()
+
+
+def start(harness: Harness) -> None:
+    harness.charm.on.start.emit()
+
+
+def config_changed(harness: Harness) -> None:
+    harness.update_config({"setup_script": "#!/bin/sh\necho changed"})
+
+
+def update_status(harness: Harness) -> None:
+    harness.charm.on.update_status.emit()
+
+
+def cluster_relation_changed(harness: Harness) -> None:
+    relation = harness.model.get_relation(PEER)
+    harness.charm.on[PEER].relation_changed.emit(relation, app=harness.charm.app)
+
+
+def process_locks(harness: Harness) -> None:
+    harness.charm.on[harness.charm.restart_manager.name].process_locks.emit()
+
+
+def unit_hosts(harness: Harness) -> None:
+    assert len(harness.charm.state.unit_hosts) == len(harness.model.get_relation(PEER).units) + 1
+
+
+SCENARIOS = {
+    "install": {"dispatch": install},
+    "start": {"dispatch": start},
+    "config-changed": {"dispatch": config_changed, "prepare": start},
+    "update-status": {"dispatch": update_status, "prepare": start},
+    "cluster-relation-changed": {"dispatch": cluster_relation_changed, "prepare": start},
+    "restart-process-locks": {"dispatch": process_locks, "lock_state": "acquire"},
+    "cluster-state-unit-hosts": {"dispatch": unit_hosts},
+}
+
+
+@pytest.mark.parametrize("event", SCENARIOS)
+def test_hook_latency(event, measure, benchmark_units):
+    results = [measure(event, units, **SCENARIOS[event]) for units in benchmark_units]
+
+    for smaller, larger in zip(results, results[1:]):
+        budget = max(smaller.hook_tool_calls, 1) * larger.units / smaller.units * LINEAR_SLACK
+        assert larger.hook_tool_calls <= budget, (
+            f"{event} hook tool calls grew from {smaller.hook_tool_calls} at {smaller.units} "
+            f"units to {larger.hook_tool_calls} at {larger.units} units - {larger.calls}"
+        )
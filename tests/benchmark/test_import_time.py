@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Import time of RunsLikeACharm, as paid by every dispatch before any handler runs.
+
+The charm is imported in a fresh interpreter under `-X importtime`, and the cumulative time
+of each top-level module is reported. Libraries only some hooks need must stay out of the
+dispatches which do not use them, starting with update-status, which runs on every unit
+every few minutes.
+"""
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).parents[2]
+
+# modules loaded lazily, only by the hooks needing them
+UPDATE_STATUS_EXCLUDED = [
+    "charms.grafana_agent.v0.cos_agent",
+    "charms.tls_certificates_interface",
+    "cosl",
+    "cryptography",
+    "tenacity",
+]
+
+DISPATCH = """
+import sys
+
+from ops.testing import Harness
+
+from charm import RunsLikeACharm
+
+harness = Harness(RunsLikeACharm)
+harness.add_relation("cluster", "runs-like-a-charm")
+harness.begin()
+harness.charm.on.update_status.emit()
+print("\\n".join(sys.modules))
+"""
+
+
+def run_python(code: str, *args: str, dispatch_path: str = "") -> subprocess.CompletedProcess:
+    env = dict(
+        os.environ,
+        PYTHONPATH=os.pathsep.join([str(ROOT / "lib"), str(ROOT / "src")]),
+        JUJU_DISPATCH_PATH=dispatch_path,
+    )
+    return subprocess.run(
+        [sys.executable, *args, "-c", code],
+        env=env,
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+
+def parse_importtime(output: str, module: str) -> dict[str, int]:
+    """Parses `-X importtime` output into the cumulative microseconds of a module's imports."""
+    entries = []
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+
+        _, cumulative, name = line.removeprefix("import time:").split("|")
+        entries.append((len(name) - len(name.lstrip()), name.strip(), int(cumulative)))
+
+    # imports are listed once finished, so those of a module are the ones right before it
+    index = next(index for index, (_, name, _) in enumerate(entries) if name == module)
+    depth = entries[index][0]
+    imports = {}
+    for depth_, name, cumulative in reversed(entries[:index]):
+        if depth_ <= depth:
+            break
+        if depth_ == depth + 2:
+            imports[name] = cumulative
+
+    imports[f"{module} (total)"] = entries[index][2]
+    return imports
+
+
+@pytest.fixture(scope="module")
+def update_status_modules() -> list[str]:
+    return run_python(DISPATCH, dispatch_path="hooks/update-status").stdout.split()
+
+
+def test_import_time(import_times):
+    output = run_python("import charm", "-X", "importtime").stderr
+    import_times.update(parse_importtime(output, "charm"))
+
+
+@pytest.mark.parametrize("excluded", UPDATE_STATUS_EXCLUDED)
+def test_update_status_skips_unused_imports(excluded, update_status_modules):
+    loaded = [
+        module
+        for module in update_status_modules
+        if module == excluded or module.startswith(f"{excluded}.")
+    ]
+
+    assert not loaded, f"update-status imports {loaded}"
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Fixtures shared by the unit tests."""
+
+import time
+
+import pytest
+from charms.operator_libs_linux.v1 import snap
+from ops.testing import Harness
+from snapd import FakeSnapd
+
+from charm import RunsLikeACharm
+from job import JobState
+from literals import CHARM_KEY, PATHS, PEER
+from workload import RunsLikeACharmWorkload
+
+# the socket the snap library talks to by default
+SNAPD_SOCKET = "/run/snapd.socket"
+# polls needed before a fake snapd change is ready
+CHANGE_POLLS = 3
+RESTART = "restart"
+
+
+class StubWorkload(RunsLikeACharmWorkload):
+    """Workload recording the files and commands of the charm, without touching the machine."""
+
+    def __init__(self):
+        self.files: dict[str, str] = {}
+        self.commands: list[str] = []
+        self.job = JobState()
+        self.launches = 0
+        self.is_active = True
+
+    def start(self, stages=None, artifacts=None, peers=[]) -> None:
+        self.launches += 1
+        self.job = JobState(started_at=time.time(), pid=None)
+
+    def job_state(self) -> JobState:
+        return self.job
+
+    def job_output(self) -> str:
+        return ""
+
+    @property
+    def service_installed(self) -> bool:
+        return False
+
+    def read(self, path: str) -> list[str]:
+        return self.files[path].split("\n") if path in self.files else []
+
+    def write(self, content: str, path: str, mode: str = "w") -> None:
+        self.files[path] = (self.files.get(path, "") if mode == "a" else "") + content
+
+    def exec(self, command: str, env=None, working_dir=None) -> str:
+        self.commands.append(command)
+        return ""
+
+    def active(self, attempts: int = 1) -> bool:
+        return self.is_active
+
+
+@pytest.fixture
+def snapd(tmp_path, monkeypatch):
+    """A fake snapd, which the snap library talks to instead of the real one."""
+    server = FakeSnapd(str(tmp_path / "snapd.socket")).start()
+    server.change_polls = CHANGE_POLLS
+
+    monkeypatch.setitem(snap._pools, SNAPD_SOCKET, snap._UnixSocketPool(server.server_address))
+    monkeypatch.setattr(snap.SnapCache, "snapd_installed", True)
+    monkeypatch.setattr(snap, "CHANGE_POLL_INTERVAL", 0.01)
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def harness(monkeypatch, tmp_path):
+    """A leader harness with a peer relation, running against a stub workload."""
+    monkeypatch.setattr("charm.RunsLikeACharmWorkload", StubWorkload)
+    for key in ["METRICS_STATE", "METRICS_TEXTFILE"]:
+        monkeypatch.setitem(PATHS, key, str(tmp_path / PATHS[key].lstrip("/")))
+
+    harness = Harness(RunsLikeACharm)
+    harness.set_leader(True)
+    harness.add_network("10.0.0.10")
+    harness.add_relation(PEER, CHARM_KEY)
+    harness.add_relation(RESTART, CHARM_KEY)
+    harness.begin()
+    yield harness
+    harness.cleanup()
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Fake snapd serving the subset of its REST API used by the snap library over a Unix socket.
+
+Changes started through the snaps endpoints are only applied once they were polled a set
+number of times, standing in for the time snapd takes to complete them.
+"""
+
+import json
+import socketserver
+import threading
+from http.server import BaseHTTPRequestHandler
+from urllib.parse import parse_qs, urlsplit
+
+RISKS = ["stable", "candidate", "beta", "edge"]
+
+
+def full_channel(info: dict) -> str:
+    """The track and risk of the channel of a snap, filling in the defaults as snapd does."""
+    parts = info["channel"].split("/")
+    if len(parts) == 1:
+        parts = ["latest", parts[0]] if parts[0] in RISKS else [parts[0], "stable"]
+    return "/".join(parts[:2])
+
+
+class FakeSnapdHandler(BaseHTTPRequestHandler):
+    """Answers snapd API requests from the state of the server."""
+
+    protocol_version = "HTTP/1.1"
+    server: "FakeSnapd"
+
+    def setup(self) -> None:
+        self.server.connections += 1
+        super().setup()
+
+    def address_string(self) -> str:
+        return "snapd.socket"
+
+    def log_message(self, *_) -> None:
+        return
+
+    def reply(self, code: int, result, kind: str = "sync", change: str = "") -> None:
+        document = {"type": kind, "status-code": code, "result": result}
+        if change:
+            document["change"] = change
+        body = json.dumps(document).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self) -> None:  # noqa: N802
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        self.server.requests.append(("GET", url.path))
+
+        if url.path == "/v2/snaps":
+            installed = self.server.installed
+            names = query["snaps"][0].split(",") if "snaps" in query else installed
+            self.reply(200, [installed[name] for name in names if name in installed])
+        elif url.path == "/v2/find" and query["name"][0] in self.server.store:
+            self.reply(200, [self.server.store[query["name"][0]]])
+        elif url.path.startswith("/v2/changes/") and url.path[12:] in self.server.changes:
+            self.reply(200, self.server.poll_change(url.path[12:]))
+        else:
+            self.reply(404, {"message": "not found", "kind": "snap-not-found"}, kind="error")
+
+    def do_POST(self) -> None:  # noqa: N802
+        url = urlsplit(self.path)
+        self.server.requests.append(("POST", url.path))
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+
+        names = body.pop("snaps", None) or [url.path.removeprefix("/v2/snaps/")]
+        action = body.pop("action")
+        if missing := [name for name in names if name not in self.server.store]:
+            self.reply(404, {"message": f"snap not found: {missing}"}, kind="error")
+            return
+
+        # like snapd, a single snap refresh changing nothing is an error rather than a change
+        if (
+            action == "refresh"
+            and url.path != "/v2/snaps"
+            and self.server.up_to_date(names[0], body)
+        ):
+            message = f"snap {names[0]!r} has no updates available"
+            self.reply(400, {"message": message, "kind": "snap-no-update-available"}, kind="error")
+            return
+
+        change = self.server.start_change(action, names, body)
+        self.reply(202, None, kind="async", change=change)
+
+
+class FakeSnapd(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Fake snapd listening on a Unix socket, counting the connections made to it."""
+
+    daemon_threads = True
+
+    def __init__(self, socket_path: str):
+        super().__init__(socket_path, FakeSnapdHandler)
+        self.connections = 0
+        self.requests: list[tuple[str, str]] = []
+        self.installed: dict[str, dict] = {}
+        self.store: dict[str, dict] = {}
+        # polls needed before a change is ready
+        self.change_polls = 0
+        self.changes: dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def add_snap(self, name: str, installed: bool = False, revision: int = 1) -> None:
+        info = {
+            "name": name,
+            "channel": "stable",
+            "revision": str(revision),
+            "confinement": "strict",
+        }
+        self.store[name] = info
+        if installed:
+            self.installed[name] = dict(info)
+
+    def up_to_date(self, name: str, options: dict) -> bool:
+        if (installed := self.installed.get(name)) is None:
+            return False
+
+        target = dict(self.store[name], **options)
+        installed = dict(installed, channel=full_channel(installed))
+        return installed == dict(target, channel=full_channel(target))
+
+    def start_change(self, action: str, names: list[str], options: dict) -> str:
+        with self._lock:
+            change_id = str(len(self.changes) + 1)
+            self.changes[change_id] = {
+                "id": change_id,
+                "kind": f"{action}-snap",
+                "summary": f"{action} {names}",
+                "status": "Doing",
+                "ready": False,
+                "polls": 0,
+                "action": action,
+                "names": names,
+                "options": options,
+            }
+        return change_id
+
+    def poll_change(self, change_id: str) -> dict:
+        with self._lock:
+            change = self.changes[change_id]
+            change["polls"] += 1
+            if not change["ready"] and change["polls"] > self.change_polls:
+                for name in change["names"]:
+                    if change["action"] == "remove":
+                        self.installed.pop(name, None)
+                    else:
+                        self.installed[name] = dict(self.store[name], **change["options"])
+                change.update(status="Done", ready=True)
+
+            return {key: change[key] for key in ["id", "kind", "summary", "status", "ready"]}
+
+    def start(self) -> "FakeSnapd":
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
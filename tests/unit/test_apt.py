@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Apt library package lookups and version ordering."""
+
+import random
+import re
+from functools import cmp_to_key
+from itertools import zip_longest
+
+import pytest
+from charms.operator_libs_linux.v0 import apt
+from charms.operator_libs_linux.v0.apt import Version
+
+# characters which exercise every branch of the dpkg comparison
+ALPHABET = "0019az~.+"
+PAIRS = 5000
+
+# in ascending dpkg order, as given by `dpkg --compare-versions`
+ORDERED = [
+    "~~",
+    "~~a",
+    "~",
+    "0~",
+    "0~rc1",
+    "0",
+    "0.9",
+    "1.0~~",
+    "1.0~rc1",
+    "1.0-0~bpo1",
+    "1.0",
+    "1.0-0ubuntu1",
+    "1.0-1",
+    "1.0a",
+    "1.0+dfsg-1",
+    "1.0.1",
+    "1.2",
+    "1.10",
+    "1:0.1",
+    "2:0",
+]
+
+
+def parse(version: str) -> Version:
+    epoch, _, number = version.rpartition(":")
+    return Version(number, epoch)
+
+
+def test_version_order():
+    shuffled = list(ORDERED)
+    random.Random(0).shuffle(shuffled)
+
+    assert [str(version) for version in sorted(parse(v) for v in shuffled)] == ORDERED
+    assert parse("1.0") == parse("1.0-0") == parse("0:1.00")
+    assert parse("1.0~rc1") < parse("1.0") <= parse("1.0") < parse("1.0.1")
+    assert parse("0") == parse("00") and parse("1.0-0~bpo1") < parse("1.0-0")
+
+
+def order(char: str) -> int:
+    if char == "~":
+        return -1
+    if char.isdigit():
+        return 0
+    if char.isalpha():
+        return ord(char)
+    return ord(char) + 256
+
+
+def lexical_compare(a: str, b: str) -> int:
+    """Compares non-digit runs, where `~` sorts before anything, even the end of a run."""
+    for ac, bc in zip_longest(map(order, a), map(order, b), fillvalue=0):
+        if ac != bc:
+            return ac - bc
+    return 0
+
+
+def verrevcmp(a: str, b: str) -> int:
+    """Compares alternating non-digit and digit runs, as dpkg's lib/dpkg/version.c does."""
+    a_runs, b_runs = re.findall(r"(\D*)(\d*)", a), re.findall(r"(\D*)(\d*)", b)
+    for (a_text, a_number), (b_text, b_number) in zip_longest(a_runs, b_runs, fillvalue=("", "")):
+        if diff := lexical_compare(a_text, b_text) or int(a_number or 0) - int(b_number or 0):
+            return diff
+    return 0
+
+
+def dpkg_compare(a: str, b: str) -> int:
+    a_upstream, _, a_revision = a.rpartition("-") if "-" in a else (a, "", "")
+    b_upstream, _, b_revision = b.rpartition("-") if "-" in b else (b, "", "")
+    return verrevcmp(a_upstream, b_upstream) or verrevcmp(a_revision, b_revision)
+
+
+def sign(number: int) -> int:
+    return (number > 0) - (number < 0)
+
+
+def test_version_matches_dpkg():
+    rng = random.Random(0)
+
+    def version() -> str:
+        upstream = "1" + "".join(rng.choices(ALPHABET, k=rng.randrange(4)))
+        if rng.random() < 0.5:
+            return upstream
+        return upstream + "-" + "".join(rng.choices(ALPHABET, k=rng.randrange(4)))
+
+    for _ in range(PAIRS):
+        a, b = version(), version()
+        expected = sign(dpkg_compare(a, b))
+        assert (parse(a) > parse(b)) - (parse(a) < parse(b)) == expected, (a, b)
+
+    assert sorted(ORDERED, key=cmp_to_key(dpkg_compare)) == ORDERED
+
+
+@pytest.fixture
+def apt_dirs(tmp_path, monkeypatch) -> list[list[str]]:
+    """Points the apt state at a temporary directory, recording the apt-get calls."""
+    lists = tmp_path / "lists"
+    lists.mkdir()
+    monkeypatch.setattr(apt, "APT_LISTS", str(lists))
+    monkeypatch.setattr(apt, "APT_UPDATE_STAMP", str(tmp_path / "periodic" / "stamp"))
+    monkeypatch.setattr(apt, "APT_UPDATE_LOCK", str(tmp_path / "lock"))
+
+    calls = []
+    monkeypatch.setattr(apt, "check_call", lambda args, **kwargs: calls.append(args))
+    return calls
+
+
+def test_update_ignores_list_mtimes(apt_dirs, tmp_path):
+    # fresh files in the lists directory do not mean apt-get update succeeded
+    (tmp_path / "lists" / "lock").touch()
+    (tmp_path / "lists" / "partial").mkdir()
+
+    apt.update(max_age=3600)
+    apt.update(max_age=3600)
+
+    assert apt_dirs == [["apt-get", "update"]]
+
+
+def test_update_failure_keeps_stamp(apt_dirs, monkeypatch):
+    def fail(args, **kwargs):
+        raise apt.CalledProcessError(100, args)
+
+    monkeypatch.setattr(apt, "check_call", fail)
+
+    with pytest.raises(apt.CalledProcessError):
+        apt.update(max_age=3600)
+
+    assert apt._last_update() == 0.0
+
+
+PACKAGES = """Package: hello
+Architecture: amd64
+Version: 2.10-2
+
+Package: hello
+Architecture: amd64
+Version: 2.10-3
+Description: hello
+ multi-line: description
+
+Package: data
+Architecture: all
+Version: 1:1.0
+"""
+
+DPKG_STATUS = """Package: hello
+Status: install ok installed
+Architecture: amd64
+Version: 2.10-2
+
+Package: removed
+Status: deinstall ok config-files
+Architecture: amd64
+Version: 1.0
+"""
+
+
+@pytest.fixture
+def apt_cache(monkeypatch) -> list[list[str]]:
+    """Answers `apt-cache show` with the stanzas of PACKAGES, recording the calls."""
+    calls = []
+
+    def check_output(args, **kwargs):
+        calls.append(args)
+        return PACKAGES
+
+    monkeypatch.setattr(apt, "check_output", check_output)
+    return calls
+
+
+def test_apt_lists_latest_version(tmp_path, apt_cache):
+    (tmp_path / "archive_dists_noble_main_binary-amd64_Packages").write_text(PACKAGES)
+    index = tmp_path / "cache" / "packages-index.json"
+    lists = apt._AptListsIndex(str(tmp_path), str(index))
+
+    assert str(lists.get("hello", "", "amd64").version) == "2.10-3"
+    assert str(lists.get("hello", "2.10-2", "amd64").version) == "2.10-2"
+    assert str(lists.get("data", "", "amd64").version) == "1:1.0"
+    assert lists.get("hello", "", "arm64") is None
+    assert lists.get("missing", "", "amd64") is None
+    assert not apt_cache
+
+    # the persisted index is kept out of the lists and picked up by the next process
+    assert index.exists()
+    assert not list(tmp_path.glob("*index*"))
+    lists = apt._AptListsIndex(str(tmp_path), str(index))
+    assert str(lists.get("hello", "", "amd64").version) == "2.10-3"
+
+
+@pytest.mark.parametrize("lists", [[], ["archive_dists_noble_main_binary-amd64_Packages.lz4"]])
+def test_apt_lists_fall_back_to_apt_cache(tmp_path, apt_cache, lists):
+    for name in lists:
+        (tmp_path / name).write_bytes(b"compressed")
+
+    index = tmp_path / "cache" / "packages-index.json"
+    found = apt._AptListsIndex(str(tmp_path), str(index)).get_many(
+        ["hello", "data", "missing"], "", "amd64"
+    )
+
+    assert {name: str(pkg.version) for name, pkg in found.items()} == {
+        "hello": "2.10-3",
+        "data": "1:1.0",
+    }
+    # a single apt-cache process for all of the packages
+    assert apt_cache == [["apt-cache", "show", "hello", "data", "missing"]]
+
+
+def test_dpkg_status_installed_only(tmp_path):
+    status = tmp_path / "status"
+    status.write_text(DPKG_STATUS)
+    installed = apt._DpkgStatus(str(status))
+
+    assert str(installed.get("hello", "", "amd64").version) == "2.10-2"
+    assert installed.get("hello:arm64", "", "amd64") is None
+    assert installed.get("removed", "", "amd64") is None
+
+    status.write_text(DPKG_STATUS.replace("deinstall ok config-files", "install ok installed"))
+    assert installed.get("removed", "1.0", "amd64").state == apt.PackageState.Present
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Artifact cache fetches, from the peers advertising an artifact and from its URL."""
+
+import hashlib
+import os
+import threading
+import time
+from functools import partial
+
+import pytest
+
+from artifact_server import ArtifactHandler, ArtifactServer
+from core import artifacts, structured_config
+from core.artifacts import Artifact
+from core.capture import RotatingLog
+from literals import CHARM_KEY, PEER
+
+CONTENT = b"#!/bin/sh\necho artifact\n"
+DIGEST = hashlib.sha256(CONTENT).hexdigest()
+
+
+@pytest.fixture
+def upstream(tmp_path) -> Artifact:
+    path = tmp_path / "upstream" / "artifact"
+    path.parent.mkdir()
+    path.write_bytes(CONTENT)
+    return Artifact(
+        url=path.as_uri(), sha256=DIGEST, destination=str(tmp_path / "destination" / "artifact")
+    )
+
+
+@pytest.fixture
+def peer(tmp_path):
+    """An artifact server with the artifact cached, returning its base URL."""
+    cache_dir = tmp_path / "peer-cache"
+    path = artifacts.cache_path(str(cache_dir), DIGEST)
+    os.makedirs(os.path.dirname(path))
+    with open(path, "wb") as f:
+        f.write(CONTENT)
+
+    server = ArtifactServer(("127.0.0.1", 0), partial(ArtifactHandler, cache_dir=str(cache_dir)))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_fetch_from_peer(peer, upstream, tmp_path):
+    url = artifacts.fetch(upstream, str(tmp_path / "cache"), peers=[peer])
+
+    assert url == artifacts.peer_url(peer, DIGEST)
+    assert artifacts.fetch(upstream, str(tmp_path / "cache"), peers=[peer]) == ""
+
+
+def test_fetch_skips_failing_peers(peer, upstream, tmp_path):
+    start = time.monotonic()
+    peers = [f"{peer}/missing", "http://[::1]:9"]
+    url = artifacts.fetch(upstream, str(tmp_path / "cache"), peers=peers)
+
+    assert url == upstream.url
+    assert time.monotonic() - start < artifacts.FETCH_TIMEOUT
+
+
+def test_fetch_all_by_advertised_digest(peer, upstream, tmp_path):
+    with RotatingLog(str(tmp_path / "job.log")) as log:
+        assert not artifacts.fetch_all(
+            [upstream], str(tmp_path / "cache"), log=log, peers={"0" * 64: [peer]}
+        )
+
+    assert b"fetched artifact file://" in (tmp_path / "job.log").read_bytes()
+    with open(upstream.destination, "rb") as f:
+        assert f.read() == CONTENT
+
+
+def test_fetch_all_checksum_mismatch(upstream, tmp_path):
+    upstream.sha256 = "0" * 64
+    cache_dir = tmp_path / "cache"
+
+    with RotatingLog(str(tmp_path / "job.log")) as log:
+        assert artifacts.fetch_all([upstream], str(cache_dir), log=log) == 1
+
+    assert b"checksum mismatch" in (tmp_path / "job.log").read_bytes()
+    assert not any(files for _, _, files in os.walk(cache_dir))
+    assert not os.path.exists(upstream.destination)
+
+
+def test_artifact_peers_only_advertised(harness):
+    relation = harness.model.get_relation(PEER)
+    for index, digests in [(1, DIGEST), (2, ""), (3, f"{DIGEST} {'0' * 64}")]:
+        unit = f"{CHARM_KEY}/{index}"
+        harness.add_relation_unit(relation.id, unit)
+        harness.update_relation_data(
+            relation.id,
+            unit,
+            {"artifact-source": f"http://10.0.0.{index}:9111", "artifact-digests": digests},
+        )
+
+    assert harness.charm.state.artifact_peers == {
+        DIGEST: ["http://10.0.0.1:9111", "http://10.0.0.3:9111"],
+        "0" * 64: ["http://10.0.0.3:9111"],
+    }
+
+
+def test_artifact_sharing_opt_in(harness):
+    node = harness.charm.state.node
+
+    harness.update_config(
+        {"artifacts": f"[{{url: https://example.com/a, sha256: {DIGEST}, destination: /opt/a}}]"}
+    )
+    assert not node.artifact_source
+    assert not any("artifact" in command for command in harness.charm.workload.commands)
+
+    harness.charm.workload.cached_artifacts = lambda artifacts: [DIGEST]
+    harness.charm.workload.install_artifact_server = harness.charm.workload.commands.append
+    harness.update_config({"share_artifacts": True})
+
+    assert node.artifact_source == "http://10.0.0.10:9111"
+    assert node.artifact_digests == {DIGEST}
+    assert "--host 10.0.0.10 " in harness.charm.workload.commands[-1]
+
+
+@pytest.mark.parametrize("mode", [0o755, 0o600])
+def test_install_artifact_mode(upstream, tmp_path, mode):
+    upstream.mode = mode
+    with RotatingLog(str(tmp_path / "job.log")) as log:
+        assert not artifacts.fetch_all([upstream], str(tmp_path / "cache"), log=log)
+
+    assert os.stat(upstream.destination).st_mode & 0o7777 == mode
+
+
+def test_artifacts_parsed_once(harness, monkeypatch):
+    parsed = []
+    safe_load = structured_config.yaml.safe_load
+    monkeypatch.setattr(
+        structured_config.yaml, "safe_load", lambda value: parsed.append(value) or safe_load(value)
+    )
+
+    harness.update_config(
+        {
+            "artifacts": f"[{{url: https://example.com/a, sha256: {DIGEST}, destination: /opt/a, "
+            "mode: 0755}, "
+            f"{{url: https://example.com/b, sha256: {DIGEST}, destination: /opt/b, mode: '0700'}}]"
+        }
+    )
+    config_manager = harness.charm.config_manager
+    config_manager.artifacts_digest, config_manager.setup_stages
+
+    assert [artifact.mode for artifact in config_manager.artifacts] == [0o755, 0o700]
+    assert len(parsed) == 1
+
+
+@pytest.mark.parametrize("mode", ["0999", "17777", "true"])
+def test_artifacts_invalid_mode(mode):
+    with pytest.raises(ValueError, match="Invalid mode"):
+        structured_config.load_artifacts(
+            f"[{{url: https://example.com/a, sha256: {DIGEST}, destination: /opt/a, "
+            f"mode: {mode}}}]"
+        )
+
+
+def test_artifact_peers_without_peer_relation(harness):
+    harness.remove_relation(harness.model.get_relation(PEER).id)
+
+    assert harness.charm.state.artifact_peers == {}
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Bounded capture of command output, and the complete output of workload commands."""
+
+import logging
+import subprocess
+
+import pytest
+
+from core.capture import LOG_TAIL_SIZE, TAIL_SIZE, RotatingLog, TailBuffer, read_tail, run
+from literals import PATHS
+from workload import RunsLikeACharmWorkload
+
+# more output than a tail keeps
+OUTPUT_SIZE = 3 * TAIL_SIZE
+COMMAND = f"head -c {OUTPUT_SIZE} /dev/zero | tr '\\0' a"
+
+
+@pytest.fixture
+def log(tmp_path):
+    with RotatingLog(str(tmp_path / "command.log")) as log:
+        yield log
+
+
+def test_tail_buffer():
+    tail = TailBuffer(4)
+    for chunk in [b"ab", b"cde", b"fghijk"]:
+        tail.write(chunk)
+
+    assert tail.getvalue() == "hijk"
+
+
+def test_run_keeps_tail(log):
+    result = run(COMMAND, log=log)
+    log.close()
+
+    assert result.returncode == 0
+    assert len(result.stdout) == TAIL_SIZE
+    assert len(read_tail(log.path, size=OUTPUT_SIZE)) == OUTPUT_SIZE
+
+
+def test_run_keeps_complete_output(log):
+    assert len(run(COMMAND, log=log, tail_size=None).stdout) == OUTPUT_SIZE
+
+
+def test_run_timeout(log):
+    with pytest.raises(subprocess.TimeoutExpired) as e:
+        run("echo started; sleep 10", log=log, timeout=0.5)
+
+    assert e.value.output == "started\n"
+
+
+def test_rotating_log(tmp_path):
+    path = str(tmp_path / "rotating.log")
+    with RotatingLog(path, max_bytes=10, backup_count=2) as log:
+        for chunk in [b"first-----", b"second----", b"third-----"]:
+            log.write(chunk)
+
+    assert read_tail(path) == "third-----"
+    assert read_tail(f"{path}.1") == "second----"
+    assert read_tail(f"{path}.2") == "first-----"
+
+
+def test_workload_exec_complete_output(monkeypatch, tmp_path, caplog):
+    monkeypatch.setitem(PATHS, "EXEC_LOG", str(tmp_path / "exec.log"))
+    workload = RunsLikeACharmWorkload()
+
+    with caplog.at_level(logging.DEBUG, logger="workload"):
+        assert len(workload.exec(COMMAND)) == OUTPUT_SIZE
+        with pytest.raises(subprocess.CalledProcessError):
+            workload.exec(f"{COMMAND}; {COMMAND} >&2; exit 1")
+
+    # only the tail of the output reaches the charm log
+    assert len(caplog.records) == 2
+    assert all(len(record.getMessage()) < 3 * LOG_TAIL_SIZE for record in caplog.records)
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Job supervisor state, and recovery from jobs that stop without an exit code."""
+
+import json
+import os
+import subprocess
+import time
+
+import pytest
+from ops.model import MaintenanceStatus
+
+import job
+from job import JobState, get_boot_id, launch, supervise
+
+
+@pytest.fixture
+def state_path(tmp_path) -> str:
+    return str(tmp_path / "job" / "state.json")
+
+
+def test_pending_launch_times_out(monkeypatch):
+    state = JobState(boot_id=get_boot_id(), started_at=time.time())
+    assert state.running and not state.lost
+
+    monkeypatch.setattr(job, "LAUNCH_TIMEOUT", 0)
+    assert not state.running and state.lost
+
+
+def test_dead_supervisor_is_lost():
+    process = subprocess.Popen(["true"])
+    process.wait()
+
+    state = JobState(pid=process.pid, boot_id=get_boot_id(), started_at=time.time())
+    assert state.lost
+
+
+def test_job_from_previous_boot_is_lost():
+    state = JobState(pid=os.getpid(), boot_id="previous", started_at=time.time())
+    assert state.lost
+
+
+def test_reused_pid_is_lost():
+    # the supervisor pid now belongs to a process started at another time
+    pid_start = job.get_pid_start(os.getpid())
+    state = JobState(
+        pid=os.getpid(), pid_start=pid_start, boot_id=get_boot_id(), started_at=time.time()
+    )
+    assert state.running
+
+    state.pid_start = pid_start - 1
+    assert state.lost
+
+
+def test_pid_start_with_odd_command_name(monkeypatch, tmp_path):
+    stat = "42 (a) b (c) S 1 42 42 0 -1 4194560 100 0 0 0 1 2 0 0 20 0 1 0 509764 1000 100\n"
+    (tmp_path / "42").mkdir()
+    (tmp_path / "42" / "stat").write_text(stat)
+    monkeypatch.setattr(job, "PROC_STAT_PATH", str(tmp_path / "{pid}" / "stat"))
+
+    assert job.get_pid_start(42) == 509764
+    assert job.get_pid_start(43) is None
+
+
+def test_launch_failure_records_exit_code(monkeypatch, state_path, tmp_path):
+    def popen(*args, **kwargs):
+        raise OSError("no python")
+
+    monkeypatch.setattr(subprocess, "Popen", popen)
+
+    with pytest.raises(OSError):
+        launch("true", state_path=state_path, log_path=str(tmp_path / "job.log"))
+
+    state = JobState.load(state_path)
+    assert state.exit_code == job.SUPERVISOR_FAILED and not state.running and not state.lost
+
+
+def test_supervise_records_exit_code(state_path, tmp_path):
+    assert supervise("exit 3", state_path=state_path, log_path=str(tmp_path / "job.log")) == 3
+
+    state = JobState.load(state_path)
+    assert state.exit_code == 3 and state.pid == os.getpid() and state.duration is not None
+    assert state.pid_start == job.get_pid_start(os.getpid())
+
+
+def test_supervise_malformed_manifest(state_path, tmp_path):
+    stages_path = tmp_path / "stages.json"
+    stages_path.write_text(json.dumps([{"name": "missing-keys"}]))
+    log_path = tmp_path / "job.log"
+
+    exit_code = supervise(
+        None, state_path=state_path, log_path=str(log_path), stages_path=str(stages_path)
+    )
+
+    assert exit_code == JobState.load(state_path).exit_code == job.SUPERVISOR_FAILED
+    assert b"KeyError" in log_path.read_bytes()
+
+
+def test_supervise_records_exit_code_on_interrupt(monkeypatch, state_path, tmp_path):
+    def interrupted(*args, **kwargs):
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(job, "run", interrupted)
+
+    with pytest.raises(KeyboardInterrupt):
+        supervise("true", state_path=state_path, log_path=str(tmp_path / "job.log"))
+
+    assert JobState.load(state_path).exit_code == job.SUPERVISOR_FAILED
+
+
+def test_lost_job_is_relaunched(harness):
+    harness.charm._stored.setup_script_applied_at = time.time()
+    harness.charm._stored.setup_script_digest = harness.charm.config_manager.setup_script_digest
+    harness.charm.workload.job = JobState(pid=None, boot_id="previous", started_at=time.time())
+
+    harness.charm.on.update_status.emit()
+
+    assert harness.charm.workload.launches == 1
+    assert isinstance(harness.charm.unit.status, MaintenanceStatus)
+
+
+def test_failed_job_is_not_relaunched(harness):
+    harness.charm._stored.setup_script_applied_at = time.time()
+    harness.charm._stored.setup_script_digest = harness.charm.config_manager.setup_script_digest
+    harness.charm.workload.job = JobState(
+        boot_id=get_boot_id(), started_at=time.time(), finished_at=time.time(), exit_code=1
+    )
+
+    harness.charm.on.update_status.emit()
+
+    assert harness.charm.workload.launches == 0
+    assert harness.charm.unit.status.name == "blocked"
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Machine probes against a fake procfs, and the health checks built on them."""
+
+import pytest
+
+from core.machine import MachineSnapshot, Pressure, probe
+from literals import Status
+
+MEMINFO = """MemTotal:       16303412 kB
+MemFree:         1204428 kB
+MemAvailable:    9876543 kB
+HugePages_Total:       0
+"""
+
+PRESSURE = """some avg10=1.50 avg60=0.75 avg300=0.10 total=123
+full avg10=0.25 avg60=0.00 avg300=0.00 total=45
+"""
+
+
+@pytest.fixture
+def proc(tmp_path):
+    (tmp_path / "sys" / "vm").mkdir(parents=True)
+    (tmp_path / "sys" / "vm" / "swappiness").write_text("60\n")
+    (tmp_path / "sys" / "vm" / "max_map_count").write_text("262144\n")
+    (tmp_path / "meminfo").write_text(MEMINFO)
+    (tmp_path / "pressure").mkdir()
+    (tmp_path / "pressure" / "memory").write_text(PRESSURE)
+    return tmp_path
+
+
+def test_probe(proc):
+    snapshot = probe(str(proc))
+
+    assert (snapshot.vm_swappiness, snapshot.vm_max_map_count) == (60, 262144)
+    assert (snapshot.mem_total, snapshot.mem_available) == (16303412, 9876543)
+    assert snapshot.meminfo["HugePages_Total"] == 0
+    assert snapshot.pressure == {
+        "memory": Pressure(some_avg10=1.5, some_avg60=0.75, full_avg10=0.25, full_avg60=0.0)
+    }
+
+
+def test_probe_unreadable_values(proc):
+    (proc / "sys" / "vm" / "swappiness").write_text("not a number")
+    (proc / "sys" / "vm" / "max_map_count").unlink()
+    (proc / "meminfo").unlink()
+
+    snapshot = probe(str(proc))
+
+    assert snapshot.vm_swappiness is None and snapshot.vm_max_map_count is None
+    assert snapshot.mem_total is None
+    assert list(snapshot.pressure) == ["memory"]
+
+
+def test_unreadable_memory_unhealthy(harness, monkeypatch):
+    monkeypatch.setattr("health.probe", lambda: MachineSnapshot(vm_swappiness=60))
+
+    assert not harness.charm.healthy
+    assert harness.charm.unit.status == Status.MACHINE_FAIL.value.status
+
+
+def test_swappiness_advisory(harness, monkeypatch, proc):
+    monkeypatch.setattr("health.probe", lambda: probe(str(proc)))
+
+    assert harness.charm.healthy
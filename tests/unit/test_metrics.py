@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Hook timing metrics, persisted across dispatches and failing handlers."""
+
+import logging
+
+import pytest
+from ops.framework import EventBase, Handle
+
+from core.metrics import PREFIX, MetricsState
+from literals import PATHS
+from managers.metrics import timed
+
+LABELS = '{event="config_changed",handler="_on_failing"}'
+
+
+class Handlers:
+    """Handlers holding the charm, as the event handler objects of the charm do."""
+
+    def __init__(self, charm):
+        self.charm = charm
+
+    @timed
+    def _on_failing(self, event: EventBase) -> None:
+        raise RuntimeError("handler failed")
+
+
+def test_failing_handler_persisted(harness):
+    with pytest.raises(RuntimeError):
+        Handlers(harness.charm)._on_failing(EventBase(Handle(None, "config_changed", None)))
+
+    # persisted before the failing dispatch is rolled back, without waiting for its commit
+    state = MetricsState.load(PATHS["METRICS_STATE"])
+    assert state.handlers["config_changed:_on_failing"].errors == 1
+    with open(PATHS["METRICS_TEXTFILE"]) as f:
+        assert f"{PREFIX}_handler_errors_total{LABELS} 1\n" in f.read()
+
+
+def test_flush_failure_logged(harness, monkeypatch, tmp_path, caplog):
+    # the textfile directory cannot be created under a regular file
+    (tmp_path / "file").touch()
+    monkeypatch.setitem(PATHS, "METRICS_TEXTFILE", str(tmp_path / "file" / "metrics.prom"))
+    metrics = harness.charm.metrics
+    metrics.metrics.textfile_path = PATHS["METRICS_TEXTFILE"]
+    metrics.record_setup_script(1.0, 1)
+
+    with caplog.at_level(logging.WARNING, logger="managers.metrics"):
+        metrics.flush()
+
+    assert "writing metrics failed" in caplog.text
+
+
+@pytest.mark.parametrize("content", ["", "{", '{"handlers": {}}', '{"handlers": [], "x": 1}'])
+def test_corrupt_state_reset(tmp_path, content):
+    path = tmp_path / "metrics.json"
+    path.write_text(content)
+
+    assert MetricsState.load(str(path)) == MetricsState()
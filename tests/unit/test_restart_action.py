@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Rolling restart action validation."""
+
+import time
+
+import pytest
+from ops.testing import ActionFailed
+
+from literals import CHARM_KEY
+
+RESTART = "restart"
+INVALID_PARAMS = [
+    {"max-concurrent": "0"},
+    {"max-concurrent": "150%"},
+    {"max-concurrent": "half"},
+    {"interval": -1},
+]
+
+
+@pytest.mark.parametrize("params", INVALID_PARAMS)
+def test_invalid_params(harness, params):
+    with pytest.raises(ActionFailed):
+        harness.run_action("rolling-restart", params)
+
+    assert not harness.charm.workload.commands
+
+
+def test_requires_leader(harness):
+    harness.set_leader(False)
+
+    with pytest.raises(ActionFailed):
+        harness.run_action("rolling-restart")
+
+
+@pytest.mark.parametrize("max_concurrent", ["2", "50%"])
+def test_reboot(harness, max_concurrent):
+    harness.run_action("rolling-restart", {"max-concurrent": max_concurrent, "reboot": True})
+
+    assert harness.charm.workload.commands == ["shutdown -r +1"]
+
+
+def granted(harness) -> list[str]:
+    relation = harness.model.get_relation(RESTART)
+    return sorted(
+        unit.name
+        for unit in relation.units | {harness.charm.unit}
+        if relation.data[harness.charm.app].get(str(unit)) == "granted"
+    )
+
+
+def follow_request(harness, relation, unit: str) -> None:
+    """Acknowledges the restart request and acquires the lock, as a peer unit would."""
+    request = relation.data[harness.charm.app]["restart-request"]
+    harness.update_relation_data(relation.id, unit, {"request": request, "state": "acquire"})
+
+
+def test_restart_granted_in_batches(harness):
+    relation = harness.model.get_relation(RESTART)
+    peers = [f"{CHARM_KEY}/{index}" for index in range(1, 4)]
+    for unit in peers:
+        harness.add_relation_unit(relation.id, unit)
+
+    harness.run_action("rolling-restart", {"max-concurrent": "2", "reboot": True})
+    for unit in peers[:-1]:
+        follow_request(harness, relation, unit)
+        assert granted(harness) == []
+
+    follow_request(harness, relation, peers[-1])
+
+    # the leader restarts last, on its own
+    assert len(granted(harness)) == 2
+    assert harness.charm.unit.name not in granted(harness)
+    assert not harness.charm.workload.commands
+
+
+def test_restart_batches_spaced_by_interval(harness, monkeypatch):
+    relation = harness.model.get_relation(RESTART)
+    peers = [f"{CHARM_KEY}/{index}" for index in range(1, 4)]
+    for unit in peers:
+        harness.add_relation_unit(relation.id, unit)
+
+    harness.run_action("rolling-restart", {"max-concurrent": "2", "interval": 30})
+    for unit in peers:
+        follow_request(harness, relation, unit)
+
+    first_batch = granted(harness)
+    released = time.time()
+    for unit in first_batch:
+        harness.update_relation_data(relation.id, unit, {"state": "release"})
+
+    # the next batch waits for the interval, rather than being granted straight away
+    app_data = relation.data[harness.charm.app]
+    assert granted(harness) == []
+    assert float(app_data["restart-not-before"]) >= released + 30
+
+    monkeypatch.setattr(time, "time", lambda: released + 31)
+    harness.charm.on[RESTART].process_locks.emit()
+
+    (second_batch,) = granted(harness)
+    assert second_batch not in first_batch and second_batch != harness.charm.unit.name
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Rolling ops lock handling, on a charm unit that cannot run its operation yet."""
+
+import time
+
+import pytest
+from ops.model import BlockedStatus, WaitingStatus
+
+from charm import RunsLikeACharm
+from literals import RESTART_HEALTH_TIMEOUT
+
+RESTART = "restart"
+
+
+def deferred(harness, kind: str) -> int:
+    return sum(
+        event_path.rsplit("/", 1)[-1].split("[")[0] == f"{RESTART}_{kind}"
+        for event_path, _, _ in harness.framework._storage.notices(None)
+    )
+
+
+@pytest.fixture
+def unhealthy(monkeypatch):
+    monkeypatch.setattr(RunsLikeACharm, "healthy", property(lambda _: False))
+
+
+@pytest.fixture
+def held(harness):
+    """Grants the restart lock to the unit, as the leader would, without running it yet."""
+    relation = harness.model.get_relation(RESTART)
+    relation.data[harness.charm.app][str(harness.charm.unit)] = "granted"
+    return relation
+
+
+def relation_changed(harness, relation) -> None:
+    harness.charm.on[RESTART].relation_changed.emit(relation, app=harness.charm.app)
+
+
+def test_run_with_lock_deferred_once(harness, held, unhealthy):
+    for _ in range(3):
+        relation_changed(harness, held)
+
+    assert deferred(harness, "run_with_lock") == 1
+    assert isinstance(harness.charm.unit.status, WaitingStatus)
+
+
+def test_unhealthy_restart_times_out(harness, held, unhealthy):
+    relation_changed(harness, held)
+    harness.charm._stored.restart_waiting_since = time.time() - RESTART_HEALTH_TIMEOUT
+
+    harness.framework.reemit()
+
+    assert deferred(harness, "run_with_lock") == 0
+    assert held.data[harness.charm.unit]["state"] == "release"
+    assert isinstance(harness.charm.unit.status, BlockedStatus)
+
+
+def test_acquire_lock_queued_while_held(harness, held, unhealthy):
+    held.data[harness.charm.unit]["callback_override"] = "_rolling_apply"
+
+    harness.charm.on[RESTART].acquire_lock.emit()
+
+    assert deferred(harness, "acquire_lock") == 1
+    assert held.data[harness.charm.unit]["callback_override"] == "_rolling_apply"
+
+
+def test_acquire_lock_queued_while_pending_other_callback(harness):
+    harness.set_leader(False)
+    relation = harness.model.get_relation(RESTART)
+
+    harness.charm.on[RESTART].acquire_lock.emit(callback_override="_rolling_apply")
+    harness.charm.on[RESTART].acquire_lock.emit(callback_override="_rolling_apply")
+    assert deferred(harness, "acquire_lock") == 0
+
+    harness.charm.on[RESTART].acquire_lock.emit()
+    assert deferred(harness, "acquire_lock") == 1
+    assert relation.data[harness.charm.unit]["callback_override"] == "_rolling_apply"
+
+
+def test_overdue_wakeup_processed_on_update_status(harness):
+    relation = harness.model.get_relation(RESTART)
+    relation.data[harness.charm.unit]["state"] = "acquire"
+    relation.data[harness.charm.app].update(
+        {"restart-wakeup": str(time.time() - 1), "restart-not-before": str(time.time() - 1)}
+    )
+
+    harness.charm.on.update_status.emit()
+
+    assert "shutdown -r +1" in harness.charm.workload.commands
+    assert not relation.data[harness.charm.app].get("restart-wakeup")
+
+
+def test_pending_wakeup_left_to_timer(harness):
+    relation = harness.model.get_relation(RESTART)
+    relation.data[harness.charm.unit]["state"] = "acquire"
+    relation.data[harness.charm.app]["restart-wakeup"] = str(time.time() + 60)
+
+    harness.charm.on.update_status.emit()
+
+    assert "shutdown -r +1" not in harness.charm.workload.commands
+
+
+def test_finished_roll_clears_schedule(harness):
+    relation = harness.model.get_relation(RESTART)
+    relation.data[harness.charm.app].update(
+        {"restart-interval": "30", "restart-max-concurrent": "50%", "restart-wakeup": "1"}
+    )
+
+    harness.charm.on[RESTART].process_locks.emit()
+
+    app_data = relation.data[harness.charm.app]
+    assert not any(value for key, value in app_data.items() if key.startswith("restart-"))
+
+
+def test_request_followed_once(harness):
+    harness.set_leader(False)
+    relation = harness.model.get_relation(RESTART)
+    relation.data[harness.charm.app].update(
+        {"restart-request": "1", "restart-request-callback": "_reboot"}
+    )
+
+    relation_changed(harness, relation)
+    relation.data[harness.charm.unit]["state"] = "idle"
+    relation_changed(harness, relation)
+
+    assert relation.data[harness.charm.unit]["request"] == "1"
+    assert relation.data[harness.charm.unit]["callback_override"] == "_reboot"
+    assert relation.data[harness.charm.unit]["state"] == "idle"
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Snap library requests and changes, against a fake snapd."""
+
+import pytest
+from charms.operator_libs_linux.v1 import snap
+
+SNAPS = ["charmcraft", "juju", "lxd", "microk8s", "nextcloud"]
+REQUESTS = 20
+
+
+@pytest.fixture
+def snap_cache(snapd):
+    for name in SNAPS:
+        snapd.add_snap(name)
+
+    snap._Cache.cache = snap.SnapCache()
+    yield snap._Cache.cache
+    snap._Cache.cache = None
+
+
+def test_requests_reuse_connection(snapd):
+    snapd.add_snap("lxd", installed=True)
+
+    for _ in range(REQUESTS):
+        snap.SnapClient().get_installed_snaps()
+
+    assert snapd.connections == 1
+
+
+def test_opener_connects_per_request(snapd):
+    socket_path = snapd.server_address
+    client = snap.SnapClient(socket_path, opener=snap.SnapClient._get_default_opener(socket_path))
+
+    for _ in range(REQUESTS):
+        client.get_installed_snaps()
+
+    assert snapd.connections == REQUESTS
+
+
+def test_cache_lookups_reuse_connection(snapd, snap_cache):
+    assert [snap_cache[name].revision for name in SNAPS] == [1] * len(SNAPS)
+    with pytest.raises(snap.SnapNotFoundError):
+        snap_cache["missing"]
+
+    assert snapd.connections == 1
+    assert snapd.requests.count(("GET", "/v2/find")) == len(SNAPS) + 1
+
+
+def test_add_async_starts_single_change(snapd, snap_cache):
+    snap.add(SNAPS[:2])
+    change_ids = snap.add_async(SNAPS[2:])
+
+    assert len(change_ids) == 1
+    assert [request for request in snapd.requests if request[0] == "POST"] == [
+        ("POST", "/v2/snaps/charmcraft"),
+        ("POST", "/v2/snaps/juju"),
+        ("POST", "/v2/snaps"),
+    ]
+    assert not snap.change_ready(change_ids[0])
+
+    snap.wait_change(change_ids[0])
+    assert sorted(snapd.installed) == sorted(SNAPS)
+
+
+def test_add_async_options(snapd, snap_cache):
+    snapd.installed["lxd"] = dict(snapd.store["lxd"])
+    snap_cache._load_installed_snaps()
+
+    change_ids = snap.add_async(["lxd", "juju", "microk8s"], channel="edge", classic=True)
+
+    assert len(change_ids) == 3
+    actions = {
+        name: (change["action"], change["options"])
+        for change in snapd.changes.values()
+        for name in change["names"]
+    }
+    assert actions == {
+        "lxd": ("refresh", {"channel": "edge"}),
+        "juju": ("install", {"channel": "edge", "classic": True}),
+        "microk8s": ("install", {"channel": "edge", "classic": True}),
+    }
+
+
+def test_remove_async(snapd, snap_cache):
+    for name in SNAPS:
+        snapd.installed[name] = dict(snapd.store[name])
+
+    (change_id,) = snap.remove_async(SNAPS)
+    snap.wait_change(change_id)
+
+    assert not snapd.installed
+
+
+def test_add_async_unknown_snap(snap_cache):
+    with pytest.raises(snap.SnapError):
+        snap.add_async(["charmcraft", "missing"])
+
+
+def test_snap_action_times_out(snapd, snap_cache, monkeypatch):
+    snapd.change_polls = 1000
+    monkeypatch.setattr(snap, "CHANGE_TIMEOUT", 0.05)
+
+    with pytest.raises(snap.SnapError, match="did not complete"):
+        snap_cache["lxd"].ensure(snap.SnapState.Latest)
+
+    assert "lxd" not in snapd.installed
+
+
+def test_refresh_up_to_date(snapd, snap_cache):
+    snapd.installed["lxd"] = dict(snapd.store["lxd"])
+    snap_cache._load_installed_snaps()
+
+    assert snap.add("lxd", state=snap.SnapState.Latest).present
+    snap_cache["lxd"].ensure(snap.SnapState.Present, channel="stable")
+    assert snap.add_async(["lxd"], channel="stable") == []
+
+    assert ("POST", "/v2/snaps/lxd") in snapd.requests
+    assert not snapd.changes
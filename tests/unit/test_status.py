@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Unit status publishing, skipping unchanged statuses."""
+
+import logging
+
+from ops.model import MaintenanceStatus
+
+from literals import CHARM_KEY, Status
+
+RESTART = "restart"
+OUTSIDE = MaintenanceStatus("set outside of the manager")
+
+
+def test_unchanged_status_skipped(harness, caplog):
+    status_manager = harness.charm.status_manager
+    status_manager.set(Status.SERVICE_FAIL)
+    harness.charm.unit.status = OUTSIDE
+    caplog.clear()
+
+    with caplog.at_level(logging.DEBUG, logger="managers.status"):
+        status_manager.set(Status.SERVICE_FAIL)
+
+    assert harness.charm.unit.status == OUTSIDE
+    assert not caplog.records
+
+    status_manager.set(Status.RESTART_FAIL)
+    assert harness.charm.unit.status == Status.RESTART_FAIL.value.status
+    assert [record.levelname for record in caplog.records] == ["ERROR"]
+
+
+def test_status_forgotten_after_restart_relation(harness):
+    status_manager = harness.charm.status_manager
+    status_manager.set(Status.SERVICE_FAIL)
+
+    # the rolling ops lib sets the unit status itself
+    relation = harness.model.get_relation(RESTART)
+    harness.add_relation_unit(relation.id, f"{CHARM_KEY}/1")
+    harness.update_relation_data(relation.id, f"{CHARM_KEY}/1", {"state": "idle"})
+    harness.charm.unit.status = OUTSIDE
+
+    status_manager.set(Status.SERVICE_FAIL)
+    assert harness.charm.unit.status == Status.SERVICE_FAIL.value.status
@@ -0,0 +1,26 @@
+#!/usr/bin/env python3
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Setup script changes on units upgraded from revisions without stored setup state."""
+
+from literals import PATHS, Status
+
+
+def test_upgraded_unit_applies_setup_changes(harness):
+    workload = harness.charm.workload
+    # left by the previous revision, which applied the script without recording it
+    harness.update_config({"setup_script": "echo v1"})
+    workload.files[PATHS["INSTALL_SCRIPT"]] = "echo v1"
+
+    harness.charm.on.upgrade_charm.emit()
+    harness.charm.on.update_status.emit()
+
+    assert harness.charm.unit.status == Status.ACTIVE.value.status
+    assert not workload.launches
+
+    harness.update_config({"setup_script": "echo v2"})
+
+    assert workload.launches
+    assert workload.files[PATHS["INSTALL_SCRIPT"]] == "echo v2"
+    assert not harness.charm.setup_changed
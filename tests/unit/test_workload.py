@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Workload service checks and removal of the services installed by the charm."""
+
+import os
+import subprocess
+import time
+
+import pytest
+
+from literals import ARTIFACT_SERVICE, EXPORTER_SERVICE, PATHS, SERVICE
+from workload import RunsLikeACharmWorkload
+
+UNITS = {
+    "SERVICE_UNIT": SERVICE,
+    "EXPORTER_UNIT": EXPORTER_SERVICE,
+    "ARTIFACT_SERVER_UNIT": ARTIFACT_SERVICE,
+}
+
+
+@pytest.fixture
+def installed_units(monkeypatch, tmp_path) -> list[str]:
+    """Installs fake unit files for every service of the charm, returning their paths."""
+    paths = []
+    for key in UNITS:
+        path = tmp_path / f"{key.lower()}.service"
+        path.write_text("[Unit]\n")
+        monkeypatch.setitem(PATHS, key, str(path))
+        paths.append(str(path))
+
+    return paths
+
+
+@pytest.fixture
+def failed_service(monkeypatch, installed_units) -> RunsLikeACharmWorkload:
+    def exec(command: str, env=None, working_dir=None) -> str:
+        raise subprocess.CalledProcessError(3, command)
+
+    workload = RunsLikeACharmWorkload()
+    monkeypatch.setattr(workload, "exec", exec)
+    return workload
+
+
+def test_active_checks_once(failed_service):
+    start = time.monotonic()
+
+    assert not failed_service.active()
+    assert time.monotonic() - start < 1
+
+
+def test_active_retries(failed_service):
+    start = time.monotonic()
+
+    assert not failed_service.active(attempts=2)
+    assert time.monotonic() - start >= 1
+
+
+def test_remove_cleans_up_services(harness, installed_units):
+    harness.charm.on.remove.emit()
+
+    assert [command for command in harness.charm.workload.commands if "disable" in command] == [
+        f"systemctl disable --now {name}" for name in UNITS.values()
+    ]
+    assert not any(os.path.exists(path) for path in installed_units)